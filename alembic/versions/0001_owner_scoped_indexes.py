@@ -0,0 +1,58 @@
+"""Composite indexes for owner-scoped list queries
+
+Revision ID: 0001_owner_scoped_indexes
+Revises:
+Create Date: 2026-10-18
+
+On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY inside an
+autocommit block, so writes to the tables keep flowing while they build.
+SQLite has no concurrent build; there the statements are plain
+CREATE INDEX IF NOT EXISTS and hold the write lock only for the build itself.
+"""
+from alembic import op
+
+revision = '0001_owner_scoped_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - must match __table_args__ in models/db_models.py
+INDEXES = [
+    ('ix_accounts_owner_created', 'accounts', ['owner_id', 'created_at']),
+    ('ix_contacts_owner_created', 'contacts', ['owner_id', 'created_at']),
+    ('ix_leads_owner_created', 'leads', ['owner_id', 'created_at']),
+    ('ix_opportunities_owner_created', 'opportunities', ['owner_id', 'created_at']),
+    ('ix_opportunities_owner_stage', 'opportunities', ['owner_id', 'stage']),
+    ('ix_tasks_owner_due_status', 'tasks', ['owner_id', 'due_date', 'status']),
+    ('ix_tasks_related_to', 'tasks', ['related_to_type', 'related_to_id']),
+    ('ix_activities_owner_created', 'activities', ['owner_id', 'created_at']),
+    ('ix_activities_related_to', 'activities', ['related_to_type', 'related_to_id']),
+    ('ix_notifications_user_read_created', 'notifications', ['user_id', 'is_read', 'created_at']),
+    ('ix_notifications_related_to', 'notifications', ['related_to_type', 'related_to_id']),
+]
+
+
+def _is_postgres():
+    return op.get_bind().dialect.name == 'postgresql'
+
+
+def upgrade():
+    if _is_postgres():
+        # CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade():
+    if _is_postgres():
+        with op.get_context().autocommit_block():
+            for name, table, _ in reversed(INDEXES):
+                op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+    else:
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,48 @@
+"""Pipeline summary rollup table
+
+Revision ID: 0002_pipeline_summaries
+Revises: 0001_owner_scoped_indexes
+Create Date: 2026-10-18
+
+Creates pipeline_summaries (if db.create_all() has not already) and backfills
+it from opportunities. `flask rebuild-pipeline-summary` performs the same
+backfill on demand.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0002_pipeline_summaries'
+down_revision = '0001_owner_scoped_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table('pipeline_summaries'):
+        op.create_table(
+            'pipeline_summaries',
+            sa.Column('owner_id', sa.String(36), sa.ForeignKey('users.id'), primary_key=True),
+            sa.Column('stage', sa.String(50), primary_key=True),
+            sa.Column('count', sa.Integer, nullable=False, server_default='0'),
+            sa.Column('value', sa.Float, nullable=False, server_default='0'),
+            sa.Column('weighted_value', sa.Float, nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime),
+        )
+
+    op.execute("DELETE FROM pipeline_summaries")
+    op.execute("""
+        INSERT INTO pipeline_summaries (owner_id, stage, count, value, weighted_value, updated_at)
+        SELECT owner_id,
+               COALESCE(stage, 'unknown'),
+               COUNT(id),
+               SUM(COALESCE(amount, 0)),
+               SUM(COALESCE(amount, 0) * COALESCE(probability, 0) / 100.0),
+               CURRENT_TIMESTAMP
+        FROM opportunities
+        WHERE owner_id IS NOT NULL
+        GROUP BY owner_id, COALESCE(stage, 'unknown')
+    """)
+
+
+def downgrade():
+    op.drop_table('pipeline_summaries')
@@ -0,0 +1,37 @@
+"""Full-text search index
+
+Revision ID: 0003_search_index
+Revises: 0002_pipeline_summaries
+Create Date: 2026-10-18
+
+SQLite: an FTS5 table over leads, contacts, opportunities and accounts, kept
+in sync by triggers and backfilled here. PostgreSQL: a generated tsvector
+column plus GIN index on each of those tables; adding a stored generated
+column rewrites the table, so run this off-peak on large databases. The GIN
+indexes are then built with CREATE INDEX CONCURRENTLY in an autocommit block.
+"""
+from alembic import op
+
+from services import search
+
+revision = '0003_search_index'
+down_revision = '0002_pipeline_summaries'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for statement in search._postgres_columns():
+            op.execute(statement)
+        # CONCURRENTLY cannot run inside a transaction block
+        with op.get_context().autocommit_block():
+            for statement in search._postgres_indexes(concurrently=True):
+                op.execute(statement)
+    else:
+        search.install(bind)
+
+
+def downgrade():
+    search.uninstall(op.get_bind())
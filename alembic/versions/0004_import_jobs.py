@@ -0,0 +1,45 @@
+"""Import job table
+
+Revision ID: 0004_import_jobs
+Revises: 0003_search_index
+Create Date: 2026-10-18
+
+Creates import_jobs (if db.create_all() has not already), which tracks the
+progress and per-row errors of /api/import uploads.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0004_import_jobs'
+down_revision = '0003_search_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('import_jobs'):
+        return
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', sa.String(36), primary_key=True),
+        sa.Column('owner_id', sa.String(36), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('entity_type', sa.String(50), nullable=False),
+        sa.Column('file_format', sa.String(10), nullable=False),
+        sa.Column('filename', sa.String(255)),
+        sa.Column('status', sa.String(20), nullable=False, server_default='queued'),
+        sa.Column('processed', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('inserted', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('skipped', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('failed', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('errors', sa.JSON),
+        sa.Column('error', sa.Text),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('started_at', sa.DateTime),
+        sa.Column('finished_at', sa.DateTime),
+    )
+    op.create_index('ix_import_jobs_owner_id', 'import_jobs', ['owner_id'])
+
+
+def downgrade():
+    op.drop_index('ix_import_jobs_owner_id', table_name='import_jobs')
+    op.drop_table('import_jobs')
@@ -0,0 +1,32 @@
+"""Per-owner data version table
+
+Revision ID: 0005_data_versions
+Revises: 0004_import_jobs
+Create Date: 2026-10-18
+
+Creates data_versions (if db.create_all() has not already). Each row counts
+the commits that changed one owner's data; read endpoints derive their
+ETags from it. Owners without a row are at version 0.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0005_data_versions'
+down_revision = '0004_import_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if sa.inspect(op.get_bind()).has_table('data_versions'):
+        return
+    op.create_table(
+        'data_versions',
+        sa.Column('owner_id', sa.String(36), sa.ForeignKey('users.id'), primary_key=True),
+        sa.Column('version', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime),
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions')
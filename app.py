@@ -7,7 +7,8 @@ import secrets
 from datetime import datetime, timedelta
 from functools import wraps
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session
+import click
+from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, session, stream_with_context
 from flask_cors import CORS
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash
@@ -15,9 +16,25 @@ from werkzeug.security import generate_password_hash
 from config import Config
 from models.db_models import (
     db, init_db, User, Account, Contact, Lead, Opportunity, 
-    Task, Activity, Notification, EmailTemplate, AuditLog, Product
+    Task, Activity, Notification, EmailTemplate, AuditLog, Product, ImportJob
 )
-from services import gemini_service
+from models.engine import read_replica
+from models.serializers import InvalidProjection, eager_query, projection_from_args, serialize_many
+from services import (
+    compression, data_version, export, gemini_service, importer, json_provider, pipeline_summary, reporting,
+    search, unit_of_work
+)
+from services.api_monitoring import api_monitor
+from services.audit_writer import audit_writer
+from services.autocomplete import autocomplete_index
+from services.bulk_operations import (
+    BULK_ENTITIES, STAGE_PROBABILITIES, bulk_convert_leads, bulk_create, bulk_delete, bulk_update
+)
+from services.invalidation import invalidation_bus
+from services.pagination import InvalidCursor, keyset_page
+from services.rate_limit import rate_limiter
+from services.read_cache import read_cache
+from services.state_store import state_store
 
 # ==================== APP INITIALIZATION ====================
 
@@ -42,12 +59,28 @@ app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production with HT
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 
+# JSON encoding for jsonify, request bodies and exports (see services/json_provider.py)
+json_provider.init_app(app)
+
 # Configure CORS
 cors_origins = os.environ.get('CORS_ORIGINS', '*').split(',')
 CORS(app, resources={r"/api/*": {"origins": cors_origins}})
 
 # Initialize database
 init_db(app)
+search.init_app(app)
+# Response times per endpoint; registered first so they include every other hook's work
+api_monitor.init_app(app)
+# Registered before the unit of work so it runs after the commit (after_request runs in reverse)
+compression.init_app(app)
+unit_of_work.init_app(app)
+audit_writer.init_app(app)
+invalidation_bus.init_app(app)
+autocomplete_index.init_app(app)
+data_version.init_app(app)
+read_cache.init_app(app)
+state_store.init_app(app)
+rate_limiter.init_app(app)
 
 # ==================== LOGIN MANAGER ====================
 
@@ -65,9 +98,9 @@ def load_user(user_id):
 # ==================== HELPER FUNCTIONS ====================
 
 def log_activity(action, entity_type, entity_id=None, entity_name=None, old_values=None, new_values=None):
-    """Log user activity for audit trail"""
+    """Log user activity for audit trail (written behind the request, see services/audit_writer.py)"""
     if current_user.is_authenticated:
-        log = AuditLog(
+        audit_writer.record(
             user_id=current_user.id,
             action=action,
             entity_type=entity_type,
@@ -78,8 +111,19 @@ def log_activity(action, entity_type, entity_id=None, entity_name=None, old_valu
             ip_address=request.remote_addr,
             user_agent=request.user_agent.string[:255] if request.user_agent else None
         )
-        db.session.add(log)
-        db.session.commit()
+
+
+def log_activities(action, entity_type, entries):
+    """Audit many entities at once; entries are dicts of entity_id/entity_name/old_values/new_values"""
+    if not entries or not current_user.is_authenticated:
+        return
+    ip_address = request.remote_addr
+    user_agent = request.user_agent.string[:255] if request.user_agent else None
+    audit_writer.record_many([
+        dict(entry, user_id=current_user.id, action=action, entity_type=entity_type,
+             ip_address=ip_address, user_agent=user_agent)
+        for entry in entries
+    ])
 
 
 def create_notification(user_id, title, message, notification_type='info', related_type=None, related_id=None, priority='normal'):
@@ -94,10 +138,27 @@ def create_notification(user_id, title, message, notification_type='info', relat
         priority=priority
     )
     db.session.add(notification)
-    db.session.commit()
+    db.session.flush()
     return notification
 
 
+def paginate(query, sort_column, id_column, descending=True, default_limit=None):
+    """Keyset-paginate a list query using ?cursor= and ?limit= (capped by config)"""
+    limit = request.args.get('limit', default_limit or app.config['API_PAGE_SIZE_DEFAULT'], type=int)
+    limit = max(1, min(limit, app.config['API_PAGE_SIZE_MAX']))
+    return keyset_page(query, sort_column, id_column, request.args.get('cursor'), limit, descending)
+
+
+def list_source(model, sort_column):
+    """Base query and serializer for a list route, honouring ?fields= and ?projection="""
+    projection = projection_from_args(
+        model, request.args.get('fields'), request.args.get('projection'), sort_columns=(sort_column.key,)
+    )
+    if projection is None:
+        return eager_query(model), serialize_many
+    return projection.query(), projection.serialize
+
+
 def api_response(data=None, error=None, status=200):
     """Standardized API response"""
     if error:
@@ -129,7 +190,7 @@ def login():
             session.permanent = True
             login_user(user, remember=remember)
             user.last_login = datetime.utcnow()
-            db.session.commit()
+            db.session.flush()
             
             log_activity('login', 'user', user.id, user.full_name)
             
@@ -181,7 +242,7 @@ def register():
         user.set_password(password)
         
         db.session.add(user)
-        db.session.commit()
+        db.session.flush()
         
         # Create welcome notification
         create_notification(
@@ -349,6 +410,12 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+@app.errorhandler(InvalidCursor)
+@app.errorhandler(InvalidProjection)
+def bad_list_request(error):
+    return jsonify({'success': False, 'error': str(error)}), 400
+
+
 @app.errorhandler(403)
 def forbidden(error):
     if request.path.startswith('/api/'):
@@ -413,7 +480,7 @@ def api_update_current_user():
     if 'avatar_color' in data:
         current_user.avatar_color = data['avatar_color']
     
-    db.session.commit()
+    db.session.flush()
     log_activity('update', 'user', current_user.id, current_user.full_name)
     
     return jsonify({'success': True, 'user': current_user.to_dict()})
@@ -446,49 +513,14 @@ def seed_sample_data():
 
 @app.route('/api/dashboard/stats', methods=['GET'])
 @login_required
+@read_replica
+@data_version.versioned(data_version.utc_date)
+@read_cache.cached(data_version.utc_date)
 def api_dashboard_stats():
     """Get dashboard statistics"""
-    # Get user's data
-    leads = Lead.query.filter_by(owner_id=current_user.id).all()
-    opportunities = Opportunity.query.filter_by(owner_id=current_user.id).all()
-    tasks = Task.query.filter_by(owner_id=current_user.id).all()
-    contacts = Contact.query.filter_by(owner_id=current_user.id).all()
-    
-    # Calculate stats
-    total_pipeline = sum(o.amount or 0 for o in opportunities if o.stage not in ['closed_won', 'closed_lost'])
-    weighted_pipeline = sum((o.amount or 0) * (o.probability or 0) / 100 for o in opportunities)
-    won_deals = sum(o.amount or 0 for o in opportunities if o.stage == 'closed_won')
-    avg_lead_score = sum(l.score or 0 for l in leads) / len(leads) if leads else 0
-    
-    # Deals by stage
-    deals_by_stage = {}
-    for o in opportunities:
-        stage = o.stage or 'unknown'
-        if stage not in deals_by_stage:
-            deals_by_stage[stage] = {'count': 0, 'value': 0}
-        deals_by_stage[stage]['count'] += 1
-        deals_by_stage[stage]['value'] += o.amount or 0
-    
-    # Tasks summary
-    today = datetime.utcnow().date()
-    overdue_tasks = len([t for t in tasks if t.due_date and t.due_date.date() < today and t.status != 'completed'])
-    today_tasks = len([t for t in tasks if t.due_date and t.due_date.date() == today])
-    
     return jsonify({
         'success': True,
-        'stats': {
-            'total_leads': len(leads),
-            'total_contacts': len(contacts),
-            'total_opportunities': len(opportunities),
-            'total_pipeline': total_pipeline,
-            'weighted_pipeline': weighted_pipeline,
-            'won_deals': won_deals,
-            'avg_lead_score': round(avg_lead_score, 1),
-            'deals_by_stage': deals_by_stage,
-            'overdue_tasks': overdue_tasks,
-            'today_tasks': today_tasks,
-            'open_tasks': len([t for t in tasks if t.status != 'completed'])
-        }
+        'stats': reporting.dashboard_stats(current_user.id)
     })
 
 
@@ -496,12 +528,17 @@ def api_dashboard_stats():
 
 @app.route('/api/leads', methods=['GET'])
 @login_required
+@read_replica
+@data_version.versioned()
+@read_cache.cached()
 def api_get_leads():
-    """Get all leads for current user"""
-    leads = Lead.query.filter_by(owner_id=current_user.id).order_by(Lead.created_at.desc()).all()
+    """Get leads for current user, newest first, one page at a time"""
+    query, serialize = list_source(Lead, Lead.created_at)
+    leads, next_cursor = paginate(query.filter_by(owner_id=current_user.id), Lead.created_at, Lead.id)
     return jsonify({
         'success': True,
-        'leads': [l.to_dict() for l in leads]
+        'leads': serialize(leads),
+        'next_cursor': next_cursor
     })
 
 
@@ -528,7 +565,7 @@ def api_create_lead():
     )
     
     db.session.add(lead)
-    db.session.commit()
+    db.session.flush()
     
     log_activity('create', 'lead', lead.id, lead.name)
     
@@ -543,7 +580,7 @@ def api_create_lead():
 def api_get_lead(lead_id):
     """Get a single lead"""
     lead = Lead.query.get_or_404(lead_id)
-    return jsonify({'success': True, 'lead': lead.to_dict()})
+    return data_version.record_response(lead, lambda: jsonify({'success': True, 'lead': lead.to_dict()}))
 
 
 @app.route('/api/leads/<lead_id>', methods=['PUT'])
@@ -561,7 +598,7 @@ def api_update_lead(lead_id):
         if key in data:
             setattr(lead, key, data[key])
     
-    db.session.commit()
+    db.session.flush()
     
     log_activity('update', 'lead', lead.id, lead.name, old_values, lead.to_dict())
     
@@ -576,7 +613,7 @@ def api_delete_lead(lead_id):
     log_activity('delete', 'lead', lead.id, lead.name)
     
     db.session.delete(lead)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True})
 
@@ -628,6 +665,7 @@ def api_convert_lead(lead_id):
         )
         db.session.add(opportunity)
         db.session.flush()
+        pipeline_summary.apply_change(after=pipeline_summary.snapshot(opportunity))
     
     # Mark lead as converted
     lead.is_converted = True
@@ -636,7 +674,7 @@ def api_convert_lead(lead_id):
     lead.converted_contact_id = contact.id
     lead.converted_opportunity_id = opportunity.id if opportunity else None
     
-    db.session.commit()
+    db.session.flush()
     
     log_activity('convert', 'lead', lead.id, lead.name)
     
@@ -652,12 +690,17 @@ def api_convert_lead(lead_id):
 
 @app.route('/api/contacts', methods=['GET'])
 @login_required
+@read_replica
+@data_version.versioned()
+@read_cache.cached()
 def api_get_contacts():
-    """Get all contacts"""
-    contacts = Contact.query.filter_by(owner_id=current_user.id).order_by(Contact.created_at.desc()).all()
+    """Get contacts, newest first, one page at a time"""
+    query, serialize = list_source(Contact, Contact.created_at)
+    contacts, next_cursor = paginate(query.filter_by(owner_id=current_user.id), Contact.created_at, Contact.id)
     return jsonify({
         'success': True,
-        'contacts': [c.to_dict() for c in contacts]
+        'contacts': serialize(contacts),
+        'next_cursor': next_cursor
     })
 
 
@@ -682,7 +725,7 @@ def api_create_contact():
     )
     
     db.session.add(contact)
-    db.session.commit()
+    db.session.flush()
     
     log_activity('create', 'contact', contact.id, contact.full_name)
     
@@ -697,7 +740,7 @@ def api_create_contact():
 def api_get_contact(contact_id):
     """Get a single contact"""
     contact = Contact.query.get_or_404(contact_id)
-    return jsonify({'success': True, 'contact': contact.to_dict()})
+    return data_version.record_response(contact, lambda: jsonify({'success': True, 'contact': contact.to_dict()}))
 
 
 @app.route('/api/contacts/<contact_id>', methods=['PUT'])
@@ -714,7 +757,7 @@ def api_update_contact(contact_id):
         if key in data:
             setattr(contact, key, data[key])
     
-    db.session.commit()
+    db.session.flush()
     
     log_activity('update', 'contact', contact.id, contact.full_name, old_values, contact.to_dict())
     
@@ -729,7 +772,7 @@ def api_delete_contact(contact_id):
     log_activity('delete', 'contact', contact.id, contact.full_name)
     
     db.session.delete(contact)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True})
 
@@ -738,12 +781,17 @@ def api_delete_contact(contact_id):
 
 @app.route('/api/accounts', methods=['GET'])
 @login_required
+@read_replica
+@data_version.versioned()
+@read_cache.cached()
 def api_get_accounts():
-    """Get all accounts"""
-    accounts = Account.query.filter_by(owner_id=current_user.id).order_by(Account.created_at.desc()).all()
+    """Get accounts, newest first, one page at a time"""
+    query, serialize = list_source(Account, Account.created_at)
+    accounts, next_cursor = paginate(query.filter_by(owner_id=current_user.id), Account.created_at, Account.id)
     return jsonify({
         'success': True,
-        'accounts': [a.to_dict() for a in accounts]
+        'accounts': serialize(accounts),
+        'next_cursor': next_cursor
     })
 
 
@@ -766,7 +814,7 @@ def api_create_account():
     )
     
     db.session.add(account)
-    db.session.commit()
+    db.session.flush()
     
     log_activity('create', 'account', account.id, account.name)
     
@@ -781,7 +829,7 @@ def api_create_account():
 def api_get_account(account_id):
     """Get a single account"""
     account = Account.query.get_or_404(account_id)
-    return jsonify({'success': True, 'account': account.to_dict()})
+    return data_version.record_response(account, lambda: jsonify({'success': True, 'account': account.to_dict()}))
 
 
 @app.route('/api/accounts/<account_id>', methods=['PUT'])
@@ -796,7 +844,7 @@ def api_update_account(account_id):
         if key in data:
             setattr(account, key, data[key])
     
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True, 'account': account.to_dict()})
 
@@ -807,7 +855,7 @@ def api_delete_account(account_id):
     """Delete an account"""
     account = Account.query.get_or_404(account_id)
     db.session.delete(account)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True})
 
@@ -815,24 +863,26 @@ def api_delete_account(account_id):
 # ==================== API: OPPORTUNITIES (DEALS) ====================
 
 @app.route('/api/opportunities', methods=['GET'])
+@app.route('/api/deals', methods=['GET'])  # alias; one view, so both URLs share the cache entry
 @login_required
+@read_replica
+@data_version.versioned()
+@read_cache.cached()
 def api_get_opportunities():
-    """Get all opportunities"""
-    opportunities = Opportunity.query.filter_by(owner_id=current_user.id).order_by(Opportunity.created_at.desc()).all()
+    """Get opportunities, newest first, one page at a time"""
+    query, serialize = list_source(Opportunity, Opportunity.created_at)
+    opportunities, next_cursor = paginate(
+        query.filter_by(owner_id=current_user.id), Opportunity.created_at, Opportunity.id
+    )
+    data = serialize(opportunities)
     return jsonify({
         'success': True,
-        'opportunities': [o.to_dict() for o in opportunities],
-        'deals': [o.to_dict() for o in opportunities]  # Alias for compatibility
+        'opportunities': data,
+        'deals': data,  # Alias for compatibility
+        'next_cursor': next_cursor
     })
 
 
-@app.route('/api/deals', methods=['GET'])
-@login_required
-def api_get_deals():
-    """Get all deals (alias for opportunities)"""
-    return api_get_opportunities()
-
-
 @app.route('/api/opportunities', methods=['POST'])
 @login_required
 def api_create_opportunity():
@@ -855,7 +905,8 @@ def api_create_opportunity():
     )
     
     db.session.add(opportunity)
-    db.session.commit()
+    pipeline_summary.apply_change(after=pipeline_summary.snapshot(opportunity))
+    db.session.flush()
     
     log_activity('create', 'opportunity', opportunity.id, opportunity.name)
     
@@ -878,7 +929,9 @@ def api_create_deal():
 def api_get_opportunity(opp_id):
     """Get a single opportunity"""
     opportunity = Opportunity.query.get_or_404(opp_id)
-    return jsonify({'success': True, 'opportunity': opportunity.to_dict()})
+    return data_version.record_response(
+        opportunity, lambda: jsonify({'success': True, 'opportunity': opportunity.to_dict()})
+    )
 
 
 @app.route('/api/opportunities/<opp_id>', methods=['PUT'])
@@ -889,6 +942,7 @@ def api_update_opportunity(opp_id):
     data = request.json
     
     old_stage = opportunity.stage
+    before = pipeline_summary.snapshot(opportunity)
     
     for key in ['name', 'description', 'amount', 'stage', 'probability', 
                 'opportunity_type', 'lead_source', 'next_step', 'loss_reason']:
@@ -899,23 +953,11 @@ def api_update_opportunity(opp_id):
         opportunity.close_date = datetime.strptime(data['close_date'], '%Y-%m-%d').date()
     
     # If stage changed, update probability automatically
-    stage_probabilities = {
-        'prospecting': 10,
-        'qualification': 20,
-        'needs_analysis': 30,
-        'value_proposition': 40,
-        'id_decision_makers': 50,
-        'perception_analysis': 60,
-        'proposal': 70,
-        'negotiation': 80,
-        'closed_won': 100,
-        'closed_lost': 0
-    }
-    
-    if 'stage' in data and data['stage'] in stage_probabilities:
-        opportunity.probability = stage_probabilities[data['stage']]
+    if 'stage' in data and data['stage'] in STAGE_PROBABILITIES:
+        opportunity.probability = STAGE_PROBABILITIES[data['stage']]
     
-    db.session.commit()
+    pipeline_summary.apply_change(before, pipeline_summary.snapshot(opportunity))
+    db.session.flush()
     
     return jsonify({'success': True, 'opportunity': opportunity.to_dict()})
 
@@ -932,8 +974,9 @@ def api_update_deal(deal_id):
 def api_delete_opportunity(opp_id):
     """Delete an opportunity"""
     opportunity = Opportunity.query.get_or_404(opp_id)
+    pipeline_summary.apply_change(before=pipeline_summary.snapshot(opportunity))
     db.session.delete(opportunity)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True})
 
@@ -954,6 +997,7 @@ def api_update_deal_stage(deal_id):
     
     new_stage = data.get('stage')
     if new_stage:
+        before = pipeline_summary.snapshot(opportunity)
         opportunity.stage = new_stage
         # Update probability based on stage
         stage_probabilities = {
@@ -966,23 +1010,81 @@ def api_update_deal_stage(deal_id):
             'Closed Lost': 0
         }
         opportunity.probability = stage_probabilities.get(new_stage, opportunity.probability)
+        pipeline_summary.apply_change(before, pipeline_summary.snapshot(opportunity))
         
-        db.session.commit()
+        db.session.flush()
         log_activity('update', 'deal', opportunity.id, f"Stage changed to {new_stage}")
     
     return jsonify({'success': True, 'deal': opportunity.to_dict()})
 
 
+# ==================== API: BULK OPERATIONS ====================
+
+# One static route per entity so these win over /api/<entity>/<id>
+@app.route('/api/leads/bulk', methods=['POST', 'PUT', 'DELETE'], defaults={'entity_type': 'leads'})
+@app.route('/api/contacts/bulk', methods=['POST', 'PUT', 'DELETE'], defaults={'entity_type': 'contacts'})
+@app.route('/api/accounts/bulk', methods=['POST', 'PUT', 'DELETE'], defaults={'entity_type': 'accounts'})
+@app.route('/api/opportunities/bulk', methods=['POST', 'PUT', 'DELETE'], defaults={'entity_type': 'opportunities'})
+@app.route('/api/deals/bulk', methods=['POST', 'PUT', 'DELETE'], defaults={'entity_type': 'deals'})
+@app.route('/api/tasks/bulk', methods=['POST', 'PUT', 'DELETE'], defaults={'entity_type': 'tasks'})
+@login_required
+def api_bulk_write(entity_type):
+    """Create (POST), update (PUT) or delete (DELETE) up to BULK_MAX_RECORDS records in one transaction"""
+    data = request.get_json(silent=True)
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list) or not records:
+        return api_response(error='Expected a non-empty JSON array of records', status=400)
+    if len(records) > app.config['BULK_MAX_RECORDS']:
+        return api_response(error=f"At most {app.config['BULK_MAX_RECORDS']} records per request", status=413)
+
+    spec = BULK_ENTITIES[entity_type]
+    operation, action = {
+        'POST': (bulk_create, 'create'),
+        'PUT': (bulk_update, 'update'),
+        'DELETE': (bulk_delete, 'delete'),
+    }[request.method]
+
+    result = operation(spec, records, current_user.id)
+    log_activities(f'bulk_{action}', spec.audit_type, result.audit)
+
+    status = 201 if request.method == 'POST' and result.ids else 200
+    return jsonify({'success': not result.errors, **result.to_dict()}), status
+
+
+@app.route('/api/leads/bulk/convert', methods=['POST'])
+@login_required
+def api_bulk_convert_leads():
+    """Convert a list of leads, sharing one account per company name"""
+    data = request.get_json(silent=True) or {}
+    lead_ids = data.get('lead_ids') if isinstance(data, dict) else None
+    if not isinstance(lead_ids, list) or not lead_ids:
+        return api_response(error='lead_ids must be a non-empty array', status=400)
+    if len(lead_ids) > app.config['BULK_MAX_RECORDS']:
+        return api_response(error=f"At most {app.config['BULK_MAX_RECORDS']} leads per request", status=413)
+
+    result = bulk_convert_leads(lead_ids, current_user.id, bool(data.get('create_opportunity')))
+    log_activities('convert', 'lead', result.audit)
+
+    return jsonify({'success': not result.errors, **result.to_dict()})
+
+
 # ==================== API: TASKS ====================
 
 @app.route('/api/tasks', methods=['GET'])
 @login_required
+@read_replica
+@data_version.versioned(data_version.utc_minute)
+@read_cache.cached(data_version.utc_minute)
 def api_get_tasks():
-    """Get all tasks"""
-    tasks = Task.query.filter_by(owner_id=current_user.id).order_by(Task.due_date.asc()).all()
+    """Get tasks, soonest due first (undated last), one page at a time"""
+    query, serialize = list_source(Task, Task.due_date)
+    tasks, next_cursor = paginate(
+        query.filter_by(owner_id=current_user.id), Task.due_date, Task.id, descending=False
+    )
     return jsonify({
         'success': True,
-        'tasks': [t.to_dict() for t in tasks]
+        'tasks': serialize(tasks),
+        'next_cursor': next_cursor
     })
 
 
@@ -1006,7 +1108,7 @@ def api_create_task():
     )
     
     db.session.add(task)
-    db.session.commit()
+    db.session.flush()
     
     log_activity('create', 'task', task.id, task.subject)
     
@@ -1021,7 +1123,9 @@ def api_create_task():
 def api_get_task(task_id):
     """Get a single task"""
     task = Task.query.get_or_404(task_id)
-    return jsonify({'success': True, 'task': task.to_dict()})
+    return data_version.record_response(
+        task, lambda: jsonify({'success': True, 'task': task.to_dict()}), data_version.utc_minute()
+    )
 
 
 @app.route('/api/tasks/<task_id>', methods=['PUT'])
@@ -1047,7 +1151,7 @@ def api_update_task(task_id):
     if data.get('status') == 'completed' and not task.completed_date:
         task.completed_date = datetime.utcnow()
     
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True, 'task': task.to_dict()})
 
@@ -1058,7 +1162,7 @@ def api_delete_task(task_id):
     """Delete a task"""
     task = Task.query.get_or_404(task_id)
     db.session.delete(task)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True})
 
@@ -1070,7 +1174,7 @@ def api_complete_task(task_id):
     task = Task.query.get_or_404(task_id)
     task.status = 'completed'
     task.completed_date = datetime.utcnow()
-    db.session.commit()
+    db.session.flush()
     
     log_activity('update', 'task', task.id, f"Completed: {task.subject}")
     
@@ -1081,13 +1185,18 @@ def api_complete_task(task_id):
 
 @app.route('/api/activities', methods=['GET'])
 @login_required
+@read_replica
+@data_version.versioned()
+@read_cache.cached()
 def api_get_activities():
     """Get recent activities"""
-    limit = request.args.get('limit', 50, type=int)
-    activities = Activity.query.filter_by(owner_id=current_user.id).order_by(Activity.created_at.desc()).limit(limit).all()
+    activities, next_cursor = paginate(
+        eager_query(Activity).filter_by(owner_id=current_user.id), Activity.created_at, Activity.id, default_limit=50
+    )
     return jsonify({
         'success': True,
-        'activities': [a.to_dict() for a in activities]
+        'activities': serialize_many(activities),
+        'next_cursor': next_cursor
     })
 
 
@@ -1114,7 +1223,7 @@ def api_create_activity():
     )
     
     db.session.add(activity)
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({
         'success': True,
@@ -1126,15 +1235,21 @@ def api_create_activity():
 
 @app.route('/api/notifications', methods=['GET'])
 @login_required
+@read_replica
+@data_version.versioned()
+@read_cache.cached()
 def api_get_notifications():
     """Get user notifications"""
-    notifications = Notification.query.filter_by(user_id=current_user.id).order_by(Notification.created_at.desc()).limit(50).all()
+    notifications, next_cursor = paginate(
+        Notification.query.filter_by(user_id=current_user.id), Notification.created_at, Notification.id, default_limit=50
+    )
     unread_count = Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
     
     return jsonify({
         'success': True,
         'notifications': [n.to_dict() for n in notifications],
-        'unread_count': unread_count
+        'unread_count': unread_count,
+        'next_cursor': next_cursor
     })
 
 
@@ -1145,7 +1260,7 @@ def api_mark_notification_read(notif_id):
     notification = Notification.query.get_or_404(notif_id)
     notification.is_read = True
     notification.read_at = datetime.utcnow()
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True})
 
@@ -1158,7 +1273,7 @@ def api_mark_all_notifications_read():
         'is_read': True,
         'read_at': datetime.utcnow()
     })
-    db.session.commit()
+    db.session.flush()
     
     return jsonify({'success': True})
 
@@ -1167,6 +1282,7 @@ def api_mark_all_notifications_read():
 
 @app.route('/api/ai/score-lead', methods=['POST'])
 @login_required
+@rate_limiter.limit(app.config['AI_RATE_LIMITS'], scope='ai')
 def api_ai_score_lead():
     """AI Lead Scoring"""
     data = request.json
@@ -1180,6 +1296,7 @@ def api_ai_score_lead():
 
 @app.route('/api/ai/generate-email', methods=['POST'])
 @login_required
+@rate_limiter.limit(app.config['AI_RATE_LIMITS'], scope='ai')
 def api_ai_generate_email():
     """AI Email Generation"""
     data = request.json
@@ -1196,6 +1313,7 @@ def api_ai_generate_email():
 
 @app.route('/api/ai/predict-deal', methods=['POST'])
 @login_required
+@rate_limiter.limit(app.config['AI_RATE_LIMITS'], scope='ai')
 def api_ai_predict_deal():
     """AI Deal Prediction"""
     data = request.json
@@ -1209,6 +1327,7 @@ def api_ai_predict_deal():
 
 @app.route('/api/ai/suggest-actions', methods=['POST'])
 @login_required
+@rate_limiter.limit(app.config['AI_RATE_LIMITS'], scope='ai')
 def api_ai_suggest_actions():
     """AI Action Suggestions"""
     data = request.json
@@ -1222,6 +1341,7 @@ def api_ai_suggest_actions():
 
 @app.route('/api/ai/analyze-sentiment', methods=['POST'])
 @login_required
+@rate_limiter.limit(app.config['AI_RATE_LIMITS'], scope='ai')
 def api_ai_analyze_sentiment():
     """AI Sentiment Analysis"""
     data = request.json
@@ -1236,6 +1356,7 @@ def api_ai_analyze_sentiment():
 
 @app.route('/api/ai/insights', methods=['GET'])
 @login_required
+@rate_limiter.limit(app.config['AI_RATE_LIMITS'], scope='ai')
 def api_ai_insights():
     """Get AI-powered insights for dashboard"""
     if not gemini_service.is_configured():
@@ -1254,14 +1375,14 @@ def api_ai_insights():
         })
     
     # Get user's data for AI analysis
-    leads = Lead.query.filter_by(owner_id=current_user.id).all()
-    opportunities = Opportunity.query.filter_by(owner_id=current_user.id).all()
-    tasks = Task.query.filter_by(owner_id=current_user.id).all()
+    leads = eager_query(Lead).filter_by(owner_id=current_user.id).all()
+    opportunities = eager_query(Opportunity).filter_by(owner_id=current_user.id).all()
+    tasks = eager_query(Task).filter_by(owner_id=current_user.id).all()
     
     insights = gemini_service.generate_insights({
-        'leads': [l.to_dict() for l in leads],
-        'opportunities': [o.to_dict() for o in opportunities],
-        'tasks': [t.to_dict() for t in tasks]
+        'leads': serialize_many(leads),
+        'opportunities': serialize_many(opportunities),
+        'tasks': serialize_many(tasks)
     })
     
     return jsonify({'success': True, 'insights': insights})
@@ -1271,74 +1392,102 @@ def api_ai_insights():
 
 @app.route('/api/search', methods=['GET'])
 @login_required
+@read_replica
 def api_global_search():
-    """Global search across all entities"""
+    """Global search across all entities, best matches first"""
     query = request.args.get('q', '').strip().lower()
     
     if len(query) < 2:
         return jsonify({'success': True, 'results': []})
     
-    results = []
-    
-    # Search leads
-    leads = Lead.query.filter(
-        Lead.owner_id == current_user.id,
-        (Lead.name.ilike(f'%{query}%') | Lead.email.ilike(f'%{query}%') | Lead.company.ilike(f'%{query}%'))
-    ).limit(5).all()
-    results.extend([{'type': 'lead', 'id': l.id, 'name': l.name, 'subtitle': l.company} for l in leads])
-    
-    # Search contacts
-    contacts = Contact.query.filter(
-        Contact.owner_id == current_user.id,
-        (Contact.first_name.ilike(f'%{query}%') | Contact.last_name.ilike(f'%{query}%') | Contact.email.ilike(f'%{query}%'))
-    ).limit(5).all()
-    results.extend([{'type': 'contact', 'id': c.id, 'name': c.full_name, 'subtitle': c.email} for c in contacts])
-    
-    # Search opportunities
-    opportunities = Opportunity.query.filter(
-        Opportunity.owner_id == current_user.id,
-        Opportunity.name.ilike(f'%{query}%')
-    ).limit(5).all()
-    results.extend([{'type': 'opportunity', 'id': o.id, 'name': o.name, 'subtitle': f'${o.amount:,.0f}'} for o in opportunities])
-    
-    # Search accounts
-    accounts = Account.query.filter(
-        Account.owner_id == current_user.id,
-        Account.name.ilike(f'%{query}%')
-    ).limit(5).all()
-    results.extend([{'type': 'account', 'id': a.id, 'name': a.name, 'subtitle': a.industry} for a in accounts])
-    
-    return jsonify({'success': True, 'results': results})
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    return jsonify({'success': True, 'results': search.search(current_user.id, query, limit)})
+
+
+@app.route('/api/search/suggest', methods=['GET'])
+@rate_limiter.exempt  # fired on every typing pause; RATE_LIMITS would run out mid-search
+@login_required
+@rate_limiter.limit(app.config['SUGGEST_RATE_LIMITS'], scope='suggest')
+@read_replica
+def api_search_suggest():
+    """Type-ahead suggestions served from the in-memory prefix index"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'success': True, 'results': []})
+
+    limit = max(1, min(request.args.get('limit', 8, type=int), 20))
+    return jsonify({'success': True, 'results': autocomplete_index.suggest(current_user.id, query, limit)})
+
+
+@app.route('/api/search/suggest/stats', methods=['GET'])
+@login_required
+def api_search_suggest_stats():
+    """Size and memory use of the type-ahead index in this process"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    return jsonify({'success': True, 'stats': autocomplete_index.stats()})
+
+
+# ==================== API: CACHE ====================
+
+@app.route('/api/cache/stats', methods=['GET'])
+@login_required
+def api_cache_stats():
+    """Read cache hit rates and cross-worker invalidation latency in this process"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    return jsonify({
+        'success': True,
+        'read_cache': read_cache.counters,
+        'invalidation': invalidation_bus.stats()
+    })
+
+
+# ==================== API: MONITORING ====================
+
+@app.route('/api/monitoring/stats', methods=['GET'])
+@login_required
+def api_monitoring_stats():
+    """Health and response time percentiles of the busiest endpoints in this process"""
+    if current_user.role != 'admin':
+        return jsonify({'success': False, 'error': 'Admin access required'}), 403
+    seconds = max(60, min(request.args.get('window', 3600, type=int), 86400))
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    return jsonify({
+        'success': True,
+        'health': api_monitor.get_health_status(),
+        'endpoints': [
+            api_monitor.get_endpoint_stats(endpoint, seconds)
+            for endpoint, _ in api_monitor.get_top_endpoints(limit, seconds)
+        ],
+        'rate_limits': rate_limiter.counters
+    })
 
 
 # ==================== API: REPORTS ====================
 
 @app.route('/api/reports/pipeline', methods=['GET'])
 @login_required
+@read_replica
+@read_cache.cached()
 def api_report_pipeline():
     """Pipeline report data"""
-    opportunities = Opportunity.query.filter_by(owner_id=current_user.id).all()
-    
-    by_stage = {}
-    for opp in opportunities:
-        stage = opp.stage or 'unknown'
-        if stage not in by_stage:
-            by_stage[stage] = {'count': 0, 'value': 0}
-        by_stage[stage]['count'] += 1
-        by_stage[stage]['value'] += opp.amount or 0
+    stages = pipeline_summary.by_stage(current_user.id)
     
     return jsonify({
         'success': True,
         'report': {
-            'by_stage': by_stage,
-            'total_count': len(opportunities),
-            'total_value': sum(o.amount or 0 for o in opportunities)
+            'by_stage': {stage: {'count': s['count'], 'value': s['value']} for stage, s in stages.items()},
+            'total_count': sum(s['count'] for s in stages.values()),
+            'total_value': sum(s['value'] for s in stages.values())
         }
     })
 
 
 @app.route('/api/reports/leads', methods=['GET'])
 @login_required
+@read_replica
+@read_cache.cached()
 def api_report_leads():
     """Leads report data"""
     leads = Lead.query.filter_by(owner_id=current_user.id).all()
@@ -1373,37 +1522,99 @@ def api_report_leads():
 
 @app.route('/api/export/<entity_type>', methods=['GET'])
 @login_required
+@read_replica
 def api_export_data(entity_type):
-    """Export data as JSON (can be extended for CSV/Excel)"""
+    """Stream all of the user's records of one type as CSV, NDJSON, JSON, XLSX, Parquet or Arrow"""
     format_type = request.args.get('format', 'json')
-    
-    data = []
-    if entity_type == 'leads':
-        items = Lead.query.filter_by(owner_id=current_user.id).all()
-        data = [l.to_dict() for l in items]
-    elif entity_type == 'contacts':
-        items = Contact.query.filter_by(owner_id=current_user.id).all()
-        data = [c.to_dict() for c in items]
-    elif entity_type == 'opportunities':
-        items = Opportunity.query.filter_by(owner_id=current_user.id).all()
-        data = [o.to_dict() for o in items]
-    elif entity_type == 'accounts':
-        items = Account.query.filter_by(owner_id=current_user.id).all()
-        data = [a.to_dict() for a in items]
-    elif entity_type == 'tasks':
-        items = Task.query.filter_by(owner_id=current_user.id).all()
-        data = [t.to_dict() for t in items]
-    else:
+
+    if entity_type not in export.EXPORT_MODELS:
         return jsonify({'error': f'Unknown entity type: {entity_type}'}), 400
-    
-    log_activity('export', entity_type, None, f'Exported {len(data)} {entity_type}')
-    
-    return jsonify({
-        'success': True,
-        'entity_type': entity_type,
-        'count': len(data),
-        'data': data
-    })
+    if format_type not in export.FORMATS:
+        return jsonify({'error': f'Unknown export format: {format_type}'}), 400
+    if not export.supported(format_type):
+        return jsonify({
+            'error': f'{format_type} export needs {export.OPTIONAL_DEPENDENCIES[format_type]} installed on the server'
+        }), 501
+
+    log_activity('export', entity_type, None, f'Exported {entity_type} as {format_type}')
+
+    mimetype, extension, compressible = export.FORMATS[format_type]
+    chunks = export.stream(entity_type, current_user.id, format_type,
+                           app.config['EXPORT_BATCH_SIZE'], app.config['EXPORT_ROW_GROUP_SIZE'])
+    headers = {
+        'Content-Disposition': f'attachment; filename="{entity_type}-{datetime.now():%Y%m%d}.{extension}"',
+        'Vary': 'Accept-Encoding',
+    }
+    if compressible and request.accept_encodings['gzip']:
+        chunks = export.gzipped(chunks)
+        headers['Content-Encoding'] = 'gzip'
+    return app.response_class(stream_with_context(chunks), mimetype=mimetype, headers=headers)
+
+
+# ==================== API: IMPORT ====================
+
+@app.route('/api/import/<entity_type>', methods=['POST'])
+@login_required
+def api_import_data(entity_type):
+    """Queue a CSV, NDJSON or JSON file of records for import; poll the returned job for progress"""
+    if entity_type not in BULK_ENTITIES:
+        return jsonify({'success': False, 'error': f'Unknown entity type: {entity_type}'}), 400
+
+    # A multipart "file" field, or the file itself as the request body
+    upload = request.files.get('file')
+    if upload is not None:
+        filename, content_type, stream = upload.filename, upload.mimetype, upload.stream
+    else:
+        filename, content_type, stream = None, request.mimetype, request.stream
+
+    file_format = importer.detect_format(request.args.get('format'), filename, content_type)
+    if file_format is None:
+        return jsonify({'success': False, 'error': 'Unknown import format; use csv, ndjson or json'}), 400
+
+    path = importer.spool(stream)
+    # Without a committed job row nothing would ever read or delete the file
+    unit_of_work.on_rollback(lambda: importer.discard(path))
+    job = ImportJob(
+        owner_id=current_user.id, entity_type=entity_type, file_format=file_format,
+        filename=filename[:255] if filename else None
+    )
+    db.session.add(job)
+    db.session.flush()
+
+    job_id = job.id
+    unit_of_work.on_commit(lambda: importer.submit(app, job_id, path))
+    return jsonify({'success': True, 'job': job.to_dict()}), 202, {
+        'Location': url_for('api_import_status', job_id=job_id)
+    }
+
+
+@app.route('/api/import/jobs/<job_id>', methods=['GET'])
+@login_required
+def api_import_status(job_id):
+    """Progress and per-row errors of an import"""
+    job = ImportJob.query.filter_by(id=job_id, owner_id=current_user.id).first()
+    if not job:
+        return jsonify({'success': False, 'error': 'Import job not found'}), 404
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+
+# ==================== CLI COMMANDS ====================
+
+@app.cli.command('rebuild-pipeline-summary')
+@click.option('--owner-id', default=None, help='Only rebuild this owner (default: everyone)')
+def rebuild_pipeline_summary_command(owner_id):
+    """Recompute the pipeline_summaries rollup from opportunities"""
+    rows = pipeline_summary.rebuild(owner_id)
+    db.session.commit()
+    click.echo(f"Rebuilt {rows} pipeline summary rows")
+
+
+@app.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """Re-index leads, contacts, opportunities and accounts for /api/search"""
+    search.rebuild()
+    db.session.commit()
+    click.echo(f"Search backend: {search.backend() or 'ILIKE (no full-text index)'}")
 
 
 # ==================== MAIN ====================
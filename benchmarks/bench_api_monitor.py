@@ -0,0 +1,64 @@
+"""
+GeminiCRM Pro - API Monitor Benchmark
+Cost of recording response times in APIMonitor's rolling histograms and of
+reading percentiles back, against keeping every sample in a list and sorting
+it per query, plus how far the histogram percentiles are from the exact ones.
+
+Usage: python -m benchmarks.bench_api_monitor [requests]
+"""
+import random
+import sys
+import time
+
+from services.api_monitoring import APIMonitor
+
+ENDPOINTS = [f'GET /api/endpoint-{n}' for n in range(20)]
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    random.seed(7)
+    # Spread over the last hour, log-normal like real response times
+    samples = [(ENDPOINTS[n % len(ENDPOINTS)], random.lognormvariate(3, 1), 500 if n % 50 == 0 else 200)
+               for n in range(requests)]
+    now = time.time()
+    clock = [now - 3599]
+    step = 3598 / requests
+    monitor = APIMonitor(clock=lambda: clock[0])
+
+    started = time.perf_counter()
+    for endpoint, ms, status in samples:
+        clock[0] += step
+        monitor.log_request(None, endpoint, 'GET', status, ms)
+    histogram_record = (time.perf_counter() - started) / requests * 1e6
+
+    started = time.perf_counter()
+    lists = {}
+    for endpoint, ms, _ in samples:
+        lists.setdefault(endpoint, []).append(ms)
+    list_record = (time.perf_counter() - started) / requests * 1e6
+
+    endpoint = ENDPOINTS[0]
+    started = time.perf_counter()
+    stats = monitor.get_endpoint_stats(endpoint, 3600)
+    histogram_query = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    exact = sorted(lists[endpoint])
+    list_query = (time.perf_counter() - started) * 1000
+
+    print(f"{requests:,} requests over an hour, {len(ENDPOINTS)} endpoints")
+    # Counters held stay bounded by buckets x periods however many requests come in
+    counters = sum(len(entry[1].counts) for series in monitor._series.values()
+                   for rolling in series for entry in rolling.ring if entry)
+    print(f"{'':>12} | {'record us':>9} | {'stats ms':>8} | {'values held':>11}")
+    print(f"{'histograms':>12} | {histogram_record:>9.2f} | {histogram_query:>8.2f} | {counters:>11,}")
+    print(f"{'sorted list':>12} | {list_record:>9.2f} | {list_query:>8.2f} | {requests:>11,}")
+    print(f"{endpoint}: {stats['total_requests']:,} of {len(exact):,} requests in the window")
+    for p in (50, 95, 99):
+        estimate = stats[f'p{p}_response_time_ms']
+        actual = exact[max(0, -(-len(exact) * p // 100) - 1)]
+        print(f"  p{p}: {estimate:>9.3f} ms histogram, {actual:>9.3f} ms exact ({(estimate / actual - 1) * 100:+.2f}%)")
+
+
+if __name__ == '__main__':
+    main()
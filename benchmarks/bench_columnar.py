@@ -0,0 +1,75 @@
+"""
+GeminiCRM Pro - Columnar Export Benchmark
+What a BI client pays to get N opportunities into pandas: the JSON export
+re-parsed into a DataFrame against the Parquet and Arrow IPC exports read
+with pyarrow. Export memory, measured in a second pass, is the peak of
+Python allocations (tracemalloc) plus Arrow's own buffers, sampled per chunk.
+
+Usage: python -m benchmarks.bench_columnar [rows]
+"""
+import io
+import json
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from benchmarks.common import make_app, seed
+from models.db_models import db
+from services import export
+
+
+def _export(owner_id, format_type):
+    db.session.expunge_all()
+    start = time.perf_counter()
+    body = b''.join(
+        chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+        for chunk in export.stream('opportunities', owner_id, format_type)
+    )
+    return body, time.perf_counter() - start
+
+
+def _peak_memory(owner_id, format_type):
+    # A second pass, since tracemalloc slows everything down; chunks are dropped as a client would
+    db.session.expunge_all()
+    arrow_peak = 0
+    tracemalloc.start()
+    for _ in export.stream('opportunities', owner_id, format_type):
+        arrow_peak = max(arrow_peak, pa.total_allocated_bytes())
+    python_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return python_peak + arrow_peak
+
+
+def _load(format_type, body):
+    if format_type == 'json':
+        return pd.DataFrame(json.loads(body)['data'])
+    if format_type == 'parquet':
+        return pq.read_table(io.BytesIO(body)).to_pandas()
+    return pa.ipc.open_stream(body).read_all().to_pandas()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    app = make_app()
+    with app.app_context():
+        owner_id = seed(owners=1, rows_per_owner=rows)[0]
+        print(f"{rows:,} opportunities")
+        print(f"{'format':>8} | {'export s':>8} | {'peak MiB':>8} | {'body MiB':>8} | {'to pandas s':>11} | typed columns")
+        for format_type in ('json', 'parquet', 'arrow'):
+            body, elapsed = _export(owner_id, format_type)
+            peak = _peak_memory(owner_id, format_type)
+            start = time.perf_counter()
+            frame = _load(format_type, body)
+            load = time.perf_counter() - start
+            typed = sum(dtype.kind in 'biufM' for dtype in frame.dtypes)
+            print(f"{format_type:>8} | {elapsed:>8.2f} | {peak / 2**20:>8.1f} | {len(body) / 2**20:>8.1f} | "
+                  f"{load:>11.2f} | {typed}/{len(frame.columns)}")
+
+
+if __name__ == '__main__':
+    main()
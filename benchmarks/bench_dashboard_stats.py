@@ -0,0 +1,82 @@
+"""
+GeminiCRM Pro - Dashboard Stats Benchmark
+Compares the old load-everything-into-Python dashboard with the aggregate
+queries in services/reporting.py as an owner's row count grows
+
+Usage: python -m benchmarks.bench_dashboard_stats [rows ...]
+"""
+import sys
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.common import make_app, seed, timed
+from models.db_models import db, Contact, Lead, Opportunity, Task
+from services.reporting import dashboard_stats
+
+
+def legacy_dashboard_stats(owner_id):
+    """The pre-aggregation implementation, kept for comparison"""
+    leads = Lead.query.filter_by(owner_id=owner_id).all()
+    opportunities = Opportunity.query.filter_by(owner_id=owner_id).all()
+    tasks = Task.query.filter_by(owner_id=owner_id).all()
+    contacts = Contact.query.filter_by(owner_id=owner_id).all()
+
+    deals_by_stage = {}
+    for o in opportunities:
+        stage = o.stage or 'unknown'
+        bucket = deals_by_stage.setdefault(stage, {'count': 0, 'value': 0})
+        bucket['count'] += 1
+        bucket['value'] += o.amount or 0
+
+    today = datetime.utcnow().date()
+    return {
+        'total_leads': len(leads),
+        'total_contacts': len(contacts),
+        'total_opportunities': len(opportunities),
+        'total_pipeline': sum(o.amount or 0 for o in opportunities if o.stage not in ['closed_won', 'closed_lost']),
+        'weighted_pipeline': sum((o.amount or 0) * (o.probability or 0) / 100 for o in opportunities),
+        'won_deals': sum(o.amount or 0 for o in opportunities if o.stage == 'closed_won'),
+        'avg_lead_score': round(sum(l.score or 0 for l in leads) / len(leads), 1) if leads else 0,
+        'deals_by_stage': deals_by_stage,
+        'overdue_tasks': len([t for t in tasks if t.due_date and t.due_date.date() < today and t.status != 'completed']),
+        'today_tasks': len([t for t in tasks if t.due_date and t.due_date.date() == today]),
+        'open_tasks': len([t for t in tasks if t.status != 'completed']),
+    }
+
+
+def _peak_kb(fn):
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.expunge_all()
+    return peak / 1024
+
+
+def main():
+    sizes = [int(n) for n in sys.argv[1:]] or [1000, 10000, 50000]
+    print(f"{'rows':>8} | {'legacy ms':>10} {'legacy KB':>10} | {'sql ms':>8} {'sql KB':>8}")
+
+    for rows in sizes:
+        app = make_app()
+        with app.app_context():
+            owner_id = seed(owners=1, rows_per_owner=rows)[0]
+
+            old, new = legacy_dashboard_stats(owner_id), dashboard_stats(owner_id)
+            for key, value in old.items():
+                if key != 'deals_by_stage':
+                    assert abs(value - new[key]) < 1e-6 * max(1, abs(value)), (key, value, new[key])
+
+            def run_legacy():
+                legacy_dashboard_stats(owner_id)
+                db.session.expunge_all()
+
+            legacy_ms = timed(run_legacy, repeat=3)
+            sql_ms = timed(lambda: dashboard_stats(owner_id), repeat=3)
+            legacy_kb = _peak_kb(lambda: legacy_dashboard_stats(owner_id))
+            sql_kb = _peak_kb(lambda: dashboard_stats(owner_id))
+            print(f"{rows:>8} | {legacy_ms:>10.1f} {legacy_kb:>10.0f} | {sql_ms:>8.1f} {sql_kb:>8.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+GeminiCRM Pro - Excel Export Benchmark
+Wall time and peak RSS of writing N leads to XLSX the old way (all rows in
+memory, a pandas DataFrame, a regular openpyxl workbook filled cell by cell)
+against the write-only exporter fed from a server-side cursor. Each case
+runs in its own process so peak RSS belongs to that case alone.
+
+Usage: python -m benchmarks.bench_excel [rows] [--legacy-max ROWS]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_app, seed
+from models.db_models import Lead
+from models.serializers import eager_query, serialize_many
+from services import export
+
+
+def _legacy_export_to_excel(data, filename):
+    """ExportManager.export_to_excel before the write-only rewrite"""
+    import openpyxl
+    from openpyxl.utils.dataframe import dataframe_to_rows
+    import pandas as pd
+
+    df = pd.DataFrame(data)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), 1):
+        for c_idx, value in enumerate(row, 1):
+            ws.cell(row=r_idx, column=c_idx, value=value)
+    wb.save(filename)
+
+
+def _run_case(case, db_path):
+    # No mmap: mapped database pages would count towards RSS and hide the heap
+    app = make_app(db_path, SQLITE_MMAP_SIZE=0)
+    owner_id = 'bench-0'
+    with tempfile.TemporaryDirectory() as directory, app.app_context():
+        target = os.path.join(directory, 'leads.xlsx')
+        start = time.perf_counter()
+        if case == 'legacy':
+            data = serialize_many(eager_query(Lead).filter_by(owner_id=owner_id).all())
+            # The old path could not write lists into cells at all
+            data = [{k: v for k, v in row.items() if not isinstance(v, (list, dict))} for row in data]
+            _legacy_export_to_excel(data, target)
+        else:
+            with open(target, 'wb') as f:
+                for chunk in export.stream('leads', owner_id, 'xlsx'):
+                    f.write(chunk)
+        elapsed = time.perf_counter() - start
+        size = os.path.getsize(target)
+    peak_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{elapsed:.2f} {peak_kib} {size}')
+
+
+def _seed(db_path, rows):
+    app = make_app(db_path)
+    with app.app_context():
+        seed(owners=1, rows_per_owner=rows)
+
+
+def _child(*args):
+    return subprocess.run(
+        [sys.executable, '-m', 'benchmarks.bench_excel', *map(str, args)],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] == '--case':
+        _run_case(args[1], args[2])
+        return
+    if args and args[0] == '--seed':
+        _seed(args[1], int(args[2]))
+        return
+
+    legacy_max = 200_000
+    if '--legacy-max' in args:
+        position = args.index('--legacy-max')
+        legacy_max = int(args[position + 1])
+        del args[position:position + 2]
+    rows = int(args[0]) if args else 1_000_000
+
+    fd, db_path = tempfile.mkstemp(suffix='.db', prefix='geminicrm-bench-')
+    os.close(fd)
+    os.unlink(db_path)
+    try:
+        # Seeded in a child too: ru_maxrss survives fork and exec, so a big
+        # parent would inflate every case's number
+        _child('--seed', db_path, rows)
+
+        print(f"{rows:,} leads")
+        print(f"{'export':>10} | {'seconds':>8} | {'peak RSS MiB':>12} | {'file MiB':>8}")
+        for case in ('legacy', 'streaming'):
+            if case == 'legacy' and rows > legacy_max:
+                print(f"{case:>10} | skipped: above --legacy-max {legacy_max:,}, it holds every cell in memory")
+                continue
+            out = _child('--case', case, db_path)
+            elapsed, peak_kib, size = float(out[0]), int(out[1]), int(out[2])
+            print(f"{case:>10} | {elapsed:>8.1f} | {peak_kib / 1024:>12.0f} | {size / 2**20:>8.1f}")
+    finally:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.unlink(db_path + suffix)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+GeminiCRM Pro - Export Benchmark
+Peak Python memory and wall time of exporting N leads the old way (.all(),
+one list of dicts, one JSON blob) against the streaming exporter in
+services/export.py, per format. Times run under tracemalloc, so
+compare them with each other rather than with production
+
+Usage: python -m benchmarks.bench_export [rows]
+"""
+import json
+import sys
+import time
+import tracemalloc
+
+from benchmarks.common import make_app, seed
+from models.db_models import db, Lead
+from models.serializers import eager_query, serialize_many
+from services import export
+
+
+def _measure(fn):
+    db.session.expunge_all()
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def _materialized(owner_id):
+    data = serialize_many(eager_query(Lead).filter_by(owner_id=owner_id).all())
+    return len(json.dumps({'success': True, 'entity_type': 'leads', 'count': len(data), 'data': data}, default=str))
+
+
+def _streamed(owner_id, format_type, compress=False):
+    chunks = export.stream('leads', owner_id, format_type)
+    if compress:
+        chunks = export.gzipped(chunks)
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+
+    app = make_app()
+    with app.app_context():
+        owner_id = seed(owners=1, rows_per_owner=rows)[0]
+        print(f"{rows:,} leads")
+        print(f"{'export':>18} | {'seconds':>8} | {'peak MiB':>9} | {'body MiB':>9}")
+        cases = [
+            ('materialized json', lambda: _materialized(owner_id)),
+            ('streamed json', lambda: _streamed(owner_id, 'json')),
+            ('streamed ndjson', lambda: _streamed(owner_id, 'ndjson')),
+            ('streamed csv', lambda: _streamed(owner_id, 'csv')),
+            ('streamed csv.gz', lambda: _streamed(owner_id, 'csv', compress=True)),
+        ]
+        for label, fn in cases:
+            elapsed, peak, size = _measure(fn)
+            print(f"{label:>18} | {elapsed:>8.2f} | {peak / 2**20:>9.1f} | {size / 2**20:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
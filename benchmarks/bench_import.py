@@ -0,0 +1,82 @@
+"""
+GeminiCRM Pro - Import Benchmark
+Rows per second of services/importer.py importing a generated lead file
+(CSV or NDJSON) into SQLite with the full-text search triggers installed.
+About 1% of rows repeat an earlier email and 1% fail validation.
+
+Usage: python -m benchmarks.bench_import [rows] [csv|ndjson]
+"""
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_app, seed
+from config import Config
+from models.db_models import db, ImportJob
+from services import importer, search
+
+SOURCES = ['Website', 'Referral', 'LinkedIn', 'Trade Show']
+
+
+def _rows(count):
+    for n in range(count):
+        email = f'import{n - 50 if n % 100 == 99 else n}@example.com'
+        yield {
+            'name': f'Imported Lead {n}',
+            'email': email if n % 100 != 42 else 'not-an-email',
+            'company': f'Import Co {n % 5000}',
+            'source': SOURCES[n % len(SOURCES)],
+            'score': str(n % 100),
+            'estimated_value': f'{(n % 1000) * 125.5:.2f}',
+            'status': 'new',
+        }
+
+
+def _write(path, file_format, count):
+    with open(path, 'w', newline='') as f:
+        if file_format == 'csv':
+            writer = None
+            for row in _rows(count):
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(row))
+                    writer.writeheader()
+                writer.writerow(row)
+        else:
+            for row in _rows(count):
+                f.write(json.dumps(row) + '\n')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    file_format = sys.argv[2] if len(sys.argv) > 2 else 'csv'
+
+    app = make_app()
+    with app.app_context():
+        owner_id = seed(owners=1, rows_per_owner=1000)[0]
+        with db.engine.begin() as connection:
+            search.install(connection)
+
+        fd, path = tempfile.mkstemp(suffix=f'.{file_format}')
+        os.close(fd)
+        _write(path, file_format, rows)
+        size = os.path.getsize(path)
+
+        job = ImportJob(owner_id=owner_id, entity_type='leads', file_format=file_format)
+        db.session.add(job)
+        db.session.commit()
+
+        start = time.perf_counter()
+        job = importer.run(job.id, path, chunk_size=Config.IMPORT_CHUNK_SIZE)
+        elapsed = time.perf_counter() - start
+
+        print(f"{rows:,} leads, {size / 2**20:.1f} MiB {file_format}: {job.status} in {elapsed:.1f}s "
+              f"= {rows / elapsed:,.0f} rows/s")
+        print(f"inserted {job.inserted:,}, skipped {job.skipped:,} duplicate emails, "
+              f"failed {job.failed:,}, {len(job.errors)} errors kept")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+GeminiCRM Pro - JSON Encoding and Compression Benchmark
+Time to turn the to_dict() payloads of the big list endpoints into a response
+body with the stdlib and orjson providers (services/json_provider.py), then
+the size and cost of each encoding services/compression.py can apply to it.
+
+Usage: python -m benchmarks.bench_json [rows]
+"""
+import sys
+
+from benchmarks.common import make_app, seed, timed
+from models.db_models import Account, Lead, Opportunity, Task
+from models.serializers import eager_query, serialize_many
+from services import compression
+from services.json_provider import OrjsonProvider, StdlibJSONProvider
+
+ENDPOINTS = (
+    ('leads', Lead),
+    ('accounts', Account),
+    ('opportunities', Opportunity),
+    ('tasks', Task),
+)
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    app = make_app()
+    with app.app_context():
+        owner_id = seed(owners=1, rows_per_owner=rows)[0]
+        providers = {'stdlib': StdlibJSONProvider(app), 'orjson': OrjsonProvider(app)}
+
+        print(f"{rows:,} records per response, best of 5")
+        print(f"{'endpoint':>13} | {'to_dict ms':>10} | {'stdlib ms':>9} | {'orjson ms':>9} | {'speedup':>7} | "
+              f"{'KiB':>6} | " + ' | '.join(f'{e + " KiB / ms":>15}' for e in compression.ENCODINGS))
+        for name, model in ENDPOINTS:
+            records = eager_query(model).filter_by(owner_id=owner_id).limit(rows).all()
+            to_dict = timed(lambda: serialize_many(records))
+            payload = {'success': True, name: serialize_many(records)}
+
+            encode = {label: timed(lambda: provider.response(payload)) for label, provider in providers.items()}
+            body = providers['orjson'].response(payload).get_data()
+            assert providers['stdlib'].loads(body) == providers['stdlib'].response(payload).get_json()
+
+            encoded = []
+            for encoding in compression.ENCODINGS:
+                size = len(compression.compress(body, encoding))
+                elapsed = timed(lambda: compression.compress(body, encoding))
+                encoded.append(f'{size / 1024:>7.1f} / {elapsed:>5.2f}')
+
+            print(f"{name:>13} | {to_dict:>10.2f} | {encode['stdlib']:>9.2f} | {encode['orjson']:>9.2f} | "
+                  f"{encode['stdlib'] / encode['orjson']:>6.1f}x | {len(body) / 1024:>6.1f} | " + ' | '.join(encoded))
+
+
+if __name__ == '__main__':
+    main()
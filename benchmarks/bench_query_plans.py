@@ -0,0 +1,68 @@
+"""
+GeminiCRM Pro - Owner-Scoped Query Plan Benchmark
+Shows SQLite query plans and timings for the list queries with and without
+the composite indexes from alembic/versions/0001_owner_scoped_indexes.py
+
+Usage: python -m benchmarks.bench_query_plans [rows_per_owner]
+"""
+import sys
+
+from sqlalchemy import text
+
+from benchmarks.common import make_app, seed, timed
+from models.db_models import db
+
+# Mirrors the list routes in app.py
+QUERIES = {
+    'api_get_leads': "SELECT * FROM leads WHERE owner_id = :owner ORDER BY created_at DESC",
+    'api_get_contacts': "SELECT * FROM contacts WHERE owner_id = :owner ORDER BY created_at DESC",
+    'api_get_tasks': "SELECT * FROM tasks WHERE owner_id = :owner ORDER BY due_date ASC",
+    'api_get_activities': "SELECT * FROM activities WHERE owner_id = :owner ORDER BY created_at DESC LIMIT 50",
+    'api_get_notifications': "SELECT * FROM notifications WHERE user_id = :owner ORDER BY created_at DESC LIMIT 50",
+    'unread_count': "SELECT count(*) FROM notifications WHERE user_id = :owner AND is_read = 0",
+    'pipeline_by_stage': "SELECT stage, count(*), sum(amount) FROM opportunities WHERE owner_id = :owner GROUP BY stage",
+    'related_tasks': "SELECT * FROM tasks WHERE related_to_type = 'account' AND related_to_id = :related",
+}
+
+
+def _composite_indexes():
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            if len(index.columns) > 1:
+                yield index
+
+
+def _report(label, owner_id):
+    print(f"\n--- {label} ---")
+    params = {'owner': owner_id, 'related': f'{owner_id}-acc-7'}
+    for name, sql in QUERIES.items():
+        plan = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params).fetchall()
+        ms = timed(lambda: db.session.execute(text(sql), params).fetchall())
+        print(f"{name:24s} {ms:8.2f} ms  | " + '; '.join(row[-1] for row in plan))
+
+
+def main():
+    rows_per_owner = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    app = make_app()
+
+    with app.app_context():
+        print(f"Seeding 5 owners x {rows_per_owner} rows per table...")
+        owner_ids = seed(owners=5, rows_per_owner=rows_per_owner)
+        owner_id = owner_ids[2]
+
+        indexes = list(_composite_indexes())
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.drop(conn)
+        db.session.execute(text("ANALYZE"))
+        _report('before: single-column indexes only', owner_id)
+
+        with db.engine.begin() as conn:
+            for index in indexes:
+                index.create(conn)
+        db.session.execute(text("ANALYZE"))
+        _report('after: composite owner-scoped indexes', owner_id)
+
+
+if __name__ == '__main__':
+    main()
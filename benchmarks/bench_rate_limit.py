@@ -0,0 +1,54 @@
+"""
+GeminiCRM Pro - Rate Limiter Benchmark
+Checks per second of services/rate_limit.py with the default three windows,
+for one hot key and for many, with each backend. Redis is measured when
+REDIS_URL (default redis://localhost:6379/0) answers; its keys are cleared.
+
+Usage: python -m benchmarks.bench_rate_limit [checks]
+"""
+import os
+import sys
+import time
+
+from services.rate_limit import LocalBackend, RedisBackend, SlidingWindowLimiter
+
+# High enough that every check is allowed and counted
+LIMITS = '1000000000/minute;1000000000/hour;1000000000/day'
+
+
+def backends():
+    yield 'local', LocalBackend()
+    url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    try:
+        backend = RedisBackend.from_url(url, prefix='geminicrm:bench:')
+        backend.client.ping()
+    except Exception as e:
+        print(f"redis: skipped, {url} not reachable ({type(e).__name__})")
+        return
+    yield 'redis', backend
+
+
+def main():
+    checks = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+
+    print(f"{checks:,} checks, 3 windows each")
+    print(f"{'backend':>8} | {'keys':>7} | {'checks/s':>10} | {'us/check':>8} | {'keys held':>9}")
+    for name, backend in backends():
+        # A network round trip per check: fewer of them are plenty
+        count = checks if name == 'local' else max(1, checks // 20)
+        for keys in (1, 10000):
+            backend.clear()
+            limiter = SlidingWindowLimiter(LIMITS, backend)
+            names = [f'user:{n}' for n in range(keys)]
+            started = time.perf_counter()
+            for n in range(count):
+                limiter.hit(names[n % keys])
+            elapsed = time.perf_counter() - started
+            assert limiter.counters == {'allowed': count, 'limited': 0}
+            held = len(backend) if hasattr(backend, '__len__') else '-'
+            print(f"{name:>8} | {keys:>7,} | {count / elapsed:>10,.0f} | {elapsed / count * 1e6:>8.2f} | {held:>9}")
+        backend.clear()
+
+
+if __name__ == '__main__':
+    main()
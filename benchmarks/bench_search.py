@@ -0,0 +1,56 @@
+"""
+GeminiCRM Pro - Global Search Benchmark
+Latency of the old four-table ILIKE scan against the full-text index in
+services/search.py, for typed-as-you-go queries over N searchable records
+(leads + contacts + opportunities + accounts)
+
+Usage: python -m benchmarks.bench_search [records]
+"""
+import statistics
+import sys
+import time
+
+from benchmarks.common import make_app, seed
+from models.db_models import db
+from services import search
+
+QUERIES = ['le', 'lead 4', 'first1234', 'company 9999', 'deal 31415', 'c42@bench', 'no such thing']
+
+
+def _latencies(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    owners = 4
+    per_owner = max(1, records // (owners * 4))
+
+    app = make_app()
+    with app.app_context():
+        start = time.perf_counter()
+        owner_id = seed(owners=owners, rows_per_owner=per_owner)[0]
+        seeded = time.perf_counter() - start
+        start = time.perf_counter()
+        with db.engine.begin() as connection:
+            search.install(connection)
+        indexed = time.perf_counter() - start
+        print(f"{per_owner * owners * 4:,} searchable records: seeded in {seeded:.0f}s, indexed in {indexed:.0f}s")
+        print(f"{'query':>15} | {'ilike p50':>10} {'p95':>8} | {'fts p50':>8} {'p95':>8} | hits")
+
+        for query in QUERIES:
+            ilike = _latencies(lambda: search._search_ilike(owner_id, query, 20), repeat=5)
+            fts = _latencies(lambda: search.search(owner_id, query, 20), repeat=50)
+            hits = len(search.search(owner_id, query, 20))
+            print(f"{query!r:>15} | {ilike[0]:>10.1f} {ilike[1]:>8.1f} | {fts[0]:>8.2f} {fts[1]:>8.2f} | {hits}")
+            db.session.expunge_all()
+
+
+if __name__ == '__main__':
+    main()
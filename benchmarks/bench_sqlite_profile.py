@@ -0,0 +1,94 @@
+"""
+GeminiCRM Pro - SQLite Profile Benchmark
+Concurrent read/write throughput with SQLite driver defaults (rollback
+journal, one shared pool) against the production profile from
+models/engine.py (WAL, tuned pragmas, separate read and write pools)
+
+Usage: python -m benchmarks.bench_sqlite_profile [seconds] [readers] [writers]
+"""
+import sys
+import threading
+import time
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from benchmarks.common import make_app, seed
+from models.db_models import db, generate_uuid, get_current_time
+from models.engine import READ_BIND
+
+READ_SQL = text(
+    'SELECT id, name, status, score FROM leads WHERE owner_id = :owner '
+    'ORDER BY created_at DESC, id DESC LIMIT 50'
+)
+WRITE_SQL = text(
+    'INSERT INTO leads (id, name, status, score, owner_id, created_at, updated_at) '
+    'VALUES (:id, :name, :status, 50, :owner, :now, :now)'
+)
+
+
+def run(profile, seconds, readers, writers, rows):
+    production = profile == 'production'
+    app = make_app(SQLITE_PRODUCTION_MODE=production, SQLITE_BUSY_TIMEOUT_MS=5000)
+    with app.app_context():
+        owner_id = seed(owners=1, rows_per_owner=rows)[0]
+        write_engine = db.engines[None]
+        read_engine = db.engines.get(READ_BIND, write_engine)
+
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def reader():
+        done = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                with read_engine.connect() as conn:
+                    conn.execute(READ_SQL, {'owner': owner_id}).fetchall()
+                done += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counts['reads'] += done
+            counts['errors'] += errors
+
+    def writer():
+        done = errors = 0
+        while time.perf_counter() < stop:
+            try:
+                with write_engine.begin() as conn:
+                    conn.execute(WRITE_SQL, {'id': generate_uuid(), 'name': 'Bench lead', 'status': 'new',
+                                             'owner': owner_id, 'now': get_current_time()})
+                done += 1
+            except OperationalError:
+                errors += 1
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads += [threading.Thread(target=writer) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    return {key: value / seconds if key != 'errors' else value for key, value in counts.items()}
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    writers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    print(f"{seconds:.0f}s, {readers} readers, {writers} writers")
+    print(f"{'profile':>10} | {'reads/s':>9} {'writes/s':>9} {'errors':>7}")
+    for profile in ('default', 'production'):
+        result = run(profile, seconds, readers, writers, rows=10000)
+        print(f"{profile:>10} | {result['reads']:>9.0f} {result['writes']:>9.0f} {result['errors']:>7}")
+
+
+if __name__ == '__main__':
+    main()
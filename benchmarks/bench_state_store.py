@@ -0,0 +1,74 @@
+"""
+GeminiCRM Pro - State Store Benchmark
+Operations per second of each services/state_store.py backend, for its
+primitives and for the manager calls ported onto it. Redis is measured when
+REDIS_URL (default redis://localhost:6379/0) answers; its keys are cleared.
+
+Usage: python -m benchmarks.bench_state_store [operations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from models.user_profile import ActivityLogger, NotificationManager
+from services.api_monitoring import APIMonitor, RateLimiter
+from services.state_store import MemoryBackend, RedisBackend, SQLiteBackend
+
+
+def backends():
+    yield 'memory', MemoryBackend()
+    yield 'sqlite', SQLiteBackend(os.path.join(tempfile.mkdtemp(prefix='geminicrm-bench-'), 'state.db'))
+    url = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    try:
+        backend = RedisBackend.from_url(url, prefix='geminicrm:bench:')
+        backend.client.ping()
+    except Exception as e:
+        print(f"redis: skipped, {url} not reachable ({type(e).__name__})")
+        return
+    yield 'redis', backend
+
+
+def cases(backend):
+    """name -> callable(n) doing the n-th operation"""
+    record = {'title': 'Follow up', 'message': 'Call back about the renewal', 'is_read': False, 'data': {'n': 0}}
+    monitor, limiter = APIMonitor(backend), RateLimiter(backend)
+    notifications, activity = NotificationManager(backend), ActivityLogger(backend)
+    return {
+        'put': lambda n: backend.put('bench', f'k{n % 1000}', record, 1000),
+        'get': lambda n: backend.get('bench', f'k{n % 1000}'),
+        'get_many(50)': lambda n: backend.get_many('bench', [f'k{i}' for i in range(n % 950, n % 950 + 50)]),
+        'append': lambda n: backend.append('bench', record, 1000),
+        'tail(100)': lambda n: backend.tail('bench', 100),
+        'incr': lambda n: backend.incr('bench', f'c{n % 100}', ttl=60),
+        'rate limit check': lambda n: (limiter.check_rate_limit(f'u{n % 100}'), limiter.record_request(f'u{n % 100}')),
+        'log_request': lambda n: monitor.log_request('u1', '/api/leads', 'GET', 200, 12.5),
+        'log_activity': lambda n: activity.log_activity('u1', {'action': 'view', 'resource_type': 'lead'}),
+        'create_notification': lambda n: notifications.create_notification(f'u{n % 100}', record),
+    }
+
+
+def main():
+    operations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    results = {}
+    for name, backend in backends():
+        backend.clear()
+        for case, operation in cases(backend).items():
+            started = time.perf_counter()
+            for n in range(operations):
+                operation(n)
+            # Batched appends count once they are written
+            backend.flush()
+            results.setdefault(case, {})[name] = operations / (time.perf_counter() - started)
+        backend.clear()
+
+    names = list(next(iter(results.values())))
+    print(f"{operations:,} operations each, ops/s")
+    print(f"{'operation':>20} | " + ' | '.join(f'{name:>10}' for name in names))
+    for case, rates in results.items():
+        print(f"{case:>20} | " + ' | '.join(f'{rates[name]:>10,.0f}' for name in names))
+
+
+if __name__ == '__main__':
+    main()
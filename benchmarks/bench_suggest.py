@@ -0,0 +1,68 @@
+"""
+GeminiCRM Pro - Type-Ahead Benchmark
+Per-keystroke latency of /api/search/suggest's in-memory prefix index
+against the full-text search query, plus the index's load time, memory and
+the cost of applying a committed change
+
+Usage: python -m benchmarks.bench_suggest [records]
+"""
+import statistics
+import sys
+import time
+
+from benchmarks.common import make_app, seed
+from models.db_models import db, Lead
+from services import search
+from services.autocomplete import autocomplete_index
+
+QUERIES = ['l', 'le', 'lead 4', 'first1234', 'company 9999', 'c42@bench', 'no such thing']
+
+
+def _latencies(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    per_owner = max(1, records // 4)
+
+    app = make_app()
+    with app.app_context():
+        owner_id = seed(owners=1, rows_per_owner=per_owner)[0]
+        with db.engine.begin() as connection:
+            search.install(connection)
+        autocomplete_index.init_app(app)
+
+        start = time.perf_counter()
+        autocomplete_index.suggest(owner_id, 'warm up')
+        loaded = time.perf_counter() - start
+        stats = autocomplete_index.stats()
+        print(f"{stats['entries']:,} records, {stats['tokens']:,} tokens: loaded in {loaded:.2f}s, "
+              f"~{stats['approx_bytes'] / 1024 / 1024:.1f} MiB")
+        print(f"{'query':>15} | {'fts p50':>8} {'p95':>8} | {'suggest p50':>11} {'p95':>8} | hits")
+
+        for query in QUERIES:
+            fts = _latencies(lambda: search.search(owner_id, query, 8), repeat=20)
+            suggest = _latencies(lambda: autocomplete_index.suggest(owner_id, query, 8), repeat=1000)
+            hits = len(autocomplete_index.suggest(owner_id, query, 8))
+            print(f"{query!r:>15} | {fts[0]:>8.2f} {fts[1]:>8.2f} | {suggest[0]:>11.4f} {suggest[1]:>8.4f} | {hits}")
+
+        # One committed rename: flush-event capture plus the sorted-array update
+        lead = db.session.get(Lead, f'{owner_id}-lead-1')
+        samples = []
+        for i in range(200):
+            lead.name = f'Renamed {i}'
+            start = time.perf_counter()
+            db.session.commit()
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"commit of one renamed lead (incl. index update): p50 {statistics.median(samples):.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+GeminiCRM Pro - Benchmark Helpers
+Standalone app factory and synthetic data loader shared by the benchmarks
+"""
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from models.db_models import (
+    db, User, Account, Contact, Lead, Opportunity, Task, Activity, Notification
+)
+from models.engine import configure_app, install_pragmas
+from services import pipeline_summary
+
+STAGES = ['prospecting', 'qualification', 'proposal', 'negotiation', 'closed_won', 'closed_lost']
+STATUSES = ['not_started', 'in_progress', 'completed']
+
+
+def make_app(db_path=None, **config):
+    """Create a bare Flask app bound to a throwaway SQLite file; config overrides app.config"""
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(suffix='.db', prefix='geminicrm-bench-')
+        os.close(fd)
+        os.unlink(db_path)
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config.update(config)
+    configure_app(app)
+    db.init_app(app)
+    with app.app_context():
+        install_pragmas(app, db.engines)
+        db.create_all()
+    return app
+
+
+def seed(owners=5, rows_per_owner=2000, batch_size=5000):
+    """Load synthetic CRM rows for `owners` users; returns the owner ids"""
+    rnd = random.Random(42)
+    now = datetime.utcnow()
+    owner_ids = []
+
+    for i in range(owners):
+        user = User(id=f'bench-{i}', email=f'bench{i}@example.com', first_name='Bench', last_name=str(i))
+        user.set_password('bench')
+        db.session.add(user)
+        owner_ids.append(user.id)
+    db.session.commit()
+
+    def insert(model, rows):
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(db.insert(model), rows[start:start + batch_size])
+        db.session.commit()
+
+    for owner_id in owner_ids:
+        accounts, contacts, leads, opps, tasks, activities, notifications = [], [], [], [], [], [], []
+        for n in range(rows_per_owner):
+            created = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+            account_id = f'{owner_id}-acc-{n}'
+            contact_id = f'{owner_id}-con-{n}'
+            accounts.append({'id': account_id, 'name': f'Company {n}', 'industry': 'Technology',
+                             'owner_id': owner_id, 'created_at': created, 'updated_at': created})
+            contacts.append({'id': contact_id, 'first_name': f'First{n}', 'last_name': f'Last{n}',
+                             'email': f'c{n}@{owner_id}.example.com', 'account_id': account_id,
+                             'owner_id': owner_id, 'created_at': created, 'updated_at': created})
+            leads.append({'id': f'{owner_id}-lead-{n}', 'name': f'Lead {n}', 'first_name': f'Lead{n}',
+                          'last_name': 'Person', 'email': f'l{n}@{owner_id}.example.com',
+                          'company': f'Prospect {n}', 'source': 'Website', 'status': 'new',
+                          'score': rnd.randint(0, 100), 'estimated_value': rnd.randint(1000, 100000),
+                          'owner_id': owner_id, 'created_at': created, 'updated_at': created})
+            opps.append({'id': f'{owner_id}-opp-{n}', 'name': f'Deal {n}', 'amount': rnd.randint(1000, 500000),
+                         'stage': rnd.choice(STAGES), 'probability': rnd.randint(0, 100),
+                         'account_id': account_id, 'contact_id': contact_id,
+                         'owner_id': owner_id, 'created_at': created, 'updated_at': created})
+            tasks.append({'id': f'{owner_id}-task-{n}', 'subject': f'Task {n}', 'status': rnd.choice(STATUSES),
+                          'due_date': now + timedelta(days=rnd.randint(-30, 30)),
+                          'related_to_type': 'account', 'related_to_id': account_id,
+                          'owner_id': owner_id, 'assigned_to_id': owner_id,
+                          'created_at': created, 'updated_at': created})
+            activities.append({'id': f'{owner_id}-act-{n}', 'subject': f'Call {n}', 'activity_type': 'call',
+                               'related_to_type': 'contact', 'related_to_id': contact_id,
+                               'owner_id': owner_id, 'created_at': created})
+            notifications.append({'id': f'{owner_id}-notif-{n}', 'user_id': owner_id, 'title': f'Notice {n}',
+                                  'is_read': rnd.random() < 0.8, 'related_to_type': 'lead',
+                                  'related_to_id': f'{owner_id}-lead-{n}', 'created_at': created})
+        insert(Account, accounts)
+        insert(Contact, contacts)
+        insert(Lead, leads)
+        insert(Opportunity, opps)
+        insert(Task, tasks)
+        insert(Activity, activities)
+        insert(Notification, notifications)
+
+    # Raw inserts bypass the write paths that maintain the rollup
+    pipeline_summary.rebuild()
+    db.session.commit()
+    return owner_ids
+
+
+def timed(fn, repeat=5):
+    """Best-of-N wall time of fn() in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
@@ -37,3 +37,96 @@ class Config:
     
     # Task Types
     TASK_TYPES = ['Call', 'Email', 'Meeting', 'Follow-up', 'Demo', 'Other']
+    
+    # API Pagination (keyset cursors, see services/pagination.py)
+    API_PAGE_SIZE_DEFAULT = int(os.environ.get('API_PAGE_SIZE_DEFAULT', 100))
+    API_PAGE_SIZE_MAX = int(os.environ.get('API_PAGE_SIZE_MAX', 500))
+
+    # Bulk write endpoints (/api/<entity>/bulk)
+    BULK_MAX_RECORDS = int(os.environ.get('BULK_MAX_RECORDS', 10000))
+
+    # Write-behind audit log (services/audit_writer.py); synchronous mode commits each row inline
+    AUDIT_SYNCHRONOUS = os.environ.get('AUDIT_SYNCHRONOUS', 'false').lower() == 'true'
+    AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+    AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 500))
+    AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 1.0))
+    AUDIT_ENQUEUE_TIMEOUT = float(os.environ.get('AUDIT_ENQUEUE_TIMEOUT', 5.0))
+
+    # Database engines (models/engine.py)
+    # SQLite production mode: WAL, tuned pragmas, separate read and write pools
+    SQLITE_PRODUCTION_MODE = os.environ.get('SQLITE_PRODUCTION_MODE', 'true').lower() == 'true'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+    SQLITE_WRITE_POOL_SIZE = int(os.environ.get('SQLITE_WRITE_POOL_SIZE', 5))
+    SQLITE_WRITE_MAX_OVERFLOW = int(os.environ.get('SQLITE_WRITE_MAX_OVERFLOW', 5))
+    SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 10))
+    SQLITE_READ_MAX_OVERFLOW = int(os.environ.get('SQLITE_READ_MAX_OVERFLOW', 10))
+    # PostgreSQL pool
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    # Read replica for @read_replica views; reads stay on the primary this long after a user writes
+    DATABASE_REPLICA_URL = os.environ.get('DATABASE_REPLICA_URL')
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+    # Streaming export (/api/export/<entity_type>): rows fetched and serialized per batch
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+    # Parquet / Arrow exports: rows per row group (record batch), held in memory as Arrow arrays
+    EXPORT_ROW_GROUP_SIZE = int(os.environ.get('EXPORT_ROW_GROUP_SIZE', 50000))
+
+    # Response encoding: JSON backend for jsonify and request bodies (orjson, or stdlib; orjson
+    # falls back to stdlib when not installed), and gzip/brotli for buffered responses this big
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+    # Redis, for the shared read cache, invalidation bus, rate limit and state store backends
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    # Read cache for dashboard, report and list responses (services/read_cache.py):
+    # memory (per process, least recently used out past READ_CACHE_MAX_MB), redis (shared
+    # by all workers, evicted by Redis's maxmemory-policy) or none
+    READ_CACHE_BACKEND = os.environ.get('READ_CACHE_BACKEND', 'memory')
+    READ_CACHE_TTL = int(os.environ.get('READ_CACHE_TTL', 300))
+    READ_CACHE_MAX_MB = int(os.environ.get('READ_CACHE_MAX_MB', 64))
+
+    # Cross-worker invalidation of in-process caches (services/invalidation.py): unix (datagram
+    # sockets between the workers of one host), redis (pub/sub across hosts) or none
+    INVALIDATION_BUS = os.environ.get('INVALIDATION_BUS', 'unix')
+    INVALIDATION_SOCKET_DIR = os.environ.get('INVALIDATION_SOCKET_DIR')
+
+    # API rate limits (services/rate_limit.py), per signed-in user or client address, on every
+    # request under RATE_LIMIT_PATH_PREFIX: local (counted per worker process), redis (shared by
+    # all workers) or none. Signed-in requests from the app's own pages count against
+    # UI_RATE_LIMITS instead (empty: RATE_LIMITS too). The Gemini-backed /api/ai routes also share
+    # AI_RATE_LIMITS; /api/search/suggest, called as the user types, counts against SUGGEST_RATE_LIMITS
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'local')
+    RATE_LIMITS = os.environ.get('RATE_LIMITS', '60/minute;1000/hour;10000/day')
+    UI_RATE_LIMITS = os.environ.get('UI_RATE_LIMITS', '30/second;1200/minute;30000/hour')
+    RATE_LIMIT_PATH_PREFIX = os.environ.get('RATE_LIMIT_PATH_PREFIX', '/api/')
+    AI_RATE_LIMITS = os.environ.get('AI_RATE_LIMITS', '10/minute;200/day')
+    SUGGEST_RATE_LIMITS = os.environ.get('SUGGEST_RATE_LIMITS', '15/second;300/minute;5000/hour')
+
+    # Records, logs and counters of the service managers (services/state_store.py): memory (per
+    # process), sqlite (a file shared by the workers of one host, instance/state.db by default) or
+    # redis; log appends are written in batches of STATE_BATCH_SIZE or every STATE_FLUSH_INTERVAL s
+    STATE_BACKEND = os.environ.get('STATE_BACKEND', 'memory')
+    STATE_SQLITE_PATH = os.environ.get('STATE_SQLITE_PATH')
+    STATE_BATCH_SIZE = int(os.environ.get('STATE_BATCH_SIZE', 100))
+    STATE_FLUSH_INTERVAL = float(os.environ.get('STATE_FLUSH_INTERVAL', 1.0))
+
+    # Import pipeline (/api/import/<entity_type>): rows per transaction, worker threads,
+    # and how many per-row errors a job keeps
+    IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', 5000))
+    IMPORT_WORKERS = int(os.environ.get('IMPORT_WORKERS', 2))
+    IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', 1000))
+
+    # Type-ahead index (services/autocomplete.py): entries held across all owners, and
+    # how long an owner's index is trusted before reloading (picks up other workers' writes)
+    SUGGEST_MAX_ENTRIES = int(os.environ.get('SUGGEST_MAX_ENTRIES', 500000))
+    SUGGEST_MAX_AGE = float(os.environ.get('SUGGEST_MAX_AGE', 300))
@@ -0,0 +1,55 @@
+"""
+GeminiCRM Pro - Shared Test Fixtures
+Endpoint tests drive app.py itself through its test client. config.py reads
+the environment when it is imported, so the database and the process-wide
+services are pointed at a throwaway directory before any test module loads.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+import uuid
+
+import pytest
+
+_directory = tempfile.mkdtemp(prefix='geminicrm-test-')
+atexit.register(shutil.rmtree, _directory, ignore_errors=True)
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_directory, 'crm.db')}"
+# Endpoint tests fire requests far faster than RATE_LIMITS allows; test_rate_limit.py covers limiting
+os.environ.setdefault('RATE_LIMIT_BACKEND', 'none')
+os.environ.setdefault('INVALIDATION_BUS', 'none')
+# The read pool's bind would stay in the shared db's metadatas and break create_all() in the
+# single-engine apps other test modules build; test_read_replica.py covers read routing
+os.environ.setdefault('SQLITE_PRODUCTION_MODE', 'false')
+
+
+@pytest.fixture(scope='session')
+def crm_app():
+    """app.py's app, on the throwaway database"""
+    import app as crm
+    assert crm.app.config['SQLALCHEMY_DATABASE_URI'] == os.environ['DATABASE_URL']
+    return crm.app
+
+
+@pytest.fixture
+def owner(crm_app):
+    """A new user with no records; its id"""
+    from models.db_models import db, User
+    with crm_app.app_context():
+        user = User(email=f'{uuid.uuid4().hex[:12]}@example.com', first_name='Test', last_name='Owner')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def client(crm_app, owner):
+    """Test client signed in as owner"""
+    from models.db_models import db, User
+    client = crm_app.test_client()
+    with crm_app.app_context():
+        email = db.session.get(User, owner).email
+    response = client.post('/login', data={'email': email, 'password': 'secret'})
+    assert response.status_code == 302
+    return client
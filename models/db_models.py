@@ -4,12 +4,15 @@ Real persistent database with SQLite
 """
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
+from sqlalchemy.exc import IntegrityError
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import uuid
 import json
 
-db = SQLAlchemy()
+from models.engine import RoutingSession, configure_app, install_pragmas
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 # ==================== HELPER FUNCTIONS ====================
 
@@ -88,6 +91,9 @@ class User(db.Model, UserMixin):
 class Account(db.Model):
     """Account/Company model - central to all relationships"""
     __tablename__ = 'accounts'
+    __table_args__ = (
+        db.Index('ix_accounts_owner_created', 'owner_id', 'created_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     name = db.Column(db.String(255), nullable=False, index=True)
@@ -130,7 +136,13 @@ class Account(db.Model):
     activities = db.relationship('Activity', backref='account', lazy='dynamic')
     children = db.relationship('Account', backref=db.backref('parent', remote_side=[id]))
     
-    def to_dict(self):
+    def to_dict(self, contacts_count=None, opportunities_count=None):
+        # List endpoints pass batched counts (models/serializers.py) to skip the per-row COUNTs
+        if contacts_count is None:
+            contacts_count = self.contacts.count()
+        if opportunities_count is None:
+            opportunities_count = self.opportunities.count()
+
         return {
             'id': self.id,
             'name': self.name,
@@ -146,8 +158,8 @@ class Account(db.Model):
             'billing_country': self.billing_country,
             'owner_id': self.owner_id,
             'owner_name': self.owner.full_name if self.owner else None,
-            'contacts_count': self.contacts.count(),
-            'opportunities_count': self.opportunities.count(),
+            'contacts_count': contacts_count,
+            'opportunities_count': opportunities_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
         }
@@ -158,6 +170,9 @@ class Account(db.Model):
 class Contact(db.Model):
     """Contact model - individuals at accounts"""
     __tablename__ = 'contacts'
+    __table_args__ = (
+        db.Index('ix_contacts_owner_created', 'owner_id', 'created_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     first_name = db.Column(db.String(100), nullable=False)
@@ -208,7 +223,8 @@ class Contact(db.Model):
     
     @property
     def initials(self):
-        return f"{self.first_name[0]}{self.last_name[0]}".upper()
+        # Either name may be blank (imports default them to '')
+        return ((self.first_name or '')[:1] + (self.last_name or '')[:1]).upper()
     
     def to_dict(self):
         return {
@@ -244,6 +260,9 @@ class Contact(db.Model):
 class Lead(db.Model):
     """Lead model - potential customers not yet converted"""
     __tablename__ = 'leads'
+    __table_args__ = (
+        db.Index('ix_leads_owner_created', 'owner_id', 'created_at'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     first_name = db.Column(db.String(100))
@@ -315,10 +334,11 @@ class Lead(db.Model):
     
     @property
     def score_grade(self):
-        if self.score >= 80: return 'A'
-        if self.score >= 60: return 'B'
-        if self.score >= 40: return 'C'
-        if self.score >= 20: return 'D'
+        score = self.score or 0  # NULL on rows imported before imports applied column defaults
+        if score >= 80: return 'A'
+        if score >= 60: return 'B'
+        if score >= 40: return 'C'
+        if score >= 20: return 'D'
         return 'F'
     
     def to_dict(self):
@@ -362,6 +382,10 @@ class Lead(db.Model):
 class Opportunity(db.Model):
     """Opportunity/Deal model - sales opportunities"""
     __tablename__ = 'opportunities'
+    __table_args__ = (
+        db.Index('ix_opportunities_owner_created', 'owner_id', 'created_at'),
+        db.Index('ix_opportunities_owner_stage', 'owner_id', 'stage'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     name = db.Column(db.String(255), nullable=False, index=True)
@@ -467,6 +491,39 @@ class Opportunity(db.Model):
         }
 
 
+# ==================== PIPELINE SUMMARY MODEL ====================
+
+class PipelineSummary(db.Model):
+    """Per-owner, per-stage opportunity rollup maintained by services/pipeline_summary.py"""
+    __tablename__ = 'pipeline_summaries'
+    
+    owner_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    stage = db.Column(db.String(50), primary_key=True)  # 'unknown' for opportunities without a stage
+    count = db.Column(db.Integer, nullable=False, default=0)
+    value = db.Column(db.Float, nullable=False, default=0)
+    weighted_value = db.Column(db.Float, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=get_current_time, onupdate=get_current_time)
+    
+    def to_dict(self):
+        return {
+            'stage': self.stage,
+            'count': self.count,
+            'value': self.value,
+            'weighted_value': self.weighted_value,
+        }
+
+
+# ==================== DATA VERSION MODEL ====================
+
+class DataVersion(db.Model):
+    """Per-owner write counter maintained by services/data_version.py; ETags are derived from it"""
+    __tablename__ = 'data_versions'
+
+    owner_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=get_current_time, onupdate=get_current_time)
+
+
 # ==================== PRODUCT MODEL ====================
 
 class Product(db.Model):
@@ -542,6 +599,10 @@ class OpportunityLineItem(db.Model):
 class Task(db.Model):
     """Task/To-do model"""
     __tablename__ = 'tasks'
+    __table_args__ = (
+        db.Index('ix_tasks_owner_due_status', 'owner_id', 'due_date', 'status'),
+        db.Index('ix_tasks_related_to', 'related_to_type', 'related_to_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     subject = db.Column(db.String(255), nullable=False)
@@ -621,6 +682,10 @@ class Task(db.Model):
 class Activity(db.Model):
     """Activity log for all interactions"""
     __tablename__ = 'activities'
+    __table_args__ = (
+        db.Index('ix_activities_owner_created', 'owner_id', 'created_at'),
+        db.Index('ix_activities_related_to', 'related_to_type', 'related_to_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     subject = db.Column(db.String(255), nullable=False)
@@ -716,6 +781,10 @@ class EmailTemplate(db.Model):
 class Notification(db.Model):
     """User notifications"""
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_user_read_created', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_notifications_related_to', 'related_to_type', 'related_to_id'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -797,14 +866,65 @@ class AuditLog(db.Model):
         }
 
 
+# ==================== IMPORT JOB MODEL ====================
+
+class ImportJob(db.Model):
+    """Progress of one file import run by services/importer.py"""
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    owner_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    entity_type = db.Column(db.String(50), nullable=False)  # leads, contacts, accounts, opportunities, tasks
+    file_format = db.Column(db.String(10), nullable=False)  # csv, ndjson, json
+    filename = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+
+    # Counts so far; updated in the same transaction as each inserted chunk
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    inserted = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)  # duplicate emails
+    failed = db.Column(db.Integer, nullable=False, default=0)   # rows that did not validate
+    errors = db.Column(db.JSON, default=list)  # [{row, errors: {field: message}}], capped
+    error = db.Column(db.Text)  # why the whole job failed
+
+    created_at = db.Column(db.DateTime, default=get_current_time)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        elapsed = None
+        if self.started_at:
+            elapsed = ((self.finished_at or get_current_time()) - self.started_at).total_seconds()
+        return {
+            'id': self.id,
+            'entity_type': self.entity_type,
+            'format': self.file_format,
+            'filename': self.filename,
+            'status': self.status,
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'errors': self.errors or [],
+            'error': self.error,
+            'rows_per_second': round(self.processed / elapsed) if elapsed else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
 # ==================== INITIALIZE DATABASE ====================
 
 def init_db(app):
     """Initialize database with app"""
+    configure_app(app)
     db.init_app(app)
     
     with app.app_context():
+        install_pragmas(app, db.engines)
         db.create_all()
+        _backfill_pipeline_summary()
         
         # Create default admin user if not exists
         admin = User.query.filter_by(email='admin@geminicrm.com').first()
@@ -841,6 +961,24 @@ def init_db(app):
             _create_sample_data(admin.id)
 
 
+def _backfill_pipeline_summary():
+    """
+    Build the pipeline rollup when it is empty but opportunities exist: only
+    migration 0002 backfills it, and create_all() makes the table empty
+    """
+    if PipelineSummary.query.first() is not None or Opportunity.query.first() is None:
+        return
+    from services import pipeline_summary
+    try:
+        rows = pipeline_summary.rebuild()
+        db.session.commit()
+    except IntegrityError:
+        # Another worker starting at the same time built it first
+        db.session.rollback()
+        return
+    print(f"✅ Pipeline summary rebuilt ({rows} rows)")
+
+
 def _create_sample_data(owner_id):
     """Create sample data for demo purposes"""
     from datetime import datetime, timedelta
@@ -882,7 +1020,7 @@ def _create_sample_data(owner_id):
     ]
     
     for lead_data in leads_data:
-        lead = Lead(owner_id=owner_id, **lead_data)
+        lead = Lead(owner_id=owner_id, name=f"{lead_data['first_name']} {lead_data['last_name']}", **lead_data)
         db.session.add(lead)
     
     # Sample Opportunities (Deals)
@@ -911,6 +1049,11 @@ def _create_sample_data(owner_id):
         task = Task(owner_id=owner_id, **task_data)
         db.session.add(task)
     
+    db.session.flush()
+    
+    from services import pipeline_summary
+    pipeline_summary.rebuild(owner_id)
+    
     db.session.commit()
     print("✅ Sample data created (5 accounts, 6 contacts, 5 leads, 5 opportunities, 5 tasks)")
 
@@ -0,0 +1,143 @@
+"""
+GeminiCRM Pro - Database Engine Settings
+Connection pool sizing and per-connection tuning for SQLite and PostgreSQL,
+driven by Config
+"""
+import time
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Bind key of the query_only SQLite engine used for reads in production mode
+READ_BIND = 'read'
+# Bind key of DATABASE_REPLICA_URL, when one is configured
+REPLICA_BIND = 'replica'
+
+
+def _is_file_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(config, uri):
+    """SQLALCHEMY_ENGINE_OPTIONS for the primary (read-write) engine"""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+
+    if backend == 'postgresql':
+        timeout = config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+        options = {
+            'pool_size': config.get('DB_POOL_SIZE', 10),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 20),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        }
+        if timeout:
+            options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+        return options
+
+    if _is_file_sqlite(url) and config.get('SQLITE_PRODUCTION_MODE'):
+        return {
+            'pool_size': config.get('SQLITE_WRITE_POOL_SIZE', 5),
+            'max_overflow': config.get('SQLITE_WRITE_MAX_OVERFLOW', 5),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            # busy_timeout is set by pragma; this only covers the first connect
+            'connect_args': {'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000},
+        }
+    return {}
+
+
+def configure_app(app):
+    """Fill in engine options, plus a separate read pool for production SQLite"""
+    config = app.config
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    # Explicit SQLALCHEMY_ENGINE_OPTIONS still win over the profile
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(config, uri), **config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
+
+    url = make_url(uri)
+    binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+    replica_uri = config.get('DATABASE_REPLICA_URL')
+    if replica_uri:
+        binds.setdefault(REPLICA_BIND, {'url': replica_uri, **engine_options(config, replica_uri)})
+    if _is_file_sqlite(url) and config.get('SQLITE_PRODUCTION_MODE'):
+        binds.setdefault(READ_BIND, {
+            'url': uri,
+            'pool_size': config.get('SQLITE_READ_POOL_SIZE', 10),
+            'max_overflow': config.get('SQLITE_READ_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            'connect_args': {'timeout': config.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000},
+        })
+    if binds:
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def install_pragmas(app, engines):
+    """Tune every new SQLite connection; call before the engines first connect"""
+    config = app.config
+    if not config.get('SQLITE_PRODUCTION_MODE'):
+        return
+
+    for bind_key, engine in engines.items():
+        if not _is_file_sqlite(engine.url):
+            continue
+        pragmas = [
+            'PRAGMA journal_mode=WAL',
+            f"PRAGMA synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+            f"PRAGMA busy_timeout={int(config.get('SQLITE_BUSY_TIMEOUT_MS', 5000))}",
+            f"PRAGMA cache_size=-{int(config.get('SQLITE_CACHE_SIZE_KB', 65536))}",
+            f"PRAGMA mmap_size={int(config.get('SQLITE_MMAP_SIZE', 268435456))}",
+            'PRAGMA temp_store=MEMORY',
+        ]
+        if bind_key in (READ_BIND, REPLICA_BIND):
+            pragmas.append('PRAGMA query_only=ON')
+
+        def on_connect(dbapi_connection, connection_record, pragmas=pragmas):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+        event.listen(engine, 'connect', on_connect)
+
+
+# ==================== READ REPLICA ROUTING ====================
+
+def read_replica(view):
+    """Let a view's SELECTs go to the replica (or SQLite read pool) unless the user just wrote"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.read_replica = session.get('_primary_until', 0) < time.time()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+class RoutingSession(Session):
+    """
+    Session that sends SELECTs from @read_replica views to the replica engine.
+
+    Flushes and DML always use the primary. The first write in a request pins
+    the rest of it to the primary, and marks the user's session so their
+    reads stay there for REPLICA_STICKY_SECONDS while the replica catches up.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context():
+            if self._flushing or (clause is not None and getattr(clause, 'is_dml', False)):
+                self._remember_write()
+            elif g.get('read_replica') and not self.info.get('wrote') and getattr(clause, 'is_select', False):
+                engine = self._db.engines.get(REPLICA_BIND) or self._db.engines.get(READ_BIND)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _remember_write(self):
+        if self.info.get('wrote'):
+            return
+        self.info['wrote'] = True
+        if REPLICA_BIND in self._db.engines or READ_BIND in self._db.engines:
+            session['_primary_until'] = time.time() + current_app.config.get('REPLICA_STICKY_SECONDS', 5)
@@ -0,0 +1,208 @@
+"""
+GeminiCRM Pro - List Serialization
+Eager-loading rules and batched child counts so list endpoints issue a fixed
+number of queries no matter how many rows they return, plus sparse fieldsets
+that load only the columns a client asked for
+"""
+from datetime import date
+
+from sqlalchemy import func, literal, select, union_all
+from sqlalchemy.orm import configure_mappers, joinedload, load_only
+
+from models.db_models import db, Account, Contact, Opportunity
+
+# Many-to-one relationships each model's to_dict() reads
+EAGER_RELATIONS = {
+    'Account': ('owner',),
+    'Contact': ('owner', 'account'),
+    'Lead': ('owner',),
+    'Opportunity': ('owner', 'account', 'primary_contact'),
+    'Task': ('owner', 'assigned_to'),
+    'Activity': ('owner',),
+    'AuditLog': ('user',),
+}
+
+
+def eager_options(model):
+    """Loader options that preload everything model.to_dict() touches"""
+    # Resolved per call: backref attributes only exist once mappers are configured
+    configure_mappers()
+    return [joinedload(getattr(model, name)) for name in EAGER_RELATIONS.get(model.__name__, ())]
+
+
+def eager_query(model):
+    """model.query with the to_dict() relations joined in"""
+    return model.query.options(*eager_options(model))
+
+
+def account_child_counts(account_ids):
+    """Contact and opportunity counts for a page of accounts in one round trip"""
+    counts = {account_id: {'contacts': 0, 'opportunities': 0} for account_id in account_ids}
+    if not counts:
+        return counts
+
+    ids = list(counts)
+    stmt = union_all(
+        select(literal('contacts').label('kind'), Contact.account_id, func.count())
+        .where(Contact.account_id.in_(ids)).group_by(Contact.account_id),
+        select(literal('opportunities').label('kind'), Opportunity.account_id, func.count())
+        .where(Opportunity.account_id.in_(ids)).group_by(Opportunity.account_id),
+    )
+    for kind, account_id, count in db.session.execute(stmt):
+        counts[account_id][kind] = count
+    return counts
+
+
+def serialize_many(items):
+    """to_dict() a page of model instances, batching per-row aggregate lookups"""
+    if not items:
+        return []
+
+    if isinstance(items[0], Account):
+        counts = account_child_counts([a.id for a in items])
+        return [
+            a.to_dict(
+                contacts_count=counts[a.id]['contacts'],
+                opportunities_count=counts[a.id]['opportunities']
+            )
+            for a in items
+        ]
+
+    return [item.to_dict() for item in items]
+
+
+# ==================== SPARSE FIELDSETS ====================
+
+class InvalidProjection(ValueError):
+    """Raised for an unknown field or projection name"""
+
+
+def _name(relation):
+    return lambda obj: getattr(obj, relation).full_name if getattr(obj, relation) else None
+
+
+def _account_name(obj):
+    return obj.account.name if obj.account else None
+
+
+# Computed to_dict() keys: key -> (columns read, relationship joined, getter)
+DERIVED_FIELDS = {
+    'Account': {
+        'owner_name': (('owner_id',), 'owner', _name('owner')),
+        'contacts_count': ((), None, None),
+        'opportunities_count': ((), None, None),
+    },
+    'Contact': {
+        'full_name': (('first_name', 'last_name'), None, lambda c: c.full_name),
+        'initials': (('first_name', 'last_name'), None, lambda c: c.initials),
+        'account_name': (('account_id',), 'account', _account_name),
+        'owner_name': (('owner_id',), 'owner', _name('owner')),
+    },
+    'Lead': {
+        'initials': (('first_name', 'last_name', 'name'), None, lambda l: l.initials),
+        'score_grade': (('score',), None, lambda l: l.score_grade),
+        'owner_name': (('owner_id',), 'owner', _name('owner')),
+    },
+    'Opportunity': {
+        'stage_color': (('stage',), None, lambda o: o.stage_color),
+        'weighted_amount': (('amount', 'probability'), None, lambda o: o.weighted_amount),
+        'account_name': (('account_id',), 'account', _account_name),
+        'contact_name': (('contact_id',), 'primary_contact', _name('primary_contact')),
+        'owner_name': (('owner_id',), 'owner', _name('owner')),
+    },
+    'Task': {
+        'title': (('subject',), None, lambda t: t.subject),
+        'type': (('task_type',), None, lambda t: t.task_type),
+        'priority_color': (('priority',), None, lambda t: t.priority_color),
+        'is_overdue': (('due_date', 'status'), None, lambda t: t.is_overdue),
+        'owner_name': (('owner_id',), 'owner', _name('owner')),
+        'assigned_to_name': (('assigned_to_id',), 'assigned_to', _name('assigned_to')),
+    },
+}
+
+# Named column sets for the table and kanban views
+PROJECTIONS = {
+    'summary': {
+        'Account': ('name', 'industry', 'account_type', 'phone', 'created_at'),
+        'Contact': ('full_name', 'email', 'phone', 'title', 'account_id', 'created_at'),
+        'Lead': ('name', 'company', 'email', 'status', 'score', 'estimated_value', 'created_at'),
+        'Opportunity': ('name', 'amount', 'stage', 'close_date', 'account_id', 'created_at'),
+        'Task': ('subject', 'status', 'priority', 'due_date', 'created_at'),
+    },
+    'kanban': {
+        'Lead': ('name', 'company', 'status', 'score', 'score_grade'),
+        'Opportunity': ('name', 'amount', 'stage', 'stage_color', 'probability', 'close_date', 'account_id'),
+        'Task': ('subject', 'status', 'priority', 'priority_color', 'due_date'),
+    },
+}
+
+
+class Projection:
+    """A requested subset of a model's to_dict() keys"""
+
+    def __init__(self, model, fields, extra_columns=()):
+        self.model = model
+        self.fields = ['id'] + [f for f in dict.fromkeys(fields) if f != 'id']
+        derived = DERIVED_FIELDS.get(model.__name__, {})
+        columns = set(model.__table__.columns.keys())
+
+        self.columns = {'id', *extra_columns}
+        self.relations = set()
+        self.getters = {}
+        for field in self.fields:
+            if field in derived:
+                deps, relation, getter = derived[field]
+                self.columns.update(deps)
+                if relation:
+                    self.relations.add(relation)
+                self.getters[field] = getter
+            elif field in columns:
+                self.columns.add(field)
+            else:
+                raise InvalidProjection(f"Unknown field '{field}' for {model.__tablename__}")
+
+    def query(self):
+        """model.query loading only the needed columns and relations"""
+        options = [load_only(*[getattr(self.model, c) for c in sorted(self.columns)])]
+        for relation in sorted(self.relations):
+            attr = getattr(self.model, relation)
+            target = attr.property.mapper.class_
+            wanted = (target.name,) if target is Account else (target.first_name, target.last_name)
+            options.append(joinedload(attr).load_only(*wanted))
+        return self.model.query.options(*options)
+
+    def serialize(self, items):
+        """Dicts holding just the projected keys"""
+        counts = {}
+        if self.model is Account and {'contacts_count', 'opportunities_count'} & set(self.fields):
+            counts = account_child_counts([a.id for a in items])
+
+        rows = []
+        for item in items:
+            row = {}
+            for field in self.fields:
+                if field in ('contacts_count', 'opportunities_count') and self.model is Account:
+                    value = counts[item.id][field[:-len('_count')]]
+                elif field in self.getters:
+                    value = self.getters[field](item)
+                else:
+                    value = getattr(item, field)
+                row[field] = value.isoformat() if isinstance(value, date) else value
+            rows.append(row)
+        return rows
+
+
+def projection_from_args(model, fields=None, projection=None, sort_columns=()):
+    """Build a Projection from ?fields=a,b,c or ?projection=name; None means full to_dict()"""
+    if not fields and not projection:
+        return None
+
+    requested = []
+    if projection:
+        named = PROJECTIONS.get(projection, {})
+        if model.__name__ not in named:
+            raise InvalidProjection(f"Unknown projection '{projection}' for {model.__tablename__}")
+        requested += named[model.__name__]
+    if fields:
+        requested += [f.strip() for f in fields.split(',') if f.strip()]
+    return Projection(model, requested, extra_columns=sort_columns)
@@ -7,6 +7,8 @@ import uuid
 import json
 from enum import Enum
 
+from services.state_store import state_store
+
 
 # ==================== NOTIFICATION TYPES ====================
 
@@ -178,8 +180,11 @@ class UserProfile:
 class NotificationManager:
     """Manage user notifications"""
     
-    def __init__(self):
-        self.notifications = {}  # user_id -> [notifications]
+    MAX_PER_USER = 500        # oldest dropped first
+    MAX_INDEXED = 100000      # notification id -> user id, for the by-id calls
+    
+    def __init__(self, store=None):
+        self.store = store or state_store
     
     def create_notification(self, user_id, notification_data):
         """Create and store a new notification"""
@@ -188,18 +193,26 @@ class NotificationManager:
             **notification_data
         })
         
-        if user_id not in self.notifications:
-            self.notifications[user_id] = []
-        
-        self.notifications[user_id].append(notification)
+        self.store.put(f'notifications:{user_id}', notification.id, notification.to_dict(), self.MAX_PER_USER)
+        self.store.put('notification_users', notification.id, user_id, self.MAX_INDEXED)
         return notification
     
+    def _user_notifications(self, user_id):
+        return [Notification(data) for data in self.store.values(f'notifications:{user_id}')]
+    
+    def _update(self, notification_id, change):
+        user_id = self.store.get('notification_users', notification_id)
+        data = user_id and self.store.get(f'notifications:{user_id}', notification_id)
+        if not data:
+            return False
+        notification = Notification(data)
+        change(notification)
+        self.store.put(f'notifications:{user_id}', notification_id, notification.to_dict(), self.MAX_PER_USER)
+        return True
+    
     def get_notifications(self, user_id, unread_only=False, limit=20):
         """Get user's notifications"""
-        if user_id not in self.notifications:
-            return []
-        
-        notifs = self.notifications[user_id]
+        notifs = self._user_notifications(user_id)
         
         if unread_only:
             notifs = [n for n in notifs if not n.is_read]
@@ -214,57 +227,55 @@ class NotificationManager:
     
     def mark_notification_read(self, notification_id):
         """Mark a notification as read"""
-        for user_id, notifs in self.notifications.items():
-            for notif in notifs:
-                if notif.id == notification_id:
-                    notif.mark_read()
-                    return True
-        return False
+        return self._update(notification_id, Notification.mark_read)
     
     def mark_all_read(self, user_id):
         """Mark all notifications as read for a user"""
-        if user_id in self.notifications:
-            for notif in self.notifications[user_id]:
-                if not notif.is_read:
-                    notif.mark_read()
+        unread = [n for n in self._user_notifications(user_id) if not n.is_read]
+        for notif in unread:
+            notif.mark_read()
+        self.store.put_many(f'notifications:{user_id}', {n.id: n.to_dict() for n in unread}, self.MAX_PER_USER)
     
     def delete_notification(self, notification_id):
         """Delete a notification"""
-        for user_id, notifs in self.notifications.items():
-            self.notifications[user_id] = [n for n in notifs if n.id != notification_id]
+        user_id = self.store.get('notification_users', notification_id)
+        if user_id:
+            self.store.delete(f'notifications:{user_id}', notification_id)
+            self.store.delete('notification_users', notification_id)
     
     def get_unread_count(self, user_id):
         """Get count of unread notifications"""
-        if user_id not in self.notifications:
-            return 0
-        return len([n for n in self.notifications[user_id] if not n.is_read])
+        return len([n for n in self.store.values(f'notifications:{user_id}') if not n['is_read']])
     
     def pin_notification(self, notification_id):
         """Pin a notification"""
-        for user_id, notifs in self.notifications.items():
-            for notif in notifs:
-                if notif.id == notification_id:
-                    notif.is_pinned = True
-                    return True
-        return False
+        return self._update(notification_id, lambda notif: setattr(notif, 'is_pinned', True))
     
     def unpin_notification(self, notification_id):
         """Unpin a notification"""
-        for user_id, notifs in self.notifications.items():
-            for notif in notifs:
-                if notif.id == notification_id:
-                    notif.is_pinned = False
-                    return True
-        return False
+        return self._update(notification_id, lambda notif: setattr(notif, 'is_pinned', False))
 
 
 # ==================== USER PROFILE MANAGER ====================
 
 class UserProfileManager:
-    """Manage user profiles"""
+    """
+    Manage user profiles. Profiles are returned as copies: changes go
+    through the update methods, which store them.
+    """
+    
+    MAX_PROFILES = 100000
     
-    def __init__(self):
-        self.profiles = {}  # user_id -> UserProfile
+    # Read-only properties of UserProfile, derived from the names
+    COMPUTED = ('full_name', 'initials')
+    
+    def __init__(self, store=None):
+        self.store = store or state_store
+    
+    def _save(self, profile):
+        data = {key: value for key, value in profile.to_dict().items() if key not in self.COMPUTED}
+        self.store.put('profiles', profile.user_id, data, self.MAX_PROFILES)
+        return profile
     
     def create_profile(self, user_id, profile_data):
         """Create a new user profile"""
@@ -272,12 +283,12 @@ class UserProfileManager:
             'user_id': user_id,
             **profile_data
         })
-        self.profiles[user_id] = profile
-        return profile
+        return self._save(profile)
     
     def get_profile(self, user_id):
         """Get user profile"""
-        return self.profiles.get(user_id)
+        data = self.store.get('profiles', user_id)
+        return UserProfile(data) if data else None
     
     def update_profile(self, user_id, updates):
         """Update user profile"""
@@ -286,11 +297,11 @@ class UserProfileManager:
             return None
         
         for key, value in updates.items():
-            if hasattr(profile, key):
+            if hasattr(profile, key) and key not in self.COMPUTED:
                 setattr(profile, key, value)
         
         profile.updated_at = datetime.now().isoformat()
-        return profile
+        return self._save(profile)
     
     def update_notification_preferences(self, user_id, preferences):
         """Update notification preferences"""
@@ -300,7 +311,7 @@ class UserProfileManager:
         
         profile.notification_preferences.update(preferences)
         profile.updated_at = datetime.now().isoformat()
-        return profile
+        return self._save(profile)
     
     def set_status(self, user_id, status):
         """Set user status (active, away, busy, offline)"""
@@ -310,11 +321,11 @@ class UserProfileManager:
         
         profile.status = status
         profile.last_seen = datetime.now().isoformat()
-        return profile
+        return self._save(profile)
     
     def get_team_members(self, team_id):
         """Get all members of a team"""
-        return [p for p in self.profiles.values() if p.team_id == team_id]
+        return [UserProfile(p) for p in self.store.values('profiles') if p['team_id'] == team_id]
     
     def get_team_statistics(self, team_id):
         """Get aggregated statistics for a team"""
@@ -369,8 +380,11 @@ class ActivityLog:
 class ActivityLogger:
     """Manage activity logs"""
     
-    def __init__(self):
-        self.logs = {}  # user_id -> [logs]
+    MAX_PER_USER = 1000
+    MAX_TOTAL = 10000         # searched by get_activity_for_resource()
+    
+    def __init__(self, store=None):
+        self.store = store or state_store
     
     def log_activity(self, user_id, activity_data):
         """Log an activity"""
@@ -379,28 +393,22 @@ class ActivityLogger:
             **activity_data
         })
         
-        if user_id not in self.logs:
-            self.logs[user_id] = []
-        
-        self.logs[user_id].append(log)
+        self.store.append(f'activity:{user_id}', log.to_dict(), self.MAX_PER_USER)
+        self.store.append('activity', log.to_dict(), self.MAX_TOTAL)
         return log
     
     def get_user_activity(self, user_id, limit=50):
         """Get user's activity log"""
-        if user_id not in self.logs:
-            return []
-        
-        logs = sorted(self.logs[user_id], key=lambda l: l.created_at, reverse=True)
+        logs = [ActivityLog(data) for data in self.store.tail(f'activity:{user_id}')]
+        logs = sorted(logs, key=lambda l: l.created_at, reverse=True)
         return logs[:limit]
     
     def get_activity_for_resource(self, resource_type, resource_id):
-        """Get all activities for a specific resource"""
-        activities = []
-        for logs in self.logs.values():
-            activities.extend([
-                l for l in logs 
-                if l.resource_type == resource_type and l.resource_id == resource_id
-            ])
+        """Get all activities for a specific resource, among the latest MAX_TOTAL"""
+        activities = [
+            ActivityLog(data) for data in self.store.tail('activity')
+            if data['resource_type'] == resource_type and data['resource_id'] == resource_id
+        ]
         
         return sorted(activities, key=lambda a: a.created_at, reverse=True)
 
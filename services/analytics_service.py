@@ -239,15 +239,25 @@ class ExportManager:
     @staticmethod
     def export_to_csv(data, columns):
         """Export data to CSV format"""
+        return ''.join(ExportManager.iter_csv([data], columns))
+
+    @staticmethod
+    def iter_csv(batches, columns):
+        """Yield CSV text for an iterable of row batches: the header, then one chunk per batch"""
         import csv
         from io import StringIO
-        
+
         output = StringIO()
         writer = csv.DictWriter(output, fieldnames=columns)
         writer.writeheader()
-        writer.writerows(data)
-        
-        return output.getvalue()
+        for batch in batches:
+            writer.writerows(batch)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate()
+
+        if output.tell():
+            yield output.getvalue()
     
     @staticmethod
     def export_to_json(data):
@@ -258,23 +268,42 @@ class ExportManager:
     @staticmethod
     def export_to_excel(data, filename='export.xlsx'):
         """Export data to Excel format"""
+        columns = list(data[0]) if data else []
+        if not ExportManager.write_excel([data], columns, filename):
+            return None
+        return filename
+
+    @staticmethod
+    def write_excel(batches, columns, target, title='Export'):
+        """
+        Write an iterable of row batches to an XLSX file path or binary file object.
+
+        Uses openpyxl's write-only mode, which writes each row out as it is
+        appended, so memory stays flat however many rows there are.
+        Returns False when openpyxl is not installed.
+        """
+        import json
         try:
             import openpyxl
-            from openpyxl.utils.dataframe import dataframe_to_rows
-            import pandas as pd
-            
-            df = pd.DataFrame(data)
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            
-            for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), 1):
-                for c_idx, value in enumerate(row, 1):
-                    ws.cell(row=r_idx, column=c_idx, value=value)
-            
-            wb.save(filename)
-            return filename
+            from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
         except ImportError:
-            return None
+            return False
+
+        def cell(value):
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, default=str)
+            if isinstance(value, str):
+                return ILLEGAL_CHARACTERS_RE.sub('', value)
+            return value
+
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet(title=title[:31])
+        ws.append(columns)
+        for batch in batches:
+            for row in batch:
+                ws.append([cell(row.get(column)) for column in columns])
+        wb.save(target)
+        return True
 
 # ==================== IMPORT UTILITIES ====================
 
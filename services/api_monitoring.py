@@ -6,141 +6,372 @@ from datetime import datetime, timedelta
 from collections import defaultdict
 from functools import wraps
 import hashlib
+import math
+import os
+import threading
+import time
 import uuid
 
+from flask import g, request
+
+from services.rate_limit import LocalBackend, decide, window_name
+from services.state_store import state_store
+
 # ==================== RATE LIMITING ====================
 
 class RateLimiter:
-    """Rate limiting system"""
+    """Per-user limits over sliding minute, hour and day windows (see services/rate_limit.py)"""
     
-    def __init__(self):
-        self.limits = {}  # user_id -> {timestamp -> count}
+    WINDOWS = {'minute': 60, 'hour': 3600, 'day': 86400}
+    
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else LocalBackend()
         self.config = {
             'requests_per_minute': 60,
             'requests_per_hour': 1000,
             'requests_per_day': 10000
         }
     
+    def _limits(self):
+        return tuple((self.config[f'requests_per_{window}'], seconds) for window, seconds in self.WINDOWS.items())
+    
+    def _result(self, limits, allowed, windows):
+        if allowed:
+            return True, 'OK'
+        return False, f'Rate limit exceeded (per {window_name(decide(limits, allowed, windows).window)})'
+    
     def check_rate_limit(self, user_id):
         """Check if user is within rate limits"""
-        now = datetime.now()
-        user_limits = self.limits.get(user_id, {})
-        
-        # Clean old entries
-        cutoff_time = now - timedelta(days=1)
-        self.limits[user_id] = {
-            ts: count for ts, count in user_limits.items()
-            if datetime.fromisoformat(ts) > cutoff_time
-        }
-        
-        # Check minute limit
-        minute_ago = (now - timedelta(minutes=1)).isoformat()
-        minute_requests = len([t for t in self.limits[user_id].keys() if t > minute_ago])
-        
-        if minute_requests >= self.config['requests_per_minute']:
-            return False, 'Rate limit exceeded (per minute)'
-        
-        # Check hour limit
-        hour_ago = (now - timedelta(hours=1)).isoformat()
-        hour_requests = len([t for t in self.limits[user_id].keys() if t > hour_ago])
-        
-        if hour_requests >= self.config['requests_per_hour']:
-            return False, 'Rate limit exceeded (per hour)'
-        
-        # Check day limit
-        day_ago = (now - timedelta(days=1)).isoformat()
-        day_requests = len([t for t in self.limits[user_id].keys() if t > day_ago])
-        
-        if day_requests >= self.config['requests_per_day']:
-            return False, 'Rate limit exceeded (per day)'
-        
-        return True, 'OK'
+        limits = self._limits()
+        return self._result(limits, *self.backend.hit(str(user_id), limits, peek=True))
     
     def record_request(self, user_id):
-        """Record API request"""
-        if user_id not in self.limits:
-            self.limits[user_id] = {}
-        
-        self.limits[user_id][datetime.now().isoformat()] = 1
+        """Record API request (requests over the limit are not counted)"""
+        self.backend.hit(str(user_id), self._limits())
+    
+    def hit(self, user_id):
+        """Check and record in one step, atomically with the Redis backend"""
+        limits = self._limits()
+        return self._result(limits, *self.backend.hit(str(user_id), limits))
     
     def get_usage(self, user_id):
-        """Get user's API usage"""
-        now = datetime.now()
-        user_limits = self.limits.get(user_id, {})
-        
-        minute_ago = (now - timedelta(minutes=1)).isoformat()
-        hour_ago = (now - timedelta(hours=1)).isoformat()
-        day_ago = (now - timedelta(days=1)).isoformat()
-        
-        return {
-            'minute': len([t for t in user_limits.keys() if t > minute_ago]),
-            'hour': len([t for t in user_limits.keys() if t > hour_ago]),
-            'day': len([t for t in user_limits.keys() if t > day_ago]),
-            'limits': self.config
+        """Get user's API usage, as the sliding window estimates"""
+        _, windows = self.backend.hit(str(user_id), self._limits(), cost=0, peek=True)
+        usage = {
+            window: round(previous * (1 - elapsed / seconds) + current)
+            for (window, seconds), (previous, current, elapsed) in zip(self.WINDOWS.items(), windows)
         }
+        return {**usage, 'limits': self.config}
+
+# ==================== LATENCY HISTOGRAMS ====================
+
+class LatencyHistogram:
+    """
+    Response times in log-linear buckets, HDR-style: each bucket spans
+    GROWTH - 1 (2%) of its value, so percentiles are read to that relative
+    error from at most MAX_BUCKETS counters however many requests were
+    recorded. Histograms merge by adding their counts.
+    """
+    
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+    
+    MIN_MS = 0.01
+    GROWTH = 1.02
+    MAX_BUCKETS = int(math.log(600000 / MIN_MS, GROWTH)) + 1   # up to 10 minutes
+    _LOG_GROWTH = math.log(GROWTH)
+    
+    def __init__(self):
+        self.counts = {}   # bucket -> requests
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+    
+    def record(self, ms, count=1):
+        bucket = int(math.log(ms / self.MIN_MS) / self._LOG_GROWTH) if ms > self.MIN_MS else 0
+        bucket = min(bucket, self.MAX_BUCKETS - 1)
+        self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += count
+        self.total += ms * count
+        self.min = ms if self.min is None or ms < self.min else self.min
+        self.max = ms if self.max is None or ms > self.max else self.max
+    
+    def merge(self, other):
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+    
+    def percentile(self, p):
+        """Response time at or below which p (0-100) percent of requests completed"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # Geometric middle of the bucket, within what was actually seen
+                value = self.MIN_MS * self.GROWTH ** (bucket + 0.5)
+                return round(min(max(value, self.min), self.max), 3)
+        return self.max
+    
+    def to_dict(self):
+        return {'counts': self.counts, 'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max}
+    
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.counts = {int(bucket): count for bucket, count in data['counts'].items()}
+        histogram.count, histogram.total = data['count'], data['total']
+        histogram.min, histogram.max = data['min'], data['max']
+        return histogram
+
+
+def covered_periods(period, slots, seconds, now):
+    """(oldest, newest] period numbers covering the last `seconds`, at most `slots` of them"""
+    newest = int(now // period)
+    return newest - min(slots, math.ceil(seconds / period)), newest
+
+
+class RollingHistogram:
+    """
+    One LatencyHistogram per period of `period` seconds for the last `slots`
+    periods, in a ring whose slots are reused as time moves on
+    """
+    
+    __slots__ = ('period', 'ring')
+    
+    def __init__(self, period, slots):
+        self.period = period
+        self.ring = [None] * slots   # (period number, histogram)
+    
+    def get(self, number):
+        """The histogram of period `number`, if the ring still holds it"""
+        entry = self.ring[number % len(self.ring)]
+        return entry[1] if entry is not None and entry[0] == number else None
+    
+    def record(self, ms, now):
+        number = int(now // self.period)
+        index = number % len(self.ring)
+        entry = self.ring[index]
+        if entry is None or entry[0] != number:
+            entry = self.ring[index] = (number, LatencyHistogram())
+        entry[1].record(ms)
+    
+    def merged(self, seconds, now, into=None):
+        """Everything recorded in the periods covering the last `seconds` (at most the whole ring)"""
+        into = into if into is not None else LatencyHistogram()
+        oldest, newest = covered_periods(self.period, len(self.ring), seconds, now)
+        for entry in self.ring:
+            if entry is not None and oldest < entry[0] <= newest:
+                into.merge(entry[1])
+        return into
 
 # ==================== API MONITORING ====================
 
 class APIMonitor:
-    """Monitor API usage and performance"""
+    """
+    Monitor API usage and performance. Response times go into rolling
+    histograms per endpoint and status class (2xx, 4xx, ...): per minute for
+    the last hour and per hour for the last day, so memory stays fixed and
+    statistics cost O(buckets). init_app() times every request of the app.
     
-    def __init__(self):
-        self.request_log = []
-        self.error_log = []
-        self.performance_metrics = defaultdict(list)
+    Each worker records into its own rings and writes its open periods to the
+    store every PUBLISH_INTERVAL seconds, and once more when they close, as
+    one record per worker and period. Statistics merge the other workers'
+    records with this worker's rings, so a shared store (STATE_BACKEND) gives
+    every worker the same numbers, at most PUBLISH_INTERVAL behind.
+    """
+    
+    MAX_ERRORS = 10000        # logged errors kept
+    MAX_SERIES = 2000         # (endpoint, status class) pairs; more go under OTHER
+    MAX_WORKERS = 64          # workers whose periods the store keeps for the whole ring
+    PUBLISH_INTERVAL = 10     # seconds between writes of the open periods
+    OTHER = '<other>'
+    WINDOWS = ((60, 60), (3600, 24))   # (period seconds, periods kept)
+    
+    def __init__(self, store=None, clock=time.time):
+        self.store = store or state_store
+        self._clock = clock
+        self._series = {}   # (endpoint, status class) -> RollingHistogram per WINDOWS entry
+        self._lock = threading.Lock()
+        self._nonce = uuid.uuid4().hex[:12]
+        self._open = [None] * len(self.WINDOWS)   # period number of each ring last written
+        self._published = None
+        self._publish_lock = threading.Lock()
+    
+    @property
+    def origin(self):
+        """This worker's name on its records; workers forked after import differ by pid"""
+        return f'{self._nonce}:{os.getpid()}'
+    
+    def init_app(self, app):
+        """
+        Time every request; register before the other hooks so the time
+        includes their after_request work (commit, compression)
+        """
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+    
+    @staticmethod
+    def _start():
+        g.monitor_started = time.perf_counter()
+    
+    @staticmethod
+    def _request():
+        """(user id, endpoint) of the current request, without loading a user the view did not"""
+        user = g.get('_login_user')
+        rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+        return (user.get_id() if user is not None else None), f'{request.method} {rule}'
+    
+    def _finish(self, response):
+        started = g.pop('monitor_started', None)
+        if started is not None and request.endpoint != 'static':
+            self.log_request(*self._request(), request.method, response.status_code,
+                             (time.perf_counter() - started) * 1000)
+        return response
+    
+    def _teardown(self, exc):
+        if exc is not None:
+            self.log_error(*self._request(), request.method, repr(exc))
+    
+    @property
+    def error_log(self):
+        return self.store.tail('api_errors')
     
     def log_request(self, user_id, endpoint, method, status_code, response_time_ms):
         """Log API request"""
-        self.request_log.append({
-            'user_id': user_id,
-            'endpoint': endpoint,
-            'method': method,
-            'status_code': status_code,
-            'response_time_ms': response_time_ms,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        self.performance_metrics[endpoint].append(response_time_ms)
+        now = self._clock()
+        # Before recording, so a closing period is written before its ring slot can be reused
+        if self._publish_due(now):
+            self.publish(now)
+        key = (endpoint, f'{status_code // 100}xx')
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                if len(self._series) >= self.MAX_SERIES:
+                    key = (self.OTHER, key[1])
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = [RollingHistogram(*window) for window in self.WINDOWS]
+            for rolling in series:
+                rolling.record(response_time_ms, now)
+    
+    def _publish_due(self, now):
+        with self._lock:
+            if self._published is not None and now - self._published < self.PUBLISH_INTERVAL and all(
+                    int(now // period) == number for (period, _), number in zip(self.WINDOWS, self._open)):
+                return False
+            self._published = now
+            return True
+    
+    def publish(self, now=None):
+        """Write this worker's open periods, and those closed since the last write, to the store"""
+        now = self._clock() if now is None else now
+        origin = self.origin
+        with self._publish_lock:
+            records = []
+            with self._lock:
+                for level, (period, slots) in enumerate(self.WINDOWS):
+                    current = int(now // period)
+                    for number in {self._open[level], current} - {None}:
+                        series = [
+                            [endpoint, status, histogram.to_dict()]
+                            for (endpoint, status), rings in self._series.items()
+                            for histogram in [rings[level].get(number)] if histogram is not None
+                        ]
+                        if series:
+                            records.append((period, slots, f'{origin}:{number}',
+                                            {'origin': origin, 'number': number, 'series': series}))
+                    self._open[level] = current
+            for period, slots, key, record in records:
+                self.store.put(f'api_latency:{period}', key, record, slots * self.MAX_WORKERS)
     
     def log_error(self, user_id, endpoint, method, error_message):
         """Log API error"""
-        self.error_log.append({
+        self.store.append('api_errors', {
             'user_id': user_id,
             'endpoint': endpoint,
             'method': method,
             'error': error_message,
             'timestamp': datetime.now().isoformat()
-        })
+        }, self.MAX_ERRORS)
     
-    def get_endpoint_stats(self, endpoint):
-        """Get statistics for endpoint"""
-        metrics = self.performance_metrics.get(endpoint, [])
+    def histograms(self, seconds=3600, endpoint=None):
+        """(endpoint, status class) -> LatencyHistogram of the last `seconds` (up to a day)"""
+        now = self._clock()
+        # The finest ring that reaches back far enough
+        level = next((i for i, (period, slots) in enumerate(self.WINDOWS) if period * slots >= seconds),
+                     len(self.WINDOWS) - 1)
+        with self._lock:
+            merged = {
+                key: series[level].merged(seconds, now)
+                for key, series in self._series.items()
+                if endpoint is None or key[0] == endpoint
+            }
         
-        if not metrics:
+        # The other workers' periods as they last wrote them; this worker's own are in its rings
+        period, slots = self.WINDOWS[level]
+        oldest, newest = covered_periods(period, slots, seconds, now)
+        origin = self.origin
+        for record in self.store.values(f'api_latency:{period}'):
+            if record['origin'] == origin or not oldest < record['number'] <= newest:
+                continue
+            for series_endpoint, status, data in record['series']:
+                if endpoint is None or series_endpoint == endpoint:
+                    merged.setdefault((series_endpoint, status), LatencyHistogram()).merge(
+                        LatencyHistogram.from_dict(data))
+        return merged
+    
+    def get_endpoint_stats(self, endpoint, seconds=3600):
+        """Get statistics for endpoint over the last `seconds`"""
+        by_status = self.histograms(seconds, endpoint)
+        metrics = LatencyHistogram()
+        for histogram in by_status.values():
+            metrics.merge(histogram)
+        
+        if not metrics.count:
             return None
         
         return {
             'endpoint': endpoint,
-            'total_requests': len(metrics),
-            'avg_response_time_ms': round(sum(metrics) / len(metrics), 2),
-            'min_response_time_ms': min(metrics),
-            'max_response_time_ms': max(metrics),
-            'p95_response_time_ms': sorted(metrics)[int(len(metrics) * 0.95)] if metrics else 0
+            'window_seconds': seconds,
+            'total_requests': metrics.count,
+            'avg_response_time_ms': round(metrics.total / metrics.count, 2),
+            'min_response_time_ms': round(metrics.min, 3),
+            'max_response_time_ms': round(metrics.max, 3),
+            'p50_response_time_ms': metrics.percentile(50),
+            'p95_response_time_ms': metrics.percentile(95),
+            'p99_response_time_ms': metrics.percentile(99),
+            'by_status': {
+                status: {'requests': histogram.count, 'p95_response_time_ms': histogram.percentile(95)}
+                for (_, status), histogram in sorted(by_status.items()) if histogram.count
+            }
         }
     
+    def _counts(self, seconds):
+        """endpoint -> {'total': requests, '4xx': ..., '5xx': ...} over the last `seconds`"""
+        counts = defaultdict(lambda: defaultdict(int))
+        for (endpoint, status), histogram in self.histograms(seconds).items():
+            counts[endpoint]['total'] += histogram.count
+            counts[endpoint][status] += histogram.count
+        return counts
+    
     def get_health_status(self):
         """Get API health status"""
-        if not self.request_log:
+        counts = self._counts(86400)
+        total = sum(endpoint['total'] for endpoint in counts.values())
+        if not total:
             return {'status': 'unknown'}
         
-        last_24h = datetime.now() - timedelta(hours=24)
-        recent_requests = [r for r in self.request_log if datetime.fromisoformat(r['timestamp']) > last_24h]
-        recent_errors = [e for e in self.error_log if datetime.fromisoformat(e['timestamp']) > last_24h]
-        
-        total = len(recent_requests)
-        success = len([r for r in recent_requests if r['status_code'] < 400])
-        
-        error_rate = (len(recent_errors) / total * 100) if total > 0 else 0
+        errors = sum(endpoint['5xx'] for endpoint in counts.values())
+        error_rate = errors / total * 100
         
         status = 'healthy' if error_rate < 5 else 'degraded' if error_rate < 10 else 'unhealthy'
         
@@ -148,35 +379,24 @@ class APIMonitor:
             'status': status,
             'total_requests_24h': total,
             'error_rate_percent': round(error_rate, 2),
-            'errors_24h': len(recent_errors)
+            'errors_24h': errors
         }
     
-    def get_top_endpoints(self, limit=10):
+    def get_top_endpoints(self, limit=10, seconds=86400):
         """Get top endpoints by request count"""
-        endpoint_counts = defaultdict(int)
-        
-        for request in self.request_log:
-            endpoint_counts[request['endpoint']] += 1
-        
-        return sorted(endpoint_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        counts = self._counts(seconds)
+        return sorted(((endpoint, c['total']) for endpoint, c in counts.items() if c['total']),
+                      key=lambda x: x[1], reverse=True)[:limit]
     
-    def get_error_rate_by_endpoint(self):
-        """Get error rate for each endpoint"""
-        endpoint_stats = defaultdict(lambda: {'total': 0, 'errors': 0})
-        
-        for request in self.request_log:
-            endpoint = request['endpoint']
-            endpoint_stats[endpoint]['total'] += 1
-            if request['status_code'] >= 400:
-                endpoint_stats[endpoint]['errors'] += 1
-        
+    def get_error_rate_by_endpoint(self, seconds=86400):
+        """Get error rate (4xx and 5xx responses) for each endpoint"""
         return {
             endpoint: {
                 'total': stats['total'],
-                'errors': stats['errors'],
-                'error_rate_percent': round((stats['errors'] / stats['total'] * 100) if stats['total'] > 0 else 0, 2)
+                'errors': stats['4xx'] + stats['5xx'],
+                'error_rate_percent': round((stats['4xx'] + stats['5xx']) / stats['total'] * 100, 2)
             }
-            for endpoint, stats in endpoint_stats.items()
+            for endpoint, stats in self._counts(seconds).items() if stats['total']
         }
 
 # ==================== API KEY MANAGEMENT ====================
@@ -214,31 +434,31 @@ class APIKey:
 class APIKeyManager:
     """Manage API keys"""
     
-    def __init__(self):
-        self.keys = {}  # key -> api_key_data
-        self.user_keys = defaultdict(list)  # user_id -> [key_ids]
+    MAX_KEYS = 100000
+    
+    def __init__(self, store=None):
+        self.store = store or state_store
     
     def create_key(self, user_id, name=None, expires_in_days=365):
         """Create new API key"""
         api_key = APIKey({
             'user_id': user_id,
-            'name': name or f'API Key {len(self.user_keys[user_id]) + 1}',
+            'name': name or f'API Key {len(self.store.values(f"user_api_keys:{user_id}")) + 1}',
             'expires_at': (datetime.now() + timedelta(days=expires_in_days)).isoformat()
         })
         
-        self.keys[api_key.key] = api_key.to_dict()
-        self.keys[api_key.key]['full_key'] = api_key.key
-        self.user_keys[user_id].append(api_key.id)
+        self.store.put('api_keys', api_key.key, {**api_key.to_dict(), 'full_key': api_key.key}, self.MAX_KEYS)
+        self.store.put(f'user_api_keys:{user_id}', api_key.id, api_key.key)
         
         return api_key
     
     def get_key(self, api_key):
         """Get key info"""
-        return self.keys.get(api_key)
+        return self.store.get('api_keys', api_key)
     
     def validate_key(self, api_key):
         """Validate API key"""
-        key_data = self.keys.get(api_key)
+        key_data = self.store.get('api_keys', api_key)
         
         if not key_data:
             return False, 'Invalid API key'
@@ -255,27 +475,35 @@ class APIKeyManager:
     
     def revoke_key(self, api_key):
         """Revoke API key"""
-        if api_key in self.keys:
-            self.keys[api_key]['is_active'] = False
+        key_data = self.store.get('api_keys', api_key)
+        if key_data:
+            key_data['is_active'] = False
+            self.store.put('api_keys', api_key, key_data, self.MAX_KEYS)
             return True
         return False
     
     def get_user_keys(self, user_id):
         """Get all keys for user"""
-        key_ids = self.user_keys.get(user_id, [])
-        return [self.keys[kid] for kid in key_ids if kid in self.keys]
+        keys = self.store.values(f'user_api_keys:{user_id}')
+        return [key_data for key_data in self.store.get_many('api_keys', keys) if key_data]
 
 # ==================== AUDIT LOG ====================
 
 class AuditLog:
     """Audit logging for compliance and security"""
     
-    def __init__(self):
-        self.logs = []
+    MAX_LOG = 100000
+    
+    def __init__(self, store=None):
+        self.store = store or state_store
+    
+    @property
+    def logs(self):
+        return self.store.tail('audit_log')
     
     def log_action(self, user_id, action, resource_type, resource_id, changes=None, status='success'):
         """Log user action"""
-        self.logs.append({
+        self.store.append('audit_log', {
             'id': str(uuid.uuid4()),
             'user_id': user_id,
             'action': action,
@@ -284,7 +512,7 @@ class AuditLog:
             'changes': changes,
             'status': status,
             'timestamp': datetime.now().isoformat()
-        })
+        }, self.MAX_LOG)
     
     def get_user_activity(self, user_id, limit=100):
         """Get user activity log"""
@@ -296,4 +524,8 @@ class AuditLog:
     
     def get_all_logs(self, limit=1000):
         """Get all audit logs"""
-        return self.logs[-limit:]
+        return self.store.tail('audit_log', limit)
+
+# ==================== GLOBAL MONITOR ====================
+
+api_monitor = APIMonitor()
@@ -0,0 +1,161 @@
+"""
+GeminiCRM Pro - Write-Behind Audit Log
+Buffers audit rows in memory and inserts them in batches from a background
+thread, so write requests no longer pay a second commit for their audit entry
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from models.db_models import db, AuditLog, generate_uuid, get_current_time
+from services import unit_of_work
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    Bounded queue of AuditLog rows drained by a daemon thread.
+
+    A batch is written when it reaches AUDIT_BATCH_SIZE rows or when
+    AUDIT_FLUSH_INTERVAL seconds pass, whichever comes first. When the queue is
+    full, queueing blocks for up to AUDIT_ENQUEUE_TIMEOUT seconds and then
+    writes the row itself, so a slow database slows callers down rather than
+    losing audit entries. Rows are only queued once the request that produced
+    them commits. In synchronous mode (AUDIT_SYNCHRONOUS or app.testing) they
+    are inserted through the caller's session and commit with it instead.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.synchronous = True
+        self.batch_size = 500
+        self.flush_interval = 1.0
+        self.enqueue_timeout = 5.0
+        self._queue = queue.Queue(maxsize=10000)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self.stats = {'written': 0, 'batches': 0, 'inline': 0, 'failed': 0}
+
+    def init_app(self, app):
+        """Read settings from app.config and arrange a final flush at shutdown"""
+        self.app = app
+        self.synchronous = app.config.get('AUDIT_SYNCHRONOUS', False) or app.testing
+        self.batch_size = app.config.get('AUDIT_BATCH_SIZE', 500)
+        self.flush_interval = app.config.get('AUDIT_FLUSH_INTERVAL', 1.0)
+        self.enqueue_timeout = app.config.get('AUDIT_ENQUEUE_TIMEOUT', 5.0)
+        self._queue = queue.Queue(maxsize=app.config.get('AUDIT_QUEUE_SIZE', 10000))
+        atexit.register(self.shutdown)
+
+    def record(self, **values):
+        """Queue one audit row (columns of AuditLog); id and timestamp are fixed now"""
+        self.record_many([values])
+
+    def record_many(self, rows):
+        """Queue several audit rows once the current request's transaction commits"""
+        now = get_current_time()
+        rows = [dict(row, id=generate_uuid(), created_at=now) for row in rows]
+        if self.synchronous or self.app is None:
+            db.session.execute(insert(AuditLog), rows)
+            return
+        unit_of_work.on_commit(lambda: self._enqueue(rows))
+
+    def _enqueue(self, rows):
+        self._ensure_thread()
+        for position, row in enumerate(rows):
+            try:
+                self._queue.put(row, timeout=self.enqueue_timeout)
+            except queue.Full:
+                # Backpressure: the writer is behind, so this caller pays for the rest itself
+                self.stats['inline'] += len(rows) - position
+                self._write(rows[position:])
+                return
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written"""
+        if self._thread is None or not self._thread.is_alive():
+            self._drain()
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return
+            time.sleep(0.01)
+
+    def shutdown(self, timeout=10.0):
+        """Stop the writer thread after it drains the queue"""
+        self._stopping.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._drain()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork(), so each worker process starts its own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._stopping.clear()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _collect(self):
+        """Wait for one row, then gather more until the batch fills or the interval ends"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        """Write whatever is left in the queue from the calling thread"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, rows):
+        """Insert rows in their own app context and session"""
+        try:
+            with self.app.app_context():
+                db.session.execute(insert(AuditLog), rows)
+                db.session.commit()
+            self.stats['written'] += len(rows)
+            self.stats['batches'] += 1
+        except Exception:
+            self.stats['failed'] += len(rows)
+            logger.exception('Failed to write %d audit log rows', len(rows))
+
+
+audit_writer = AuditWriter()
@@ -0,0 +1,477 @@
+"""
+GeminiCRM Pro - Type-Ahead Index
+In-process prefix index over lead, contact, account and opportunity names,
+emails and companies, so search-box suggestions never touch the database
+"""
+import re
+import sys
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from itertools import islice
+
+from sqlalchemy import event, inspect, select
+
+from models.db_models import db, Account, Contact, Lead, Opportunity
+from models.engine import RoutingSession
+from services import search
+from services.invalidation import invalidation_bus
+
+_WORD = re.compile(r'\w+')
+_SEP = '\x1f'
+# Index positions examined per suggestion before giving up on finding `limit` matches
+SCAN_LIMIT = 5000
+# Target items per bucket of _SortedItems
+BUCKET_SIZE = 1000
+# More changes than this for one owner are merged with a single re-sort instead of list inserts
+RESORT_THRESHOLD = 64
+
+
+class _Source:
+    """Which columns of a model are indexed and what a suggestion shows"""
+
+    def __init__(self, model, indexed, subtitle):
+        self.model = model
+        self.indexed = indexed
+        self.subtitle = subtitle
+        self.columns = tuple(dict.fromkeys(('id', 'owner_id') + indexed + (subtitle,)))
+
+
+SOURCES = {
+    'lead': _Source(Lead, ('name', 'email', 'company'), 'company'),
+    'contact': _Source(Contact, ('first_name', 'last_name', 'email'), 'email'),
+    'account': _Source(Account, ('name',), 'industry'),
+    'opportunity': _Source(Opportunity, ('name',), 'amount'),
+}
+ENTITY_BY_MODEL = {source.model: entity for entity, source in SOURCES.items()}
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+
+
+def _terms(query):
+    # Whole email addresses stay one term so "sarah.j@glo" matches as typed
+    terms = []
+    for chunk in _normalize(query).split():
+        terms.extend([chunk] if '@' in chunk else _WORD.findall(chunk))
+    return terms
+
+
+def _ref(entity, entity_id):
+    return f'{entity}\x00{entity_id}'
+
+
+def _entry(entity, row):
+    """(name, subtitle, tokens) for one row mapping; tokens are _SEP-joined with a leading _SEP"""
+    source = SOURCES[entity]
+    if entity == 'contact':
+        name = f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip()
+    else:
+        name = row.get('name') or ''
+    subtitle = row.get(source.subtitle)
+    if entity == 'opportunity':
+        subtitle = f'${float(subtitle or 0):,.0f}'
+    elif entity == 'lead':
+        subtitle = subtitle or row.get('email')
+
+    tokens = set()
+    for value in (name, *(row.get(column) for column in source.indexed)):
+        if not value:
+            continue
+        value = _normalize(str(value))
+        words = _WORD.findall(value)
+        tokens.update(words)
+        # Whole values too, so "sarah jo" and "c42@ex" are a single prefix lookup
+        if len(words) > 1:
+            tokens.add(' '.join(words))
+        if '@' in value:
+            tokens.add(value.strip())
+    return name, subtitle, ''.join(_SEP + token for token in sorted(tokens))
+
+
+def _tokens(entry):
+    return entry[2].split(_SEP)[1:]
+
+
+def _entry_bytes(ref, entry):
+    # Estimate: the entry's strings plus one index item (token + ref) and list slot per token
+    name, subtitle, tokens = entry
+    return (sys.getsizeof(ref) + sys.getsizeof(entry) + sys.getsizeof(name) + sys.getsizeof(subtitle)
+            + sys.getsizeof(tokens) + sum(sys.getsizeof(token) + len(ref) + 9 for token in _tokens(entry))
+            + 100)
+
+
+class _SortedItems:
+    """
+    Sorted strings held in buckets of about BUCKET_SIZE, so an insert or
+    delete shifts one bucket rather than the whole array
+    """
+
+    __slots__ = ('buckets', 'maxes', 'size')
+
+    def __init__(self, items):
+        items.sort()
+        self.buckets = [items[i:i + BUCKET_SIZE] for i in range(0, len(items), BUCKET_SIZE)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.size = len(items)
+
+    def __len__(self):
+        return self.size
+
+    def add(self, item):
+        self.size += 1
+        if not self.buckets:
+            self.buckets.append([item])
+            self.maxes.append(item)
+            return
+        i = min(bisect_left(self.maxes, item), len(self.buckets) - 1)
+        bucket = self.buckets[i]
+        insort(bucket, item)
+        self.maxes[i] = bucket[-1]
+        if len(bucket) > 2 * BUCKET_SIZE:
+            self.buckets[i:i + 1] = [bucket[:BUCKET_SIZE], bucket[BUCKET_SIZE:]]
+            self.maxes[i:i + 1] = [bucket[BUCKET_SIZE - 1], bucket[-1]]
+
+    def remove(self, item):
+        i = bisect_left(self.maxes, item)
+        bucket = self.buckets[i]
+        del bucket[bisect_left(bucket, item)]
+        self.size -= 1
+        if bucket:
+            self.maxes[i] = bucket[-1]
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+
+    def rank(self, item):
+        """Approximate count of items < item (buckets are assumed full)"""
+        i = bisect_left(self.maxes, item)
+        if i == len(self.buckets):
+            return self.size
+        return i * BUCKET_SIZE + bisect_left(self.buckets[i], item)
+
+    def iter_from(self, item):
+        """Items >= item in order"""
+        i = bisect_left(self.maxes, item)
+        if i == len(self.buckets):
+            return
+        start = bisect_left(self.buckets[i], item)
+        for bucket in islice(self.buckets, i, None):
+            yield from islice(bucket, start, None)
+            start = 0
+
+
+class _OwnerIndex:
+    """
+    One owner's suggestions: every token of every record as a sorted
+    "token NUL ref" string, range-scanned by prefix, plus the records
+    themselves by ref ("entity NUL id")
+    """
+
+    __slots__ = ('items', 'entries', 'loaded_at', 'bytes')
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.loaded_at = time.monotonic()
+        self._resort()
+
+    def _resort(self):
+        self.items = _SortedItems([
+            f'{token}\x00{ref}' for ref, entry in self.entries.items() for token in _tokens(entry)
+        ])
+        self.bytes = sum(_entry_bytes(ref, entry) for ref, entry in self.entries.items())
+
+    def apply(self, changes):
+        """changes: [(ref, entry or None)] in commit order; None removes the record"""
+        if len(changes) > RESORT_THRESHOLD:
+            for ref, entry in changes:
+                if entry is None:
+                    self.entries.pop(ref, None)
+                else:
+                    self.entries[ref] = entry
+            self._resort()
+            return
+        for ref, entry in changes:
+            self._drop(ref)
+            if entry is not None:
+                self._put(ref, entry)
+
+    def _put(self, ref, entry):
+        for token in _tokens(entry):
+            self.items.add(f'{token}\x00{ref}')
+        self.entries[ref] = entry
+        self.bytes += _entry_bytes(ref, entry)
+
+    def _drop(self, ref):
+        entry = self.entries.pop(ref, None)
+        if entry is None:
+            return
+        for token in _tokens(entry):
+            self.items.remove(f'{token}\x00{ref}')
+        self.bytes -= _entry_bytes(ref, entry)
+
+    def match(self, terms, limit):
+        found, seen = [], set()
+        # Words typed in the order they appear in one field: a single prefix range
+        self._scan(' '.join(terms), (), limit, found, seen)
+        if len(found) < limit and len(terms) > 1:
+            # Words spread over fields ("acme sarah"): scan the rarest, check the others
+            rarest = min(terms, key=lambda term: self.items.rank(term + '\U0010ffff') - self.items.rank(term))
+            rest = list(terms)
+            rest.remove(rarest)
+            self._scan(rarest, rest, limit, found, seen)
+        return found
+
+    def _scan(self, prefix, rest, limit, found, seen):
+        rest = [_SEP + term for term in rest]
+        for scanned, item in enumerate(self.items.iter_from(prefix)):
+            if scanned == SCAN_LIMIT or not item.startswith(prefix):
+                return
+            ref = item[item.index('\x00') + 1:]
+            if ref in seen:
+                continue
+            seen.add(ref)
+            name, subtitle, tokens = self.entries[ref]
+            if all(term in tokens for term in rest):
+                entity, _, entity_id = ref.partition('\x00')
+                found.append({'type': entity, 'id': entity_id, 'name': name, 'subtitle': subtitle})
+                if len(found) == limit:
+                    return
+
+
+class AutocompleteIndex:
+    """
+    Per-owner prefix indexes, loaded on an owner's first suggestion request.
+
+    Committed ORM changes are picked up through session events; the bulk
+    write paths, which bypass the ORM unit of work, call stage() with their
+    column rows. Changes are applied only when the transaction commits.
+
+    Memory is bounded by SUGGEST_MAX_ENTRIES across all owners: least
+    recently used owners are evicted first, and an owner with more records
+    than the bound on their own is served by full-text search instead.
+    An owner's index is reloaded after SUGGEST_MAX_AGE seconds, which also
+    picks up writes made by other worker processes.
+    """
+
+    def __init__(self):
+        self.max_entries = 500000
+        self.max_age = 300.0
+        self._owners = OrderedDict()   # owner_id -> _OwnerIndex, least recently used first
+        self._oversized = {}           # owner_id -> when they were found too large to index
+        self._loading = {}             # owner_id -> changed while loading
+        self._lock = threading.Lock()
+        self._listening = False
+        self.counters = {'suggestions': 0, 'loads': 0, 'evictions': 0, 'fallbacks': 0}
+
+    def init_app(self, app):
+        """Read limits from app.config and start following session commits"""
+        self.max_entries = app.config.get('SUGGEST_MAX_ENTRIES', 500000)
+        self.max_age = app.config.get('SUGGEST_MAX_AGE', 300)
+        if not self._listening:
+            event.listen(RoutingSession, 'after_flush', self._after_flush)
+            event.listen(RoutingSession, 'after_commit', self._after_commit)
+            event.listen(RoutingSession, 'after_transaction_end', self._after_transaction_end)
+            self._listening = True
+        invalidation_bus.subscribe(self._invalidated)
+
+    def clear(self):
+        with self._lock:
+            self._owners.clear()
+            self._oversized.clear()
+
+    # ==================== CHANGE TRACKING ====================
+
+    def stage(self, entity, rows, deleted=False):
+        """Record bulk-written rows (column mappings with id and owner_id) for the current transaction"""
+        if entity not in SOURCES:
+            return
+        pending = [(row['owner_id'], entity, row['id'], None if deleted else row) for row in rows]
+        db.session.info.setdefault('autocomplete', []).extend(pending)
+        self._broadcast(db.session, pending)
+
+    def _after_flush(self, session, flush_context):
+        pending = []
+        for obj in session.new:
+            entity = ENTITY_BY_MODEL.get(type(obj))
+            if entity:
+                pending.append((obj.owner_id, entity, obj.id, self._row(entity, obj)))
+        for obj in session.dirty:
+            entity = ENTITY_BY_MODEL.get(type(obj))
+            if not entity:
+                continue
+            attrs = inspect(obj).attrs
+            if not any(attrs[column].history.has_changes() for column in SOURCES[entity].columns):
+                continue
+            for old_owner in attrs.owner_id.history.deleted:
+                pending.append((old_owner, entity, obj.id, None))
+            pending.append((obj.owner_id, entity, obj.id, self._row(entity, obj)))
+        for obj in session.deleted:
+            entity = ENTITY_BY_MODEL.get(type(obj))
+            if entity:
+                pending.append((obj.owner_id, entity, obj.id, None))
+        if pending:
+            session.info.setdefault('autocomplete', []).extend(pending)
+            self._broadcast(session, pending)
+
+    @staticmethod
+    def _broadcast(session, pending):
+        # Other workers re-read these records into their own indexes after the commit
+        by_key = {}
+        for owner_id, entity, entity_id, _ in pending:
+            by_key.setdefault((owner_id, entity), []).append(entity_id)
+        for (owner_id, entity), ids in by_key.items():
+            invalidation_bus.stage(session, owner_id, entity, ids)
+
+    @staticmethod
+    def _row(entity, obj):
+        return {column: getattr(obj, column) for column in SOURCES[entity].columns}
+
+    def _after_commit(self, session):
+        pending = session.info.pop('autocomplete', None)
+        if pending:
+            self.apply(pending)
+
+    @staticmethod
+    def _after_transaction_end(session, transaction):
+        # Rolled back (or never committed): its staged changes never happened
+        if transaction.parent is None:
+            session.info.pop('autocomplete', None)
+
+    def apply(self, pending):
+        """Apply committed (owner_id, entity, id, row or None) changes to loaded owners"""
+        by_owner = {}
+        for owner_id, entity, entity_id, row in pending:
+            by_owner.setdefault(owner_id, []).append((entity, entity_id, row))
+        # Entries are only built for owners already in memory, so a bulk write
+        # for anyone else costs nothing here. An owner loaded after this check
+        # read the database after the commit and already has these rows.
+        changes = {
+            owner_id: [(_ref(entity, entity_id), row and _entry(entity, row)) for entity, entity_id, row in rows]
+            for owner_id, rows in by_owner.items() if owner_id in self._owners
+        }
+        with self._lock:
+            for owner_id in by_owner:
+                if owner_id in self._loading:
+                    self._loading[owner_id] = True
+                index = self._owners.get(owner_id)
+                if index is not None and owner_id in changes:
+                    index.apply(changes[owner_id])
+            self._evict()
+
+    def _invalidated(self, invalidations):
+        """Catch up with another worker's commit by re-reading the records it changed"""
+        refs = {}
+        for owner_id, entity, ids in invalidations:
+            if entity not in SOURCES or (owner_id not in self._owners and owner_id not in self._loading):
+                continue
+            if ids is None:
+                # Too many to list: reload this owner when next asked
+                with self._lock:
+                    self._owners.pop(owner_id, None)
+                    if owner_id in self._loading:
+                        self._loading[owner_id] = True
+                continue
+            refs.setdefault(entity, []).extend((owner_id, entity_id) for entity_id in ids)
+
+        pending = []
+        for entity, entity_refs in refs.items():
+            source = SOURCES[entity]
+            columns = [getattr(source.model, column) for column in source.columns]
+            rows = {
+                row['id']: dict(row) for row in db.session.execute(
+                    select(*columns).where(source.model.id.in_({entity_id for _, entity_id in entity_refs}))
+                ).mappings()
+            }
+            for owner_id, entity_id in entity_refs:
+                row = rows.get(entity_id)
+                # Gone, or moved to another owner (who gets their own invalidation)
+                pending.append((owner_id, entity, entity_id, row if row and row['owner_id'] == owner_id else None))
+        if pending:
+            self.apply(pending)
+
+    # ==================== LOOKUP ====================
+
+    def suggest(self, owner_id, query, limit=8):
+        """Up to `limit` records of owner_id whose words start with the query's words"""
+        terms = _terms(query)
+        if not terms:
+            return []
+        index = self._owner(owner_id)
+        if index is None:
+            self.counters['fallbacks'] += 1
+            return search.search(owner_id, query, limit)
+        with self._lock:
+            self.counters['suggestions'] += 1
+            return index.match(terms, limit)
+
+    def _owner(self, owner_id):
+        now = time.monotonic()
+        with self._lock:
+            index = self._owners.get(owner_id)
+            if index is not None and now - index.loaded_at < self.max_age:
+                self._owners.move_to_end(owner_id)
+                return index
+            if now - self._oversized.get(owner_id, -self.max_age) < self.max_age:
+                return None
+            self._loading[owner_id] = False
+
+        index = self._load(owner_id)
+
+        with self._lock:
+            changed = self._loading.pop(owner_id, False)
+            self.counters['loads'] += 1
+            if index is None:
+                self._owners.pop(owner_id, None)
+                self._oversized[owner_id] = now
+                return None
+            self._oversized.pop(owner_id, None)
+            if changed:
+                # A commit landed mid-load and may be missing: serve this copy, reload next time
+                index.loaded_at = -self.max_age
+            self._owners[owner_id] = index
+            self._evict()
+            return index
+
+    def _load(self, owner_id):
+        """Read one owner's records into a new index; None if they exceed max_entries"""
+        entries = {}
+        for entity, source in SOURCES.items():
+            columns = [getattr(source.model, column) for column in source.columns]
+            rows = db.session.execute(
+                select(*columns).where(source.model.owner_id == owner_id)
+                .limit(self.max_entries - len(entries) + 1)
+            ).mappings()
+            for row in rows:
+                entries[_ref(entity, row['id'])] = _entry(entity, row)
+            if len(entries) > self.max_entries:
+                return None
+        return _OwnerIndex(entries)
+
+    def _evict(self):
+        total = sum(len(index.entries) for index in self._owners.values())
+        while total > self.max_entries and self._owners:
+            _, index = self._owners.popitem(last=False)
+            total -= len(index.entries)
+            self.counters['evictions'] += 1
+
+    def stats(self):
+        """Size of the index and how it has been used, for /api/search/suggest/stats"""
+        with self._lock:
+            indexes = list(self._owners.values())
+            return {
+                'owners': len(indexes),
+                'entries': sum(len(index.entries) for index in indexes),
+                'tokens': sum(len(index.items) for index in indexes),
+                'approx_bytes': sum(index.bytes for index in indexes),
+                'max_entries': self.max_entries,
+                'oversized_owners': len(self._oversized),
+                **self.counters,
+            }
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,507 @@
+"""
+GeminiCRM Pro - Bulk Write Operations
+Validates arrays of CRM records in one pass and writes them with executemany
+statements, so thousands of rows cost a handful of round trips and one commit
+"""
+from datetime import date, datetime
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, delete, func, insert, select, update
+
+from models.db_models import (
+    db, Account, Activity, Contact, Lead, Opportunity, OpportunityLineItem, Task,
+    generate_uuid, get_current_time
+)
+from services import pipeline_summary
+from services.autocomplete import autocomplete_index
+
+# Probability implied by each stage when a write does not set one explicitly
+STAGE_PROBABILITIES = {
+    'prospecting': 10,
+    'qualification': 20,
+    'needs_analysis': 30,
+    'value_proposition': 40,
+    'id_decision_makers': 50,
+    'perception_analysis': 60,
+    'proposal': 70,
+    'negotiation': 80,
+    'closed_won': 100,
+    'closed_lost': 0
+}
+
+# Keeps IN (...) lists well under every driver's bound-parameter limit
+CHUNK_SIZE = 500
+
+
+class BulkEntity:
+    """What a bulk endpoint may write for one model"""
+
+    def __init__(self, model, audit_type, create_fields, update_fields, display,
+                 defaults=None, aliases=None, required=(), nullify=(), cascade=()):
+        self.model = model
+        self.audit_type = audit_type
+        self.create_fields = create_fields
+        self.update_fields = update_fields
+        self.display = display
+        self.defaults = defaults or {}
+        self.aliases = aliases or {}
+        self.required = required
+        self.nullify = nullify    # foreign keys cleared when a row is deleted
+        self.cascade = cascade    # foreign keys whose rows are deleted with it
+
+
+def _lead_name(row):
+    return row.get('name') or f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip()
+
+
+BULK_ENTITIES = {
+    'leads': BulkEntity(
+        Lead, 'lead',
+        create_fields=('name', 'first_name', 'last_name', 'email', 'phone', 'company', 'title', 'source',
+                       'status', 'industry', 'estimated_value', 'description', 'score', 'rating'),
+        update_fields=('name', 'first_name', 'last_name', 'email', 'phone', 'company', 'title', 'source',
+                       'status', 'industry', 'estimated_value', 'description', 'score', 'rating'),
+        display=_lead_name,
+        defaults={'status': 'new', 'estimated_value': 0},
+        required=('name',),
+        nullify=(Activity.lead_id,),
+    ),
+    'contacts': BulkEntity(
+        Contact, 'contact',
+        create_fields=('first_name', 'last_name', 'email', 'phone', 'mobile', 'title', 'department',
+                       'account_id', 'lead_source', 'description'),
+        update_fields=('first_name', 'last_name', 'email', 'phone', 'mobile', 'title', 'department',
+                       'account_id', 'description'),
+        display=lambda row: f"{row.get('first_name') or ''} {row.get('last_name') or ''}".strip(),
+        defaults={'first_name': '', 'last_name': ''},
+        nullify=(Lead.contact_id, Opportunity.contact_id, Activity.contact_id),
+    ),
+    'accounts': BulkEntity(
+        Account, 'account',
+        create_fields=('name', 'website', 'industry', 'company_size', 'annual_revenue', 'phone',
+                       'account_type', 'description', 'rating'),
+        update_fields=('name', 'website', 'industry', 'company_size', 'annual_revenue', 'phone',
+                       'account_type', 'description', 'rating'),
+        display=lambda row: row.get('name'),
+        defaults={'account_type': 'prospect'},
+        required=('name',),
+        nullify=(Contact.account_id, Opportunity.account_id, Activity.account_id, Account.parent_id),
+    ),
+    'opportunities': BulkEntity(
+        Opportunity, 'opportunity',
+        create_fields=('name', 'description', 'amount', 'stage', 'probability', 'close_date', 'account_id',
+                       'contact_id', 'opportunity_type', 'lead_source', 'next_step'),
+        update_fields=('name', 'description', 'amount', 'stage', 'probability', 'close_date',
+                       'opportunity_type', 'lead_source', 'next_step', 'loss_reason'),
+        display=lambda row: row.get('name'),
+        defaults={'amount': 0, 'stage': 'prospecting'},
+        required=('name',),
+        nullify=(Activity.opportunity_id,),
+        cascade=(OpportunityLineItem.opportunity_id,),
+    ),
+    'tasks': BulkEntity(
+        Task, 'task',
+        create_fields=('subject', 'description', 'status', 'priority', 'task_type', 'due_date',
+                       'related_to_type', 'related_to_id', 'assigned_to_id'),
+        update_fields=('subject', 'description', 'status', 'priority', 'task_type', 'due_date'),
+        display=lambda row: row.get('subject'),
+        defaults={'status': 'not_started', 'priority': 'normal'},
+        aliases={'title': 'subject', 'type': 'task_type'},
+        required=('subject',),
+    ),
+}
+BULK_ENTITIES['deals'] = BULK_ENTITIES['opportunities']
+
+
+class BulkResult:
+    """Per-item outcome of a bulk call plus the audit entries it produced"""
+
+    def __init__(self):
+        self.ids = {}       # request index -> id written
+        self.details = {}   # request index -> extra keys for its result entry
+        self.errors = {}    # request index -> {field: message}
+        self.audit = []     # dicts for the batched audit insert
+
+    def fail(self, index, field, message):
+        self.errors.setdefault(index, {})[field] = message
+
+    def to_dict(self):
+        return {
+            'succeeded': len(self.ids),
+            'failed': len(self.errors),
+            'results': [
+                {'index': i, 'id': row_id, **self.details.get(i, {})} for i, row_id in sorted(self.ids.items())
+            ],
+            'errors': [{'index': i, 'errors': errs} for i, errs in sorted(self.errors.items())],
+        }
+
+
+def returning_ids(stmt, id_column):
+    """
+    stmt with RETURNING id where the database supports it for many rows.
+
+    SQLAlchemy then packs the rows into multi-row VALUES statements
+    (insertmanyvalues) rather than running one statement per row. That matters
+    most on SQLite, whose FTS5 search triggers flush an index segment at the
+    end of every statement: one row per statement is about twice as slow.
+    """
+    if db.engine.dialect.insert_executemany_returning:
+        return stmt.returning(id_column)
+    return stmt
+
+
+def _insert(model, rows):
+    """Multi-row INSERT; render_nulls keeps rows with None values in the same batch"""
+    db.session.execute(returning_ids(insert(model).execution_options(render_nulls=True), model.id), rows)
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), CHUNK_SIZE):
+        yield values[start:start + CHUNK_SIZE]
+
+
+def _coerce(column, value):
+    """Validate a JSON value against a column type; raises ValueError with a client-facing message"""
+    if value is None:
+        if not column.nullable:
+            raise ValueError('may not be null')
+        return None
+
+    kind = column.type
+    if isinstance(kind, Boolean):
+        if not isinstance(value, bool):
+            raise ValueError('must be a boolean')
+    elif isinstance(kind, Integer):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError('must be an integer')
+        try:
+            number = float(value)
+            if number != int(number):
+                raise ValueError
+        except (ValueError, OverflowError):
+            raise ValueError('must be an integer')
+        value = int(number)
+    elif isinstance(kind, Float):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise ValueError('must be a number')
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError('must be a number')
+    elif isinstance(kind, DateTime):
+        try:
+            value = datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError('must be an ISO 8601 datetime')
+    elif isinstance(kind, Date):
+        try:
+            value = date.fromisoformat(value)
+        except (TypeError, ValueError):
+            raise ValueError('must be a YYYY-MM-DD date')
+    elif isinstance(kind, String):
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            raise ValueError('must be a string')
+        value = str(value)
+        if kind.length and len(value) > kind.length:
+            raise ValueError(f'must be at most {kind.length} characters')
+    return value
+
+
+def _clean(spec, index, record, fields, result):
+    """Coerce the writable fields of one record, recording any errors"""
+    if not isinstance(record, dict):
+        result.fail(index, '_record', 'must be an object')
+        return None
+
+    columns = spec.model.__table__.columns
+    row = {}
+    for alias, field in spec.aliases.items():
+        if alias in record and field not in record:
+            record = dict(record, **{field: record[alias]})
+    for field in fields:
+        if field not in record:
+            continue
+        try:
+            row[field] = _coerce(columns[field], record[field])
+        except ValueError as e:
+            result.fail(index, field, str(e))
+    return row
+
+
+def _check_references(spec, rows, result):
+    """Flag rows pointing at accounts/contacts/users that do not exist, one query per foreign key"""
+    for column in spec.model.__table__.columns:
+        if column.name == 'owner_id' or not column.foreign_keys:
+            continue
+        wanted = {row[column.name] for row in rows.values() if row.get(column.name)}
+        if not wanted:
+            continue
+        target = next(iter(column.foreign_keys)).column
+        found = set()
+        for chunk in _chunks(wanted):
+            found.update(db.session.execute(select(target).where(target.in_(chunk))).scalars())
+        for index, row in rows.items():
+            if row.get(column.name) and row[column.name] not in found:
+                result.fail(index, column.name, f'unknown {target.table.name[:-1]} id')
+
+
+def _load_owned(spec, ids, owner_id):
+    """{id: row mapping} for the requested ids that belong to owner_id"""
+    table = spec.model.__table__
+    existing = {}
+    for chunk in _chunks(ids):
+        stmt = select(table).where(table.c.id.in_(chunk), table.c.owner_id == owner_id)
+        for row in db.session.execute(stmt).mappings():
+            existing[row['id']] = dict(row)
+    return existing
+
+
+def _requested_ids(records, result):
+    """Map request index -> id for update/delete payloads, flagging bad and repeated ids"""
+    ids, seen = {}, set()
+    for index, record in enumerate(records):
+        row_id = record.get('id') if isinstance(record, dict) else record
+        if not isinstance(row_id, str) or not row_id:
+            result.fail(index, 'id', 'is required')
+        elif row_id in seen:
+            result.fail(index, 'id', 'appears more than once in this request')
+        else:
+            seen.add(row_id)
+            ids[index] = row_id
+    return ids
+
+
+def bulk_create(spec, records, owner_id):
+    """Insert every valid record with a single executemany INSERT"""
+    result = BulkResult()
+    rows = {}
+    for index, record in enumerate(records):
+        row = _clean(spec, index, record, spec.create_fields, result)
+        if row is None:
+            continue
+        for field, value in spec.defaults.items():
+            if row.get(field) is None:
+                row[field] = value
+        if spec.model is Lead:
+            row['name'] = _lead_name(row)
+        if spec.model is Opportunity and row.get('probability') is None:
+            row['probability'] = STAGE_PROBABILITIES.get(row['stage'], 10)
+        if spec.model is Task and row.get('assigned_to_id') is None:
+            row['assigned_to_id'] = owner_id
+        for field in spec.required:
+            if not row.get(field):
+                result.fail(index, field, 'is required')
+        rows[index] = row
+
+    _check_references(spec, rows, result)
+    rows = {i: row for i, row in rows.items() if i not in result.errors}
+    if not rows:
+        return result
+
+    now = get_current_time()
+    for index, row in rows.items():
+        row.update(id=generate_uuid(), owner_id=owner_id, created_at=now, updated_at=now)
+        result.ids[index] = row['id']
+        result.audit.append({'entity_id': row['id'], 'entity_name': spec.display(row)})
+
+    _insert(spec.model, list(rows.values()))
+    autocomplete_index.stage(spec.audit_type, rows.values())
+    if spec.model is Opportunity:
+        pipeline_summary.apply_changes((None, pipeline_summary.snapshot_row(r)) for r in rows.values())
+    return result
+
+
+def bulk_update(spec, records, owner_id):
+    """Apply partial updates by id with one executemany UPDATE per distinct field set"""
+    result = BulkResult()
+    ids = _requested_ids(records, result)
+    existing = _load_owned(spec, ids.values(), owner_id)
+
+    changes = {}
+    for index, row_id in ids.items():
+        if row_id not in existing:
+            result.fail(index, 'id', 'not found')
+            continue
+        row = _clean(spec, index, records[index], spec.update_fields, result)
+        if row is None:
+            continue
+        if spec.model is Opportunity and 'stage' in row and row['stage'] in STAGE_PROBABILITIES:
+            row['probability'] = STAGE_PROBABILITIES[row['stage']]
+        if spec.model is Task and row.get('status') == 'completed' and not existing[row_id]['completed_date']:
+            row['completed_date'] = get_current_time()
+        for field in spec.required:
+            if field in row and not row[field]:
+                result.fail(index, field, 'is required')
+        changes[index] = row
+
+    _check_references(spec, changes, result)
+    changes = {i: row for i, row in changes.items() if i not in result.errors}
+    if not changes:
+        return result
+
+    now = get_current_time()
+    by_fields, rollup = {}, []
+    for index, row in changes.items():
+        row_id = ids[index]
+        old = existing[row_id]
+        result.ids[index] = row_id
+        result.audit.append({
+            'entity_id': row_id,
+            'entity_name': spec.display({**old, **row}),
+            'old_values': {k: _jsonable(old[k]) for k in row},
+            'new_values': {k: _jsonable(v) for k, v in row.items()},
+        })
+        if spec.model is Opportunity:
+            rollup.append((pipeline_summary.snapshot_row(old), pipeline_summary.snapshot_row({**old, **row})))
+        by_fields.setdefault(frozenset(row), []).append(dict(row, id=row_id, updated_at=now))
+
+    for params in by_fields.values():
+        db.session.execute(update(spec.model), params)
+    autocomplete_index.stage(spec.audit_type, ({**existing[ids[i]], **row} for i, row in changes.items()))
+    if rollup:
+        pipeline_summary.apply_changes(rollup)
+    return result
+
+
+def bulk_delete(spec, records, owner_id):
+    """Delete by id, clearing or removing dependent rows first as the ORM would"""
+    result = BulkResult()
+    ids = _requested_ids(records, result)
+    existing = _load_owned(spec, ids.values(), owner_id)
+
+    doomed = []
+    for index, row_id in ids.items():
+        if row_id not in existing:
+            result.fail(index, 'id', 'not found')
+            continue
+        doomed.append(row_id)
+        result.ids[index] = row_id
+        result.audit.append({'entity_id': row_id, 'entity_name': spec.display(existing[row_id])})
+    if not doomed:
+        return result
+
+    for chunk in _chunks(doomed):
+        for column in spec.cascade:
+            db.session.execute(delete(column.table).where(column.in_(chunk)))
+        for column in spec.nullify:
+            db.session.execute(update(column.table).where(column.in_(chunk)).values({column.key: None}))
+        db.session.execute(delete(spec.model.__table__).where(spec.model.__table__.c.id.in_(chunk)))
+    autocomplete_index.stage(spec.audit_type, (existing[i] for i in doomed), deleted=True)
+
+    if spec.model is Opportunity:
+        pipeline_summary.apply_changes((pipeline_summary.snapshot_row(existing[i]), None) for i in doomed)
+    # Anything already loaded for these ids is now stale
+    db.session.expire_all()
+    return result
+
+
+def _contact_names(lead):
+    """First/last name for the contact a lead converts into"""
+    parts = (lead['name'] or '').split()
+    first = lead['first_name'] or (parts[0] if parts else 'Unknown')
+    last = lead['last_name'] or (parts[-1] if len(parts) > 1 else '')
+    return first, last
+
+
+def bulk_convert_leads(records, owner_id, create_opportunity=False):
+    """
+    Convert many leads in one transaction.
+
+    Leads sharing a company name (case-insensitive) share one Account, and an
+    Account the owner already has under that name is reused instead of
+    duplicated. Accounts, contacts and opportunities are each written with a
+    single executemany INSERT; each result entry names the records created
+    for that lead.
+    """
+    result = BulkResult()
+    ids = _requested_ids(records, result)
+    leads = _load_owned(BULK_ENTITIES['leads'], ids.values(), owner_id)
+
+    for index, lead_id in list(ids.items()):
+        if lead_id not in leads:
+            result.fail(index, 'id', 'not found')
+        elif leads[lead_id]['is_converted']:
+            result.fail(index, 'id', 'already converted')
+        if index in result.errors:
+            del ids[index]
+    if not ids:
+        return result
+
+    # One account per distinct company, reusing the owner's existing ones
+    companies = {}
+    for lead_id in ids.values():
+        company = (leads[lead_id]['company'] or '').strip()
+        if company:
+            companies.setdefault(company.lower(), leads[lead_id])
+    account_ids = {}
+    for chunk in _chunks(companies):
+        stmt = (
+            select(func.lower(Account.name), Account.id)
+            .where(Account.owner_id == owner_id, func.lower(Account.name).in_(chunk))
+            .order_by(Account.created_at)
+        )
+        for key, account_id in db.session.execute(stmt):
+            account_ids.setdefault(key, account_id)
+
+    now = get_current_time()
+    stamps = {'owner_id': owner_id, 'created_at': now, 'updated_at': now}
+    accounts = []
+    for key, lead in companies.items():
+        if key not in account_ids:
+            account_ids[key] = generate_uuid()
+            accounts.append(dict(
+                stamps, id=account_ids[key], name=lead['company'].strip(), website=lead['website'],
+                industry=lead['industry'], account_type='prospect'
+            ))
+
+    contacts, opportunities, converted = [], [], []
+    new_accounts = {row['id'] for row in accounts}
+    for index, lead_id in ids.items():
+        lead = leads[lead_id]
+        account_id = account_ids.get((lead['company'] or '').strip().lower())
+        first_name, last_name = _contact_names(lead)
+        contact = dict(
+            stamps, id=generate_uuid(), first_name=first_name, last_name=last_name, email=lead['email'],
+            phone=lead['phone'], title=lead['title'], account_id=account_id, lead_source=lead['source']
+        )
+        contacts.append(contact)
+
+        opportunity_id = None
+        if create_opportunity:
+            opportunity_id = generate_uuid()
+            opportunities.append(dict(
+                stamps, id=opportunity_id, name=f"{lead['company'] or lead['name']} - Opportunity",
+                amount=lead['estimated_value'] or 0, stage='prospecting',
+                probability=STAGE_PROBABILITIES['prospecting'], account_id=account_id,
+                contact_id=contact['id'], lead_source=lead['source']
+            ))
+
+        converted.append({
+            'id': lead_id, 'is_converted': True, 'converted_date': now, 'updated_at': now,
+            'converted_account_id': account_id, 'converted_contact_id': contact['id'],
+            'converted_opportunity_id': opportunity_id,
+        })
+        result.ids[index] = lead_id
+        result.details[index] = {
+            'account_id': account_id,
+            'account_created': account_id in new_accounts,
+            'contact_id': contact['id'],
+            'opportunity_id': opportunity_id,
+        }
+        result.audit.append({'entity_id': lead_id, 'entity_name': lead['name']})
+
+    if accounts:
+        _insert(Account, accounts)
+    _insert(Contact, contacts)
+    autocomplete_index.stage('account', accounts)
+    autocomplete_index.stage('contact', contacts)
+    if opportunities:
+        _insert(Opportunity, opportunities)
+        autocomplete_index.stage('opportunity', opportunities)
+        pipeline_summary.apply_changes((None, pipeline_summary.snapshot_row(o)) for o in opportunities)
+    db.session.execute(update(Lead), converted)
+    return result
+
+
+def _jsonable(value):
+    return value.isoformat() if isinstance(value, (date, datetime)) else value
@@ -0,0 +1,64 @@
+"""
+GeminiCRM Pro - Response Compression
+gzip or brotli, whichever the client prefers, for buffered text and JSON
+responses of at least COMPRESS_MIN_SIZE bytes; streamed responses such as
+exports pick their own encoding
+"""
+import gzip
+import importlib.util
+from functools import partial
+
+from flask import request
+
+# Brotli is optional; without it every client that asks gets gzip
+ENCODINGS = ('br', 'gzip') if importlib.util.find_spec('brotli') else ('gzip',)
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/x-ndjson', 'application/javascript',
+    'application/xml', 'image/svg+xml',
+)
+
+
+def init_app(app):
+    """Compress responses after the request; register before anything that must see the plain body"""
+    app.after_request(partial(
+        compress_response,
+        min_size=app.config.get('COMPRESS_MIN_SIZE', 1024),
+        gzip_level=app.config.get('COMPRESS_GZIP_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESS_BROTLI_QUALITY', 4),
+    ))
+
+
+def compressible(response):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES
+
+
+def compress(data, encoding, gzip_level=6, brotli_quality=4):
+    if encoding == 'br':
+        import brotli
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def compress_response(response, min_size=1024, gzip_level=6, brotli_quality=4):
+    """Encode response's body in place when it is big enough and the client accepts it"""
+    if (response.direct_passthrough or response.is_streamed
+            or not 200 <= response.status_code < 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers or 'Content-Range' in response.headers
+            or not compressible(response)):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if (response.content_length or 0) < min_size:
+        return response
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    response.set_data(compress(response.get_data(), encoding, gzip_level, brotli_quality))
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ, so a strong validator would no longer hold for them
+    tag, weak = response.get_etag()
+    if tag and not weak:
+        response.set_etag(tag, weak=True)
+    return response
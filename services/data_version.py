@@ -0,0 +1,190 @@
+"""
+GeminiCRM Pro - Per-Owner Data Versions and Conditional GET
+Counts the commits that change each owner's data in data_versions, bumped in
+the same transaction as the change, and derives weak ETags from it so a
+client polling unchanged data gets a 304 before the view runs its queries
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, has_request_context, make_response, request
+from flask_login import current_user
+from sqlalchemy import event, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.db_models import db, DataVersion, User, get_current_time
+from models.engine import RoutingSession
+from services.invalidation import invalidation_bus
+
+# Columns naming the users whose views a row shows up in
+OWNER_ATTRIBUTES = ('owner_id', 'user_id', 'assigned_to_id')
+
+_listening = False
+
+
+def init_app(app):
+    """Start bumping versions on commit"""
+    global _listening
+    if not _listening:
+        event.listen(RoutingSession, 'after_flush', _after_flush)
+        event.listen(RoutingSession, 'before_commit', _before_commit)
+        event.listen(RoutingSession, 'after_transaction_end', _after_transaction_end)
+        _listening = True
+
+
+# ==================== VERSIONS ====================
+
+def current(owner_id):
+    """Opaque token that changes whenever owner_id's data does"""
+    row = db.session.execute(
+        select(DataVersion.version, DataVersion.updated_at).where(DataVersion.owner_id == owner_id)
+    ).first()
+    return f'{row.version}.{row.updated_at:%Y%m%d%H%M%S%f}' if row else '0'
+
+
+def touch(*owner_ids):
+    """Bump these owners' versions when the current transaction commits (for Core writes)"""
+    db.session.info.setdefault('data_version', set()).update(o for o in owner_ids if o)
+
+
+def _owners(obj, history=False):
+    if isinstance(obj, User):
+        yield obj.id
+    state = inspect(obj)
+    for name in OWNER_ATTRIBUTES:
+        if name not in state.attrs:
+            continue
+        yield getattr(obj, name)
+        if history:
+            # A record moved to someone else leaves the previous owner's views too
+            yield from state.attrs[name].history.deleted
+
+
+def _after_flush(session, flush_context):
+    touched = session.info.setdefault('data_version', set())
+    for obj in session.new:
+        touched.update(_owners(obj))
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            touched.update(_owners(obj, history=True))
+    for obj in session.deleted:
+        touched.update(_owners(obj))
+
+
+def _before_commit(session):
+    # Flush first so objects still pending are counted, then bump in the same transaction
+    session.flush()
+    touched = session.info.pop('data_version', set())
+    # The listeners are process-wide; apps without Flask-Login have no current_user to ask
+    if (session.info.get('wrote') and has_request_context() and hasattr(current_app, 'login_manager')
+            and current_user.is_authenticated):
+        # Core UPDATE/DELETE statements (bulk endpoints, Query.update) never reach after_flush;
+        # they only ever change the requesting user's own data
+        touched.add(current_user.id)
+    touched.discard(None)
+    if touched:
+        bump(sorted(touched))
+        for owner_id in touched:
+            invalidation_bus.stage(session, owner_id)
+
+
+def _after_transaction_end(session, transaction):
+    if transaction.parent is None:
+        session.info.pop('data_version', None)
+
+
+def bump(owner_ids):
+    """Increment each owner's version now, inside the current transaction"""
+    table = DataVersion.__table__
+    now = get_current_time()
+    rows = [{'owner_id': owner_id, 'version': 1, 'updated_at': now} for owner_id in owner_ids]
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert
+        stmt = insert(table).values(rows)
+        db.session.execute(stmt.on_conflict_do_update(
+            index_elements=['owner_id'],
+            set_={'version': table.c.version + 1, 'updated_at': stmt.excluded.updated_at},
+        ))
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.owner_id == row['owner_id'])
+            .values(version=table.c.version + 1, updated_at=now)
+        )
+        if updated.rowcount == 0:
+            db.session.execute(table.insert().values(**row))
+
+
+# ==================== CONDITIONAL GET ====================
+
+def utc_date():
+    """ETag input for views whose numbers roll over at midnight UTC (overdue, due today)"""
+    return datetime.utcnow().date()
+
+
+def utc_minute():
+    """ETag input for views with per-record time flags such as Task.is_overdue"""
+    return datetime.utcnow().strftime('%Y%m%d%H%M')
+
+
+def etag(owner_id, *extra):
+    """Weak ETag for the current URL as seen by owner_id at their current data version"""
+    parts = (owner_id, current(owner_id), request.full_path, *extra)
+    return hashlib.blake2b('\x00'.join(map(str, parts)).encode(), digest_size=12).hexdigest()
+
+
+def conditional(tag, build, last_modified=None):
+    """
+    build()'s response, or a bodiless 304 when the client already holds it.
+
+    If-None-Match is checked against tag; only without it is If-Modified-Since
+    compared with last_modified (whole seconds, as HTTP dates carry).
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(tag)
+    else:
+        since = request.if_modified_since
+        fresh = bool(last_modified and since)
+        fresh = fresh and last_modified.replace(microsecond=0) <= since.replace(tzinfo=None)
+
+    if fresh:
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(tag, weak=True)
+    if last_modified:
+        response.last_modified = last_modified
+    # Browsers may keep it but must revalidate before every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def versioned(*extra):
+    """ETag a view of the user's own data; extra callables add inputs such as utc_date"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            tag = etag(current_user.id, *(part() for part in extra))
+            return conditional(tag, lambda: view(*args, **kwargs))
+        return wrapper
+    return decorator
+
+
+def record_response(record, build, *extra):
+    """
+    ETag and Last-Modified for a single record's detail view.
+
+    The record's own columns were read before its owner's version, so its
+    updated_at goes into the tag as well; related rows that to_dict() loads
+    are read after it.
+    """
+    tag = etag(record.owner_id, record.updated_at, *extra)
+    return conditional(tag, build, record.updated_at)
@@ -6,6 +6,8 @@ from datetime import datetime
 import uuid
 from enum import Enum
 
+from services.state_store import state_store
+
 # ==================== EMAIL TEMPLATES ====================
 
 class EmailTemplate:
@@ -170,75 +172,83 @@ class EmailMessage:
 class EmailService:
     """Email service with template and campaign support"""
     
-    def __init__(self):
-        self.templates = {}
-        self.campaigns = {}
-        self.messages = {}
+    MAX_TEMPLATES = 10000
+    MAX_CAMPAIGNS = 10000
+    MAX_MESSAGES = 1000000    # across campaigns, oldest forgotten first
+    MAX_MESSAGES_PER_CAMPAIGN = 100000
+    
+    def __init__(self, store=None):
+        self.store = store or state_store
         self._init_default_templates()
     
     def _init_default_templates(self):
-        """Initialize default email templates"""
-        for name, content in EmailTemplate.TEMPLATES.items():
-            template = EmailTemplate({
+        """Initialize default email templates, once per store"""
+        # Fixed ids, so every worker sharing the store writes the same records
+        self.store.put_many('email_templates', {
+            f'system-{name}': EmailTemplate({
+                'id': f'system-{name}',
                 'name': name,
                 'subject': content['subject'],
                 'body': content['body'],
                 'category': 'system'
-            })
-            self.templates[template.id] = template.to_dict()
+            }).to_dict()
+            for name, content in EmailTemplate.TEMPLATES.items()
+            if self.store.get('email_templates', f'system-{name}') is None
+        })
     
     def create_template(self, data):
         """Create email template"""
         template = EmailTemplate(data)
-        self.templates[template.id] = template.to_dict()
+        self.store.put('email_templates', template.id, template.to_dict(), self.MAX_TEMPLATES)
         return template.to_dict()
     
     def get_template(self, template_id):
         """Get template by ID"""
-        return self.templates.get(template_id)
+        return self.store.get('email_templates', template_id)
     
     def list_templates(self):
         """List all templates"""
-        return list(self.templates.values())
+        return self.store.values('email_templates')
     
     def update_template(self, template_id, data):
         """Update template"""
-        if template_id not in self.templates:
+        template_data = self.store.get('email_templates', template_id)
+        if template_data is None:
             return None
         
-        template_data = self.templates[template_id]
         template_data.update(data)
         template_data['updated_at'] = datetime.now().isoformat()
+        self.store.put('email_templates', template_id, template_data, self.MAX_TEMPLATES)
         
         return template_data
     
     def delete_template(self, template_id):
         """Delete template"""
-        if template_id in self.templates:
-            del self.templates[template_id]
-            return True
-        return False
+        return self.store.delete('email_templates', template_id)
     
     def create_campaign(self, data):
         """Create email campaign"""
         campaign = EmailCampaign(data)
-        self.campaigns[campaign.id] = campaign.to_dict()
+        # to_dict() only counts the recipients; send_campaign() needs them
+        self.store.put('email_campaigns', campaign.id,
+                       {**campaign.to_dict(), 'recipient_ids': campaign.recipient_ids}, self.MAX_CAMPAIGNS)
+        self._drop_evicted_messages()
         return campaign.to_dict()
     
     def get_campaign(self, campaign_id):
         """Get campaign by ID"""
-        return self.campaigns.get(campaign_id)
+        return self.store.get('email_campaigns', campaign_id)
     
     def list_campaigns(self):
         """List all campaigns"""
-        return list(self.campaigns.values())
+        return self.store.values('email_campaigns')
     
     def update_campaign(self, campaign_id, data):
         """Update campaign"""
-        if campaign_id not in self.campaigns:
+        campaign_data = self.store.get('email_campaigns', campaign_id)
+        if campaign_data is None:
             return None
         
-        campaign_data = self.campaigns[campaign_id]
         allowed_fields = ['name', 'status', 'scheduled_at']
         
         for field in allowed_fields:
@@ -246,23 +256,42 @@ class EmailService:
                 campaign_data[field] = data[field]
         
         campaign_data['updated_at'] = datetime.now().isoformat()
+        self.store.put('email_campaigns', campaign_id, campaign_data, self.MAX_CAMPAIGNS)
         return campaign_data
     
+    def delete_campaign(self, campaign_id):
+        """Delete campaign and its messages"""
+        self._drop_messages(campaign_id)
+        return self.store.delete('email_campaigns', campaign_id)
+    
+    def _drop_messages(self, campaign_id):
+        # Entries in email_message_campaigns left pointing here find no message and age out under MAX_MESSAGES
+        self.store.drop(f'email_messages:{campaign_id}')
+        self.store.delete('email_sent_campaigns', campaign_id)
+    
+    def _drop_evicted_messages(self):
+        """Drop the messages of sent campaigns that MAX_CAMPAIGNS has pushed out of the store"""
+        sent = self.store.values('email_sent_campaigns')
+        for campaign_id, campaign in zip(sent, self.store.get_many('email_campaigns', sent)):
+            if campaign is None:
+                self._drop_messages(campaign_id)
+    
     def send_campaign(self, campaign_id, dry_run=False):
         """Send campaign to all recipients"""
-        if campaign_id not in self.campaigns:
+        campaign = self.store.get('email_campaigns', campaign_id)
+        if campaign is None:
             return False, 'Campaign not found'
         
-        campaign = self.campaigns[campaign_id]
-        template = self.templates.get(campaign['template_id'])
+        template = self.store.get('email_templates', campaign['template_id'])
         
         if not template:
             return False, 'Template not found'
         
-        messages_sent = 0
+        recipient_ids = campaign.get('recipient_ids', [])
         
-        for recipient_id in campaign.get('recipient_ids', []):
-            if not dry_run:
+        if not dry_run:
+            messages = {}
+            for recipient_id in recipient_ids:
                 message = EmailMessage({
                     'recipient_id': recipient_id,
                     'subject': template['subject'],
@@ -271,24 +300,27 @@ class EmailService:
                     'campaign_id': campaign_id,
                     'status': 'sent'
                 })
-                self.messages[message.id] = message.to_dict()
-                messages_sent += 1
-            else:
-                messages_sent += 1
+                messages[message.id] = message.to_dict()
+            # One write for the whole campaign, plus the index finding each message's campaign and
+            # the list of campaigns with messages, which _drop_evicted_messages() goes through
+            self.store.put_many(f'email_messages:{campaign_id}', messages, self.MAX_MESSAGES_PER_CAMPAIGN)
+            self.store.put_many('email_message_campaigns', dict.fromkeys(messages, campaign_id), self.MAX_MESSAGES)
+            self.store.put('email_sent_campaigns', campaign_id, campaign_id, self.MAX_CAMPAIGNS)
         
+        messages_sent = len(recipient_ids)
         campaign['status'] = 'sent'
         campaign['sent_at'] = datetime.now().isoformat()
         campaign['stats']['total_sent'] = messages_sent
+        self.store.put('email_campaigns', campaign_id, campaign, self.MAX_CAMPAIGNS)
         
         return True, f'{messages_sent} emails scheduled'
     
     def get_campaign_stats(self, campaign_id):
         """Get campaign statistics"""
-        if campaign_id not in self.campaigns:
+        if self.store.get('email_campaigns', campaign_id) is None:
             return None
         
-        campaign = self.campaigns[campaign_id]
-        campaign_messages = [m for m in self.messages.values() if m.get('campaign_id') == campaign_id]
+        campaign_messages = self.list_campaign_messages(campaign_id)
         
         stats = {
             'total_sent': len(campaign_messages),
@@ -304,33 +336,32 @@ class EmailService:
         
         return stats
     
+    def _track(self, message_id, from_statuses, status, timestamp_field):
+        campaign_id = self.store.get('email_message_campaigns', message_id)
+        message = campaign_id and self.store.get(f'email_messages:{campaign_id}', message_id)
+        if message and message['status'] in from_statuses:
+            message['status'] = status
+            message[timestamp_field] = datetime.now().isoformat()
+            self.store.put(f'email_messages:{campaign_id}', message_id, message)
+            return True
+        return False
+    
     def track_email_open(self, message_id):
         """Track email open"""
-        if message_id in self.messages:
-            message = self.messages[message_id]
-            if message['status'] == 'sent':
-                message['status'] = 'opened'
-                message['opened_at'] = datetime.now().isoformat()
-                return True
-        return False
+        return self._track(message_id, ['sent'], 'opened', 'opened_at')
     
     def track_email_click(self, message_id):
         """Track email click"""
-        if message_id in self.messages:
-            message = self.messages[message_id]
-            if message['status'] in ['sent', 'opened']:
-                message['status'] = 'clicked'
-                message['clicked_at'] = datetime.now().isoformat()
-                return True
-        return False
+        return self._track(message_id, ['sent', 'opened'], 'clicked', 'clicked_at')
     
     def get_message(self, message_id):
         """Get message by ID"""
-        return self.messages.get(message_id)
+        campaign_id = self.store.get('email_message_campaigns', message_id)
+        return self.store.get(f'email_messages:{campaign_id}', message_id) if campaign_id else None
     
     def list_campaign_messages(self, campaign_id):
         """List messages for campaign"""
-        return [m for m in self.messages.values() if m.get('campaign_id') == campaign_id]
+        return self.store.values(f'email_messages:{campaign_id}')
 
 # ==================== WEBHOOK SYSTEM ====================
 
@@ -360,44 +391,48 @@ class Webhook:
 class WebhookManager:
     """Manage webhooks"""
     
-    def __init__(self):
-        self.webhooks = {}
-        self.event_log = []
+    MAX_WEBHOOKS = 10000
+    MAX_EVENTS = 1000
+    
+    def __init__(self, store=None):
+        self.store = store or state_store
+    
+    @property
+    def event_log(self):
+        return self.store.tail('webhook_events')
     
     def register_webhook(self, data):
         """Register new webhook"""
         webhook = Webhook(data)
-        self.webhooks[webhook.id] = webhook.to_dict()
+        self.store.put('webhooks', webhook.id, webhook.to_dict(), self.MAX_WEBHOOKS)
         return webhook.to_dict()
     
     def trigger_webhook(self, event_type, payload):
         """Trigger webhooks for event"""
-        triggered = []
+        triggered = {}
         
-        for webhook_id, webhook in self.webhooks.items():
+        for webhook in self.store.values('webhooks'):
             if webhook.get('event_type') == event_type and webhook.get('is_active'):
-                self.event_log.append({
-                    'webhook_id': webhook_id,
+                self.store.append('webhook_events', {
+                    'webhook_id': webhook['id'],
                     'event_type': event_type,
                     'timestamp': datetime.now().isoformat(),
                     'payload': payload
-                })
-                triggered.append(webhook_id)
+                }, self.MAX_EVENTS)
                 webhook['last_triggered'] = datetime.now().isoformat()
+                triggered[webhook['id']] = webhook
         
-        return triggered
+        self.store.put_many('webhooks', triggered, self.MAX_WEBHOOKS)
+        return list(triggered)
     
     def get_webhook(self, webhook_id):
         """Get webhook by ID"""
-        return self.webhooks.get(webhook_id)
+        return self.store.get('webhooks', webhook_id)
     
     def list_webhooks(self):
         """List all webhooks"""
-        return list(self.webhooks.values())
+        return self.store.values('webhooks')
     
     def delete_webhook(self, webhook_id):
         """Delete webhook"""
-        if webhook_id in self.webhooks:
-            del self.webhooks[webhook_id]
-            return True
-        return False
+        return self.store.delete('webhooks', webhook_id)
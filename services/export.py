@@ -0,0 +1,237 @@
+"""
+GeminiCRM Pro - Streaming Export
+Writes an owner's records as CSV, NDJSON, JSON, XLSX, Parquet or Arrow while
+they are read from a server-side cursor, so an export of any size holds one
+batch (or, for the columnar formats, one row group) in memory
+"""
+import importlib.util
+import tempfile
+import zlib
+from itertools import chain
+
+from flask import current_app
+from sqlalchemy import JSON, Boolean, Date, DateTime, Float, Integer, Text, cast, select
+
+from models.db_models import db, Account, Contact, Lead, Opportunity, Task
+from models.serializers import eager_options, serialize_many
+from services.analytics_service import ExportManager
+
+EXPORT_MODELS = {
+    'leads': Lead,
+    'contacts': Contact,
+    'opportunities': Opportunity,
+    'accounts': Account,
+    'tasks': Task,
+}
+
+# format -> (mimetype, file extension, worth gzipping); text/* gets charset=utf-8 from the response class
+FORMATS = {
+    'csv': ('text/csv', 'csv', True),
+    'ndjson': ('application/x-ndjson', 'ndjson', True),
+    'json': ('application/json', 'json', True),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx', False),
+    # Parquet pages are already zstd-compressed; an Arrow IPC stream is not
+    'parquet': ('application/vnd.apache.parquet', 'parquet', False),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows', True),
+}
+# Formats that need a package outside the standard install
+OPTIONAL_DEPENDENCIES = {'xlsx': 'openpyxl', 'parquet': 'pyarrow', 'arrow': 'pyarrow'}
+# Bytes per chunk when sending a finished file
+FILE_CHUNK_SIZE = 64 * 1024
+
+
+def supported(format_type):
+    """False when the format's optional dependency is not installed"""
+    package = OPTIONAL_DEPENDENCIES.get(format_type)
+    return package is None or importlib.util.find_spec(package) is not None
+
+
+def iter_batches(model, owner_id, batch_size=1000):
+    """to_dict() rows of owner_id's records, batch_size at a time, in creation order"""
+    stmt = (
+        select(model)
+        .options(*eager_options(model))
+        .where(model.owner_id == owner_id)
+        .order_by(model.created_at, model.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for partition in db.session.execute(stmt).scalars().partitions():
+        yield serialize_many(partition)
+        # The identity map only holds weak references, but expunging keeps it from ever growing
+        for item in partition:
+            db.session.expunge(item)
+
+
+def _csv(batches):
+    first = next(batches, None)
+    if first is None:
+        return
+    yield from ExportManager.iter_csv(chain([first], batches), list(first[0]))
+
+
+def _ndjson(batches):
+    dumps = current_app.json.dumps
+    for batch in batches:
+        yield ''.join(dumps(row) + '\n' for row in batch)
+
+
+def _json(batches, entity_type):
+    # Same document the non-streaming endpoint returned, with count moved after the data
+    dumps = current_app.json.dumps
+    yield '{"success": true, "entity_type": ' + dumps(entity_type) + ', "data": ['
+    count = 0
+    for batch in batches:
+        if batch:
+            yield (',' if count else '') + ','.join(dumps(row) for row in batch)
+            count += len(batch)
+    yield '], "count": ' + str(count) + '}'
+
+
+def _xlsx(batches, entity_type):
+    # A zip archive can only be finished once every row is in, so rows are
+    # written to a temporary file as they arrive and the file is sent after
+    with tempfile.TemporaryFile() as spool:
+        first = next(batches, None)
+        columns = list(first[0]) if first else []
+        ExportManager.write_excel(chain([first], batches) if first else [], columns, spool, entity_type)
+        spool.seek(0)
+        while chunk := spool.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+# ==================== COLUMNAR (PARQUET / ARROW) ====================
+
+def arrow_type(column_type):
+    """Arrow type for a SQLAlchemy column type; DateTime columns hold naive UTC"""
+    import pyarrow as pa
+
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, JSON):
+        # JSON text; tagged as JSON where pyarrow has the extension type (19+)
+        return pa.json_(pa.string()) if hasattr(pa, 'json_') else pa.string()
+    return pa.string()
+
+
+def arrow_schema(model):
+    """Arrow schema of a model's table columns"""
+    import pyarrow as pa
+
+    return pa.schema([
+        pa.field(column.name, arrow_type(column.type), nullable=column.nullable)
+        for column in model.__table__.columns
+    ])
+
+
+def iter_record_batches(model, owner_id, batch_size=1000, row_group_size=50000):
+    """
+    pyarrow RecordBatches of owner_id's rows, up to row_group_size rows each.
+
+    Rows come from the table columns (not to_dict()) batch_size at a time and
+    are converted column by column, so only one batch of Python values and
+    one row group of Arrow arrays are alive at once.
+    """
+    import pyarrow as pa
+
+    schema = arrow_schema(model)
+    # JSON columns are read as the stored text rather than decoded and re-encoded
+    columns = [
+        cast(column, Text).label(column.name) if isinstance(column.type, JSON) else column
+        for column in model.__table__.columns
+    ]
+    stmt = (
+        select(*columns)
+        .where(model.owner_id == owner_id)
+        .order_by(model.created_at, model.id)
+        .execution_options(yield_per=batch_size)
+    )
+    pending, pending_rows = [], 0
+    for partition in db.session.execute(stmt).partitions():
+        arrays = [pa.array(values, type=field.type) for field, values in zip(schema, zip(*partition))]
+        pending.append(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        pending_rows += len(partition)
+        if pending_rows >= row_group_size:
+            yield pa.Table.from_batches(pending, schema).combine_chunks().to_batches()[0]
+            pending, pending_rows = [], 0
+    if pending:
+        yield pa.Table.from_batches(pending, schema).combine_chunks().to_batches()[0]
+
+
+class _ChunkSink:
+    """Write-only file object that hands back whatever was written since the last drain"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _columnar(model, owner_id, format_type, batch_size, row_group_size):
+    # Both writers only append, so each row group is sent as soon as it is written;
+    # Parquet's footer comes last, when the writer is closed
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    schema = arrow_schema(model)
+    if format_type == 'parquet':
+        writer = pq.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in iter_record_batches(model, owner_id, batch_size, row_group_size):
+            writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def stream(entity_type, owner_id, format_type, batch_size=1000, row_group_size=50000):
+    """Chunks of the export (text, or bytes for the binary formats); format_type is a FORMATS key"""
+    if format_type in ('parquet', 'arrow'):
+        return _columnar(EXPORT_MODELS[entity_type], owner_id, format_type, batch_size, row_group_size)
+    batches = (batch for batch in iter_batches(EXPORT_MODELS[entity_type], owner_id, batch_size) if batch)
+    if format_type == 'csv':
+        return _csv(batches)
+    if format_type == 'ndjson':
+        return _ndjson(batches)
+    if format_type == 'xlsx':
+        return _xlsx(batches, entity_type)
+    return _json(batches, entity_type)
+
+
+def gzipped(chunks, level=6):
+    """gzip-compress a stream of text or byte chunks without buffering the whole body"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
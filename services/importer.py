@@ -0,0 +1,311 @@
+"""
+GeminiCRM Pro - Bulk Import Pipeline
+Reads an uploaded CSV, NDJSON or JSON file in chunks, validates and coerces
+each chunk a column at a time with pandas, skips rows whose email the owner
+already has, and inserts the rest with one transaction per chunk from a
+worker thread. Progress and per-row errors live on an ImportJob row.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, String, insert, select
+
+from models.db_models import db, ImportJob, Lead, Opportunity, Task, generate_uuid, get_current_time
+from services import data_version, pipeline_summary
+from services.audit_writer import audit_writer
+from services.autocomplete import autocomplete_index
+from services.bulk_operations import BULK_ENTITIES, CHUNK_SIZE, STAGE_PROBABILITIES, returning_ids
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson', 'json')
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'json'}
+CONTENT_TYPES = {'text/csv': 'csv', 'application/x-ndjson': 'ndjson', 'application/json': 'json'}
+
+EMAIL_PATTERN = r'^[^@\s]+@[^@\s]+\.[^@\s]+$'
+TRUE_VALUES = {'true', 't', 'yes', 'y', '1'}
+FALSE_VALUES = {'false', 'f', 'no', 'n', '0'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def detect_format(requested, filename, content_type):
+    """csv, ndjson or json from an explicit format, the file extension or the content type"""
+    if requested:
+        return requested if requested in FORMATS else None
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension in EXTENSIONS:
+        return EXTENSIONS[extension]
+    return CONTENT_TYPES.get((content_type or '').split(';')[0].strip().lower())
+
+
+def spool(stream):
+    """Copy an upload stream to a temporary file in fixed-size pieces; returns its path"""
+    fd, path = tempfile.mkstemp(prefix='geminicrm-import-')
+    with os.fdopen(fd, 'wb') as f:
+        shutil.copyfileobj(stream, f, 1024 * 1024)
+    return path
+
+
+def discard(path):
+    """Delete a spooled upload whose job never started"""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def submit(app, job_id, path):
+    """Run an import job on the shared worker pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=app.config.get('IMPORT_WORKERS', 2), thread_name_prefix='import'
+            )
+    _executor.submit(_run_in_context, app, job_id, path)
+
+
+def _run_in_context(app, job_id, path):
+    with app.app_context():
+        run(job_id, path, app.config.get('IMPORT_CHUNK_SIZE', 5000), app.config.get('IMPORT_MAX_ERRORS', 1000))
+
+
+# ==================== READING ====================
+
+def read_chunks(path, file_format, chunk_size):
+    """DataFrames of up to chunk_size rows, every cell a string or None"""
+    if file_format == 'csv':
+        reader = pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                             skipinitialspace=True, encoding='utf-8-sig')
+    elif file_format == 'ndjson':
+        reader = pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False)
+    else:
+        # A JSON array has to be parsed whole; NDJSON is the streaming alternative
+        with open(path, encoding='utf-8-sig') as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = records.get('records') or records.get('data')
+        if not isinstance(records, list):
+            raise ValueError('JSON imports must be an array of objects')
+        reader = (pd.DataFrame.from_records(records[i:i + chunk_size])
+                  for i in range(0, len(records), chunk_size))
+
+    for frame in reader:
+        yield frame.astype(object).where(frame.notna(), None)
+
+
+# ==================== VALIDATION ====================
+
+def _fail(errors, mask, field, message):
+    for index in mask[mask].index:
+        errors.setdefault(index, {})[field] = message
+
+
+def _text(series):
+    """Stripped strings with blanks as missing"""
+    text = series.astype('string').str.strip()
+    return text.mask(text == '')
+
+
+def _coerce(column, text, errors):
+    """Column-typed Series for one text Series, recording invalid cells in errors"""
+    field = column.name
+    present = text.notna()
+    kind = column.type
+
+    if isinstance(kind, Boolean):
+        lowered = text.str.lower()
+        value = lowered.map(lambda v: True if v in TRUE_VALUES else (False if v in FALSE_VALUES else None),
+                            na_action='ignore')
+        _fail(errors, present & value.isna(), field, 'must be a boolean')
+        return value.astype(object)
+    if isinstance(kind, (Integer, Float)):
+        number = pd.to_numeric(text, errors='coerce')
+        invalid = present & (number.isna() | ~np.isfinite(number.fillna(0)))
+        if isinstance(kind, Integer):
+            invalid |= present & number.notna() & (number % 1 != 0)
+            _fail(errors, invalid, field, 'must be an integer')
+            return number.mask(invalid).astype('Int64')
+        _fail(errors, invalid, field, 'must be a number')
+        return number.mask(invalid)
+    if isinstance(kind, DateTime):
+        value = pd.to_datetime(text, errors='coerce', format='ISO8601')
+        _fail(errors, present & value.isna(), field, 'must be an ISO 8601 datetime')
+        return value
+    if isinstance(kind, Date):
+        value = pd.to_datetime(text, errors='coerce', format='%Y-%m-%d')
+        _fail(errors, present & value.isna(), field, 'must be a YYYY-MM-DD date')
+        return value.dt.date
+    if isinstance(kind, String) and kind.length:
+        _fail(errors, present & (text.str.len() > kind.length), field,
+              f'must be at most {kind.length} characters')
+    return text
+
+
+def _column_defaults(spec):
+    """field -> scalar Python-side default of the model's create fields"""
+    columns = spec.model.__table__.columns
+    return {
+        field: columns[field].default.arg for field in spec.create_fields
+        if columns[field].default is not None and columns[field].default.is_scalar
+    }
+
+
+def validate(spec, frame, owner_id):
+    """
+    Coerce one chunk to the model's columns.
+
+    Returns (typed DataFrame, {row index: {field: message}}). Unknown columns
+    are ignored; foreign keys are checked with one query per column.
+    """
+    frame = frame.rename(columns={alias: field for alias, field in spec.aliases.items()
+                                  if alias in frame.columns and field not in frame.columns})
+    columns = spec.model.__table__.columns
+    errors = {}
+    typed = pd.DataFrame(index=frame.index)
+    for field in spec.create_fields:
+        text = _text(frame[field]) if field in frame.columns else pd.Series(pd.NA, index=frame.index, dtype='string')
+        typed[field] = _coerce(columns[field], text, errors)
+
+    for field, value in spec.defaults.items():
+        typed[field] = typed[field].astype(object).where(typed[field].notna(), value)
+    if spec.model is Lead:
+        full = (typed['first_name'].fillna('') + ' ' + typed['last_name'].fillna('')).str.strip()
+        typed['name'] = typed['name'].fillna(full.mask(full == ''))
+    if spec.model is Opportunity:
+        implied = typed['stage'].map(lambda stage: STAGE_PROBABILITIES.get(stage, 10))
+        typed['probability'] = typed['probability'].astype(object).where(typed['probability'].notna(), implied)
+    if spec.model is Task:
+        typed['assigned_to_id'] = typed['assigned_to_id'].fillna(owner_id)
+    # Rows go in through a Core insert, which writes None as NULL instead of applying the
+    # column's default; fill what is still missing the way the ORM would
+    for field, value in _column_defaults(spec).items():
+        typed[field] = typed[field].astype(object).where(typed[field].notna(), value)
+
+    for field in spec.required:
+        _fail(errors, typed[field].isna(), field, 'is required')
+    if 'email' in typed.columns:
+        _fail(errors, typed['email'].notna() & ~typed['email'].str.match(EMAIL_PATTERN).fillna(False),
+              'email', 'must be an email address')
+
+    for field in spec.create_fields:
+        column = columns[field]
+        if column.name == 'owner_id' or not column.foreign_keys:
+            continue
+        wanted = typed[field].dropna().unique().tolist()
+        if not wanted:
+            continue
+        target = next(iter(column.foreign_keys)).column
+        found = set()
+        for start in range(0, len(wanted), CHUNK_SIZE):
+            found.update(db.session.execute(
+                select(target).where(target.in_(wanted[start:start + CHUNK_SIZE]))
+            ).scalars())
+        _fail(errors, typed[field].notna() & ~typed[field].isin(found), field,
+              f'unknown {target.table.name[:-1]} id')
+    return typed, errors
+
+
+def duplicate_emails(model, typed, owner_id):
+    """Mask of rows whose email (case-insensitive) the owner already has or an earlier row repeats"""
+    lowered = typed['email'].str.lower()
+    wanted = set(typed['email'].dropna()) | set(lowered.dropna())
+    existing = set()
+    wanted = list(wanted)
+    for start in range(0, len(wanted), CHUNK_SIZE):
+        # Plain IN on the indexed column, both spellings asked for so the index still applies.
+        # Owner is checked here rather than in SQL, where SQLite would pick the owner index
+        # and scan every one of the owner's rows instead.
+        existing.update(email.lower() for email, email_owner in db.session.execute(
+            select(model.email, model.owner_id).where(model.email.in_(wanted[start:start + CHUNK_SIZE]))
+        ) if email_owner == owner_id)
+    return lowered.notna() & (lowered.isin(existing) | lowered.duplicated())
+
+
+# ==================== RUNNING ====================
+
+def _records(typed):
+    """Row dicts with pandas missing values as None"""
+    # Column by column, then zipped: DataFrame.to_dict boxes every cell on its own
+    columns = list(typed.columns)
+    values = [typed[column].astype(object).where(typed[column].notna(), None).tolist() for column in columns]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def import_chunk(spec, frame, owner_id, offset, job, max_errors):
+    """Validate, dedupe and insert one chunk, updating job's counts; the caller commits"""
+    typed, errors = validate(spec, frame, owner_id)
+    rejected = typed.index.isin(list(errors))
+
+    skipped = pd.Series(False, index=typed.index)
+    if 'email' in typed.columns:
+        skipped = duplicate_emails(spec.model, typed[~rejected], owner_id).reindex(typed.index, fill_value=False)
+        for index in skipped[skipped].index:
+            errors[index] = {'email': 'already exists'}
+
+    rows = _records(typed[~rejected & ~skipped])
+    if rows:
+        now = get_current_time()
+        for row in rows:
+            row.update(id=generate_uuid(), owner_id=owner_id, created_at=now, updated_at=now)
+        # Every row has the same keys, so the table insert can skip the ORM's bulk bookkeeping
+        table = spec.model.__table__
+        db.session.execute(returning_ids(insert(table), table.c.id), rows)
+        if spec.model is Opportunity:
+            pipeline_summary.apply_changes((None, pipeline_summary.snapshot_row(r)) for r in rows)
+        autocomplete_index.stage(spec.audit_type, rows)
+        data_version.touch(owner_id)
+
+    job.processed += len(typed)
+    job.inserted += len(rows)
+    job.skipped += int(skipped.sum())
+    job.failed += int(rejected.sum())
+    room = max_errors - len(job.errors or [])
+    if errors and room > 0:
+        # Row numbers count records from 1, whatever the file format
+        job.errors = (job.errors or []) + [
+            {'row': offset + position + 1, 'errors': errors[index]}
+            for position, index in enumerate(typed.index) if index in errors
+        ][:room]
+
+
+def run(job_id, path, chunk_size=5000, max_errors=1000):
+    """Import the spooled file for job_id, committing after every chunk; deletes the file"""
+    job = db.session.get(ImportJob, job_id)
+    spec = BULK_ENTITIES[job.entity_type]
+    job.status = 'running'
+    job.started_at = get_current_time()
+    db.session.commit()
+
+    try:
+        offset = 0
+        for frame in read_chunks(path, job.file_format, chunk_size):
+            frame.index = range(len(frame))
+            import_chunk(spec, frame, job.owner_id, offset, job, max_errors)
+            db.session.commit()
+            offset += len(frame)
+        job.status = 'completed'
+    except Exception as e:
+        logger.exception('Import %s failed', job_id)
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = str(e)[:1000]
+    finally:
+        os.unlink(path)
+
+    job.finished_at = get_current_time()
+    audit_writer.record(
+        user_id=job.owner_id, action='import', entity_type=spec.audit_type, entity_id=job.id,
+        entity_name=f'Imported {job.inserted} of {job.processed} {job.entity_type} ({job.status})'
+    )
+    db.session.commit()
+    return job
@@ -0,0 +1,316 @@
+"""
+GeminiCRM Pro - Cross-Worker Invalidation Bus
+Broadcasts the owners and records each commit changed to the other worker
+processes, so their in-memory caches (type-ahead index, read cache) drop
+what went stale instead of waiting for it to age out. Travels over Redis
+pub/sub, or between the workers of one host over Unix datagram sockets
+"""
+import atexit
+import glob
+import hashlib
+import json
+import logging
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+
+from sqlalchemy import event
+
+from models.engine import RoutingSession
+
+logger = logging.getLogger(__name__)
+
+# ids is a tuple of record ids, or None for everything of that entity (or owner, when entity is None)
+Invalidation = namedtuple('Invalidation', 'owner_id entity ids')
+
+# Largest message sent as is; bigger ones drop their record ids (Unix datagrams are capped near 200KB)
+MAX_MESSAGE_BYTES = 60000
+# Invalidations per message
+MAX_ITEMS = 500
+
+
+# ==================== TRANSPORTS ====================
+
+class UnixSocketTransport:
+    """
+    One datagram socket per worker in a shared directory; a message is sent
+    to every other socket there. Sockets left behind by dead workers are
+    removed the first time a send to them is refused.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = None
+        self._receiver = None
+        self._sender = None
+
+    def open(self, name):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        self.path = os.path.join(self.directory, f'{name}.sock')
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 2**20)
+        self._receiver.bind(self.path)
+
+    def send(self, data):
+        """Send to every other worker; returns how many could not take it"""
+        if self._sender is None:
+            self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._sender.setblocking(False)
+        failed = 0
+        for path in glob.glob(os.path.join(self.directory, '*.sock')):
+            if path == self.path:
+                continue
+            try:
+                self._sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Nobody is bound there any more
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError:
+                # Full receive buffer (BlockingIOError) or similar: that worker misses this one
+                failed += 1
+        return failed
+
+    def receive(self):
+        while True:
+            yield self._receiver.recv(2**20)
+
+    def close(self):
+        for sock in (self._receiver, self._sender):
+            if sock is not None:
+                sock.close()
+        if self.path:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        self._receiver = self._sender = self.path = None
+
+
+class RedisTransport:
+    """
+    Redis pub/sub on one channel, reaching workers on every host. client is a
+    redis.Redis or anything with its publish/pubsub, such as fakeredis.FakeRedis.
+    """
+
+    def __init__(self, client, channel='geminicrm:invalidation'):
+        self.client = client
+        self.channel = channel
+        self._pubsub = None
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url, socket_connect_timeout=0.5, health_check_interval=30), **kwargs)
+
+    def open(self, name):
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+
+    def send(self, data):
+        self.client.publish(self.channel, data)
+        return 0
+
+    def receive(self):
+        for message in self._pubsub.listen():
+            if message['type'] == 'message':
+                yield message['data']
+
+    def close(self):
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+
+# ==================== BUS ====================
+
+class InvalidationBus:
+    """
+    Changes are staged on the session while it flushes (stage()), published
+    once it commits, and handed to every subscribe()d callback in the other
+    workers, on a listener thread inside an app context. Delivery is best
+    effort: caches using the bus must still be correct without it, the bus
+    only makes them fresh sooner.
+    """
+
+    def __init__(self):
+        self.app = None
+        self.transport = None
+        self.origin = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._thread_transport = None
+        self._listening = False
+        self.ready = threading.Event()   # set while the listener can receive
+        self.latencies = deque(maxlen=1000)   # seconds from commit to handled, most recent messages
+        self.counters = {'published': 0, 'send_failures': 0, 'received': 0, 'handler_errors': 0}
+
+    def init_app(self, app, transport=None):
+        """Pick the transport from INVALIDATION_BUS (unix, redis or none) unless one is given"""
+        self.app = app
+        if transport is None:
+            name = app.config.get('INVALIDATION_BUS', 'unix')
+            if name == 'unix' and hasattr(socket, 'AF_UNIX'):
+                transport = UnixSocketTransport(app.config.get('INVALIDATION_SOCKET_DIR') or _default_directory(app))
+            elif name == 'redis':
+                transport = RedisTransport.from_url(app.config.get('REDIS_URL', 'redis://localhost:6379/0'))
+            elif name not in ('unix', 'none'):
+                raise ValueError(f"INVALIDATION_BUS must be unix, redis or none, not {name!r}")
+        self.transport = transport
+        if not self._listening:
+            event.listen(RoutingSession, 'after_commit', self._after_commit)
+            event.listen(RoutingSession, 'after_transaction_end', self._after_transaction_end)
+            self._listening = True
+        app.before_request(self.start)
+        atexit.register(self.stop)
+
+    def subscribe(self, callback):
+        """Call callback(invalidations) for every message from another worker"""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    # ==================== PUBLISHING ====================
+
+    @staticmethod
+    def stage(session, owner_id, entity=None, ids=None):
+        """Broadcast that owner_id's entity records (all of them when ids is None) changed, on commit"""
+        if owner_id is None:
+            return
+        staged = session.info.setdefault('invalidation', {})
+        key = (owner_id, entity)
+        if ids is None or staged.get(key, ()) is None:
+            staged[key] = None
+        else:
+            staged.setdefault(key, set()).update(ids)
+
+    def _after_commit(self, session):
+        staged = session.info.pop('invalidation', None)
+        if staged and self.transport is not None:
+            self.publish([
+                Invalidation(owner_id, entity, None if ids is None else tuple(ids))
+                for (owner_id, entity), ids in staged.items()
+            ])
+
+    @staticmethod
+    def _after_transaction_end(session, transaction):
+        if transaction.parent is None:
+            session.info.pop('invalidation', None)
+
+    def publish(self, invalidations):
+        """Send invalidations to the other workers now"""
+        if self.transport is None:
+            return
+        self.start()
+        sent = time.time()
+        for start in range(0, len(invalidations), MAX_ITEMS):
+            items = [list(item) for item in invalidations[start:start + MAX_ITEMS]]
+            data = self._encode(sent, items)
+            if len(data) > MAX_MESSAGE_BYTES:
+                data = self._encode(sent, [[owner_id, entity, None] for owner_id, entity, _ in items])
+            try:
+                self.counters['send_failures'] += self.transport.send(data)
+                self.counters['published'] += 1
+            except Exception:
+                self.counters['send_failures'] += 1
+                logger.warning('Could not publish %d invalidations', len(items), exc_info=True)
+
+    def _encode(self, sent, items):
+        return json.dumps({'origin': self.origin, 'sent': sent, 'items': items}, separators=(',', ':')).encode()
+
+    # ==================== LISTENING ====================
+
+    def start(self):
+        """Start this process's listener; threads and sockets do not survive fork(), so once per worker"""
+        if self.transport is None or self._started():
+            return
+        with self._lock:
+            if self._started():
+                return
+            self._pid = os.getpid()
+            self.origin = f'{socket.gethostname()}-{self._pid}-{secrets.token_hex(3)}'
+            self.ready.clear()
+            # Set before the thread runs, or a start() in between would see no listener and start another
+            self._thread_transport = self.transport
+            self._thread = threading.Thread(target=self._run, args=(self.transport,), name='invalidation-bus',
+                                            daemon=True)
+            self._thread.start()
+
+    def _started(self):
+        return (self._pid == os.getpid() and self._thread.is_alive()
+                and self._thread_transport is self.transport)
+
+    def _run(self, transport):
+        failures = 0
+        # Ends once init_app() or stop() replaces the transport
+        while transport is self.transport:
+            try:
+                transport.open(self.origin)
+                self.ready.set()
+                failures = 0
+                for data in transport.receive():
+                    self._handle(data)
+            except Exception:
+                failures += 1
+                if transport is self.transport:
+                    logger.warning('Invalidation listener failed, reconnecting', exc_info=failures == 1)
+            self.ready.clear()
+            transport.close()
+            if transport is self.transport:
+                time.sleep(min(30, 2 ** failures))
+
+    def stop(self):
+        """Close this worker's socket (or subscription); publishing stops until init_app() runs again"""
+        transport, self.transport = self.transport, None
+        if transport is not None and self._pid == os.getpid():
+            transport.close()
+
+    def _handle(self, data):
+        message = json.loads(data)
+        if message['origin'] == self.origin:
+            return
+        self.counters['received'] += 1
+        invalidations = [
+            Invalidation(owner_id, entity, None if ids is None else tuple(ids))
+            for owner_id, entity, ids in message['items']
+        ]
+        with self.app.app_context():
+            for callback in self._subscribers:
+                try:
+                    callback(invalidations)
+                except Exception:
+                    self.counters['handler_errors'] += 1
+                    logger.exception('Invalidation handler %r failed', callback)
+        # Wall clocks, so across hosts this includes their skew
+        self.latencies.append(time.time() - message['sent'])
+
+    def stats(self):
+        """Message counts and commit-to-invalidated latency in this worker, for /api/cache/stats"""
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3) if latencies else None
+
+        return {
+            'transport': type(self.transport).__name__ if self.transport else None,
+            'origin': self.origin,
+            'latency_ms': {'p50': percentile(0.5), 'p99': percentile(0.99), 'max': percentile(1.0),
+                           'samples': len(latencies)},
+            **self.counters,
+        }
+
+
+def _default_directory(app):
+    # Workers serving the same database share a bus; other deployments on the host do not
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    return os.path.join(tempfile.gettempdir(), f"geminicrm-bus-{hashlib.sha1(uri.encode()).hexdigest()[:10]}")
+
+
+invalidation_bus = InvalidationBus()
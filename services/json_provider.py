@@ -0,0 +1,92 @@
+"""
+GeminiCRM Pro - JSON Provider
+app.json backed by orjson for jsonify, request.json and the exporters, with
+the stdlib encoder as fallback; both write dates and times as ISO 8601, the
+same as the models' to_dict()
+"""
+import dataclasses
+import decimal
+import importlib.util
+import uuid
+from datetime import date, time
+
+from flask.json.provider import DefaultJSONProvider
+
+
+def _default(o):
+    # Flask's own default writes datetimes as HTTP dates; the API has always sent ISO 8601
+    if isinstance(o, (date, time)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """Flask's json-module provider, writing dates as ISO 8601"""
+
+    default = staticmethod(_default)
+
+
+class OrjsonProvider(StdlibJSONProvider):
+    """
+    orjson encoder and decoder; anything orjson rejects (integers beyond 64
+    bits, keyword arguments it has no option for) goes to the stdlib instead.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        import orjson
+        self._orjson = orjson
+        self._base_option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+    def _option(self, sort_keys, indent):
+        option = self._base_option
+        if sort_keys:
+            option |= self._orjson.OPT_SORT_KEYS
+        if indent:
+            option |= self._orjson.OPT_INDENT_2
+        return option
+
+    def dumps(self, obj, **kwargs):
+        # orjson output is always compact: separators are accepted and ignored
+        if set(kwargs) <= {'sort_keys', 'indent', 'separators'}:
+            option = self._option(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+            try:
+                return self._orjson.dumps(obj, default=_default, option=option).decode()
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return self._orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Straight to bytes: no str round trip for the biggest payloads the app sends
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        option = self._option(self.sort_keys, indent) | self._orjson.OPT_APPEND_NEWLINE
+        try:
+            body = self._orjson.dumps(obj, default=_default, option=option)
+        except TypeError:
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+PROVIDERS = {'orjson': OrjsonProvider, 'stdlib': StdlibJSONProvider}
+
+
+def init_app(app):
+    """Install JSON_PROVIDER as app.json, falling back to the stdlib when orjson is missing"""
+    name = app.config.get('JSON_PROVIDER', 'orjson')
+    if name not in PROVIDERS:
+        raise ValueError(f"JSON_PROVIDER must be one of {', '.join(PROVIDERS)}, not {name!r}")
+    if name == 'orjson' and importlib.util.find_spec('orjson') is None:
+        name = 'stdlib'
+    app.json = PROVIDERS[name](app)
@@ -0,0 +1,75 @@
+"""
+GeminiCRM Pro - Keyset Pagination
+Cursor-based paging over (sort column, id) so a page costs the same however
+deep the client has scrolled, and rows inserted mid-scroll never shift pages
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, and_, or_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor that cannot be decoded"""
+
+
+def encode_cursor(value, row_id):
+    """Opaque cursor for the row a page ended on"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, sort_column):
+    """Inverse of encode_cursor(); returns (sort value, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if value is not None and isinstance(sort_column.type, DateTime):
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid pagination cursor')
+    if not isinstance(row_id, str):
+        raise InvalidCursor('Invalid pagination cursor')
+    return value, row_id
+
+
+def keyset_page(query, sort_column, id_column, cursor=None, limit=100, descending=True):
+    """
+    Fetch one page of `query` ordered by (sort_column, id_column).
+
+    Rows with a NULL sort value come after all others regardless of database,
+    so the scan runs in two phases: non-NULL values through the composite
+    index, then the NULL tail ordered by id. Returns (items, next_cursor);
+    next_cursor is None on the last page.
+    """
+    after = (lambda col, val: col < val) if descending else (lambda col, val: col > val)
+    direction = (lambda col: col.desc()) if descending else (lambda col: col.asc())
+
+    value, row_id = decode_cursor(cursor, sort_column) if cursor else (None, None)
+    in_null_tail = cursor is not None and value is None
+
+    items = []
+    if not in_null_tail:
+        q = query.filter(sort_column.isnot(None))
+        if cursor:
+            q = q.filter(or_(
+                after(sort_column, value),
+                and_(sort_column == value, after(id_column, row_id))
+            ))
+        items = q.order_by(direction(sort_column), direction(id_column)).limit(limit + 1).all()
+
+    if len(items) <= limit:
+        q = query.filter(sort_column.is_(None))
+        if in_null_tail:
+            q = q.filter(after(id_column, row_id))
+        items += q.order_by(direction(id_column)).limit(limit + 1 - len(items)).all()
+
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
@@ -0,0 +1,146 @@
+"""
+GeminiCRM Pro - Pipeline Summary Rollup
+Keeps per-owner, per-stage count/value totals in pipeline_summaries so
+pipeline reads cost O(stages) instead of O(opportunities).
+
+Write paths call apply_change() with before/after snapshots inside the same
+session as the opportunity change, so the rollup commits (or rolls back)
+together with it. rebuild() recomputes from the opportunities table to
+repair any drift.
+"""
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models.db_models import db, Opportunity, PipelineSummary, get_current_time
+
+UNKNOWN_STAGE = 'unknown'
+
+
+def _contribution(owner_id, stage, amount, probability):
+    amount = float(amount or 0)
+    return (owner_id, stage or UNKNOWN_STAGE, amount, amount * float(probability or 0) / 100)
+
+
+def snapshot(opportunity):
+    """(owner_id, stage, amount, weighted) contribution of one opportunity"""
+    return _contribution(opportunity.owner_id, opportunity.stage, opportunity.amount, opportunity.probability)
+
+
+def snapshot_row(row):
+    """snapshot() for a column mapping, as used by the bulk write paths"""
+    return _contribution(row.get('owner_id'), row.get('stage'), row.get('amount'), row.get('probability'))
+
+
+def _upsert(owner_id, stage, count, value, weighted):
+    """Add deltas to one (owner, stage) row, creating it if needed"""
+    table = PipelineSummary.__table__
+    row = {
+        'owner_id': owner_id, 'stage': stage, 'count': count,
+        'value': value, 'weighted_value': weighted, 'updated_at': get_current_time(),
+    }
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        insert = (sqlite if dialect == 'sqlite' else postgresql).insert
+        stmt = insert(table).values(**row)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['owner_id', 'stage'],
+            set_={
+                'count': table.c['count'] + stmt.excluded['count'],
+                'value': table.c.value + stmt.excluded.value,
+                'weighted_value': table.c.weighted_value + stmt.excluded.weighted_value,
+                'updated_at': stmt.excluded.updated_at,
+            }
+        )
+        db.session.execute(stmt)
+        return
+
+    updated = db.session.execute(
+        table.update()
+        .where(table.c.owner_id == owner_id, table.c.stage == stage)
+        .values(
+            count=table.c['count'] + count,
+            value=table.c.value + value,
+            weighted_value=table.c.weighted_value + weighted,
+            updated_at=row['updated_at'],
+        )
+    )
+    if updated.rowcount == 0:
+        db.session.execute(table.insert().values(**row))
+
+
+def apply_change(before=None, after=None):
+    """
+    Move an opportunity's contribution from `before` to `after`.
+
+    Pass snapshot() results; None for `before` on create and for `after`
+    on delete. Nothing is written when the contribution is unchanged.
+    """
+    apply_changes([(before, after)])
+
+
+def apply_changes(changes):
+    """
+    apply_change() for many (before, after) pairs at once.
+
+    Deltas are summed per (owner, stage) first, so a bulk write costs one
+    upsert per touched stage rather than one per opportunity.
+    """
+    deltas = {}
+    for before, after in changes:
+        if before == after:
+            continue
+        for sign, contribution in ((-1, before), (1, after)):
+            if contribution is None:
+                continue
+            owner_id, stage, amount, weighted = contribution
+            delta = deltas.setdefault((owner_id, stage), [0, 0.0, 0.0])
+            delta[0] += sign
+            delta[1] += sign * amount
+            delta[2] += sign * weighted
+
+    for (owner_id, stage), (count, value, weighted) in deltas.items():
+        if count or value or weighted:
+            _upsert(owner_id, stage, count, value, weighted)
+
+
+def rebuild(owner_id=None):
+    """Recompute the rollup from opportunities for one owner, or everyone"""
+    delete = PipelineSummary.__table__.delete()
+    if owner_id is not None:
+        delete = delete.where(PipelineSummary.owner_id == owner_id)
+    db.session.execute(delete)
+
+    amount = func.coalesce(Opportunity.amount, 0)
+    stage = func.coalesce(Opportunity.stage, UNKNOWN_STAGE)
+    query = db.session.query(
+        Opportunity.owner_id,
+        stage,
+        func.count(Opportunity.id),
+        func.sum(amount),
+        func.sum(amount * func.coalesce(Opportunity.probability, 0) / 100.0),
+    ).filter(Opportunity.owner_id.isnot(None))
+    if owner_id is not None:
+        query = query.filter(Opportunity.owner_id == owner_id)
+
+    now = get_current_time()
+    rows = [
+        {'owner_id': owner, 'stage': stage_name, 'count': count,
+         'value': value or 0, 'weighted_value': weighted or 0, 'updated_at': now}
+        for owner, stage_name, count, value, weighted in query.group_by(Opportunity.owner_id, stage)
+    ]
+    if rows:
+        db.session.execute(PipelineSummary.__table__.insert(), rows)
+    return len(rows)
+
+
+def by_stage(owner_id):
+    """{stage: {'count', 'value', 'weighted'}} for stages that currently hold opportunities"""
+    rows = PipelineSummary.query.filter(
+        PipelineSummary.owner_id == owner_id,
+        PipelineSummary.count > 0
+    ).all()
+    return {
+        row.stage: {'count': row.count, 'value': row.value, 'weighted': row.weighted_value}
+        for row in rows
+    }
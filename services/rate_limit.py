@@ -0,0 +1,365 @@
+"""
+GeminiCRM Pro - Sliding Window Rate Limiting
+Limits such as 60/minute;1000/hour enforced with sliding window counters:
+per key and window, the count of the current fixed window plus the previous
+one weighted by how much of it still overlaps the sliding window. Constant
+time and memory per key, held in process or in Redis (atomic, via Lua) so
+every worker shares the same counts. Applied to /api routes in before_request
+"""
+import logging
+import re
+import threading
+import time
+from collections import namedtuple
+from functools import wraps
+from urllib.parse import urlsplit
+
+from flask import current_app, g, jsonify, request
+from flask_login import current_user
+
+logger = logging.getLogger(__name__)
+
+UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Outcome of a hit, for the window closest to its limit (the one that refused it, if any)
+Decision = namedtuple('Decision', 'allowed limit window remaining reset retry_after')
+
+
+def parse_limits(spec):
+    """'60/minute;1000/hour' or '10/5 seconds' -> ((60, 60), (1000, 3600)) as (limit, window seconds)"""
+    limits = []
+    for part in filter(None, (part.strip() for part in re.split(r'[;,]', spec))):
+        match = re.fullmatch(r'(\d+)\s*(?:/|per)\s*(\d*)\s*(second|minute|hour|day)s?', part)
+        if not match:
+            raise ValueError(f"Rate limit must look like 60/minute, not {part!r}")
+        count, multiple, unit = match.groups()
+        limits.append((int(count), int(multiple or 1) * UNITS[match.group(3)]))
+    return tuple(sorted(limits, key=lambda limit: limit[1]))
+
+
+def window_name(seconds):
+    for name, unit in UNITS.items():
+        if seconds == unit:
+            return name
+    return f'{seconds} seconds'
+
+
+# ==================== BACKENDS ====================
+
+class LocalBackend:
+    """
+    Counters in this process, so each worker allows the full limit. Keys idle
+    for longer than their longest window are swept every SWEEP_EVERY hits;
+    past max_keys the oldest keys are forgotten (and so allowed again).
+    """
+
+    SWEEP_EVERY = 10000
+
+    def __init__(self, max_keys=100000, clock=time.time):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._state = {}   # key -> [bucket, previous, current] per window
+        self._hits = 0
+        self._lock = threading.Lock()
+
+    def hit(self, key, limits, cost=1, peek=False):
+        """
+        Count cost against every window when all of them allow it (nothing is
+        counted when peek is set); returns allowed and, per window, (previous,
+        current, elapsed) as they were before this hit
+        """
+        now = self._clock()
+        with self._lock:
+            state = self._state.get(key)
+            stored = state is not None and len(state) == 3 * len(limits)
+            if not stored:
+                state = [None, 0, 0] * len(limits)
+            allowed = True
+            windows = []
+            i = 0
+            for limit, window in limits:
+                bucket = now // window
+                if state[i] != bucket:
+                    # Rolled into a new window: the last one's count (if adjacent) becomes previous
+                    state[i + 1] = state[i + 2] if state[i] == bucket - 1 else 0
+                    state[i], state[i + 2] = bucket, 0
+                previous, current = state[i + 1], state[i + 2]
+                elapsed = now - bucket * window
+                if previous * (1 - elapsed / window) + current + cost > limit:
+                    allowed = False
+                windows.append((previous, current, elapsed))
+                i += 3
+            if not allowed or peek:
+                return allowed, windows
+            for i in range(2, len(state), 3):
+                state[i] += cost
+            if not stored:
+                self._state[key] = state
+                if len(self._state) > self.max_keys:
+                    self._sweep(now, limits[-1][1])
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                self._sweep(now, limits[-1][1])
+            return True, windows
+
+    def _sweep(self, now, longest):
+        # Counts from two or more windows ago no longer weigh anything
+        for key in [key for key, state in self._state.items() if state[-3] < now // longest - 1]:
+            del self._state[key]
+        while len(self._state) > self.max_keys:
+            del self._state[next(iter(self._state))]
+
+    def clear(self):
+        with self._lock:
+            self._state.clear()
+
+    def __len__(self):
+        return len(self._state)
+
+
+# Same algorithm as LocalBackend.hit, on a hash per key, timed by the Redis server's clock.
+# ARGV: cost, peek (1/0), then limit and window seconds per window. Returns allowed, then
+# previous, current (before this hit) and elapsed milliseconds per window.
+_HIT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local n = (#ARGV - 2) / 2
+local fields = {}
+for i = 1, n do
+    fields[#fields + 1] = 'b' .. i
+    fields[#fields + 1] = 'p' .. i
+    fields[#fields + 1] = 'c' .. i
+end
+local stored = redis.call('HMGET', KEYS[1], unpack(fields))
+local allowed = 1
+local windows = {}
+for i = 1, n do
+    local limit, window = tonumber(ARGV[2 * i + 1]), tonumber(ARGV[2 * i + 2])
+    local bucket = math.floor(now / window)
+    local b = tonumber(stored[3 * i - 2])
+    local previous, current = tonumber(stored[3 * i - 1]) or 0, tonumber(stored[3 * i]) or 0
+    if b ~= bucket then
+        if b == bucket - 1 then previous = current else previous = 0 end
+        current = 0
+    end
+    local elapsed = now - bucket * window
+    if previous * (1 - elapsed / window) + current + cost > limit then allowed = 0 end
+    windows[i] = {bucket, previous, current, elapsed}
+end
+local record = allowed == 1 and ARGV[2] == '0'
+local result = {allowed}
+local updates = {}
+for i = 1, n do
+    local w = windows[i]
+    updates[#updates + 1] = 'b' .. i
+    updates[#updates + 1] = w[1]
+    updates[#updates + 1] = 'p' .. i
+    updates[#updates + 1] = w[2]
+    updates[#updates + 1] = 'c' .. i
+    updates[#updates + 1] = w[3] + cost
+    result[#result + 1] = w[2]
+    result[#result + 1] = w[3]
+    result[#result + 1] = math.floor(w[4] * 1000)
+end
+if record then
+    redis.call('HSET', KEYS[1], unpack(updates))
+    redis.call('PEXPIRE', KEYS[1], 2000 * tonumber(ARGV[#ARGV]))
+end
+return result
+"""
+
+
+class RedisBackend:
+    """
+    Counters shared by every worker, one hash per key expiring two of its
+    longest windows after the last counted hit. client is a redis.Redis or
+    compatible (fakeredis with Lua). A Redis that is down allows everything.
+    """
+
+    def __init__(self, client, prefix='geminicrm:ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+        self._hit = client.register_script(_HIT)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5), **kwargs)
+
+    def hit(self, key, limits, cost=1, peek=False):
+        args = [cost, int(peek)]
+        for limit, window in limits:
+            args += (limit, window)
+        try:
+            result = self._hit(keys=[self.prefix + key], args=args)
+        except Exception:
+            logger.warning('Rate limit check failed, allowing the request', exc_info=True)
+            return True, [(0, 0, 0.0)] * len(limits)
+        return bool(result[0]), [
+            (int(result[i]), int(result[i + 1]), int(result[i + 2]) / 1000) for i in range(1, len(result), 3)
+        ]
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+
+# ==================== LIMITER ====================
+
+def decide(limits, allowed, windows, cost=1, peek=False):
+    """Decision for a backend's hit() result"""
+    if allowed:
+        # The common case, kept cheap: only the window with the least room left matters
+        least = None
+        for (limit, window), (previous, current, elapsed) in zip(limits, windows):
+            remaining = limit - current - previous * (1 - elapsed / window)
+            if least is None or remaining < least:
+                least, tightest = remaining, (limit, window, elapsed)
+        limit, window, elapsed = tightest
+        return Decision(True, limit, window, max(0, int(least - (0 if peek else cost))), window - elapsed, 0)
+
+    refused = []
+    for (limit, window), (previous, current, elapsed) in zip(limits, windows):
+        if previous * (1 - elapsed / window) + current + cost <= limit:
+            continue
+        if current + cost > limit:
+            # Not before the next window, and then until this one's share has decayed enough
+            retry_after = window - elapsed + (window * (1 - (limit - cost) / current) if limit >= cost else window)
+        else:
+            retry_after = window * (1 - (limit - current - cost) / previous) - elapsed
+        refused.append(Decision(False, limit, window, 0, window - elapsed, max(0, retry_after)))
+    # The refusing window that frees up last
+    return max(refused, key=lambda decision: decision.retry_after)
+
+
+class SlidingWindowLimiter:
+    """
+    Rate limits for the API: RATE_LIMITS per user (per client address before
+    login) on every request under RATE_LIMIT_PATH_PREFIX, plus any limit()
+    decorating a view. Signed-in requests from the app's own pages count
+    against UI_RATE_LIMITS instead, when set: one page load fires several
+    fetches and walks list cursors. Refused requests get 429 with
+    Retry-After; every limited response carries X-RateLimit-Limit/-Remaining/-Reset.
+    """
+
+    def __init__(self, limits='60/minute;1000/hour;10000/day', backend=None, ui_limits=None):
+        self.limits = parse_limits(limits)
+        self.ui_limits = parse_limits(ui_limits) if ui_limits else None
+        self.backend = backend if backend is not None else LocalBackend()
+        self.prefix = '/api/'
+        self.counters = {'allowed': 0, 'limited': 0}
+
+    def init_app(self, app, backend=None):
+        """Pick the backend from RATE_LIMIT_BACKEND (local, redis or none) unless one is given"""
+        self.limits = parse_limits(app.config.get('RATE_LIMITS', '60/minute;1000/hour;10000/day'))
+        ui_limits = app.config.get('UI_RATE_LIMITS')
+        self.ui_limits = parse_limits(ui_limits) if ui_limits else None
+        self.prefix = app.config.get('RATE_LIMIT_PATH_PREFIX', '/api/')
+        if backend is None:
+            name = app.config.get('RATE_LIMIT_BACKEND', 'local')
+            if name == 'local':
+                backend = LocalBackend()
+            elif name == 'redis':
+                backend = RedisBackend.from_url(app.config.get('REDIS_URL', 'redis://localhost:6379/0'))
+            elif name != 'none':
+                raise ValueError(f"RATE_LIMIT_BACKEND must be local, redis or none, not {name!r}")
+        self.backend = backend
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    def hit(self, key, limits=None, cost=1, peek=False):
+        """Count a request by key against limits (RATE_LIMITS by default) and return the Decision"""
+        limits = limits or self.limits
+        allowed, windows = self.backend.hit(key, limits, cost, peek)
+        if not peek:
+            self.counters['allowed' if allowed else 'limited'] += 1
+        return decide(limits, allowed, windows, cost, peek)
+
+    # ==================== FLASK ====================
+
+    @staticmethod
+    def identity():
+        """Who a request counts against: the signed-in user, else the client address"""
+        if current_user.is_authenticated:
+            return f'user:{current_user.id}'
+        return f'ip:{request.remote_addr}'
+
+    @staticmethod
+    def from_ui():
+        """Whether a signed-in user's browser sent the request from one of the app's pages"""
+        if not current_user.is_authenticated:
+            return False
+        site = request.headers.get('Sec-Fetch-Site')
+        if site is not None:
+            return site == 'same-origin'
+        # Browsers without Fetch Metadata: the page that made the request
+        source = request.headers.get('Origin') or request.referrer
+        return bool(source) and urlsplit(source).netloc == request.host
+
+    def _limited(self, decision):
+        response = jsonify({
+            'success': False,
+            'error': f'Rate limit exceeded (per {window_name(decision.window)})',
+            'retry_after': round(decision.retry_after, 1)
+        })
+        response.status_code = 429
+        response.headers['Retry-After'] = str(int(decision.retry_after + 1))
+        return response
+
+    def _record(self, decision):
+        # The headers report the limit closest to refusing this client
+        previous = g.get('rate_limit')
+        if previous is None or (decision.remaining, -decision.retry_after) < (previous.remaining, -previous.retry_after):
+            g.rate_limit = decision
+
+    def _before_request(self):
+        if self.backend is None or not request.path.startswith(self.prefix):
+            return None
+        if getattr(current_app.view_functions.get(request.endpoint), '_rate_limit_exempt', False):
+            return None
+        if self.ui_limits is not None and self.from_ui():
+            decision = self.hit(f'ui:{self.identity()}', self.ui_limits)
+        else:
+            decision = self.hit(self.identity())
+        self._record(decision)
+        if not decision.allowed:
+            return self._limited(decision)
+        return None
+
+    @staticmethod
+    def _after_request(response):
+        decision = g.get('rate_limit')
+        if decision is not None:
+            response.headers['X-RateLimit-Limit'] = str(decision.limit)
+            response.headers['X-RateLimit-Remaining'] = str(decision.remaining if decision.allowed else 0)
+            response.headers['X-RateLimit-Reset'] = str(int(decision.reset + 0.999))
+        return response
+
+    def limit(self, spec, scope=None):
+        """Extra limit for one view (e.g. '10/minute'), counted per identity apart from RATE_LIMITS"""
+        limits = parse_limits(spec)
+
+        def decorator(view):
+            name = scope or view.__name__
+
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is not None:
+                    decision = self.hit(f'{name}:{self.identity()}', limits)
+                    self._record(decision)
+                    if not decision.allowed:
+                        return self._limited(decision)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def exempt(view):
+        """Leave a view out of RATE_LIMITS (its limit() decorators still apply)"""
+        view._rate_limit_exempt = True
+        return view
+
+
+rate_limiter = SlidingWindowLimiter()
@@ -0,0 +1,193 @@
+"""
+GeminiCRM Pro - Per-User Read Cache
+Rendered responses of read endpoints keyed by (owner, endpoint, arguments),
+held in process (TTL + LRU) or in Redis. Keys include the owner's data
+version (services/data_version.py), which every committed write bumps, so a
+write invalidates exactly that owner's entries and the stale ones age out
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+from flask_login import current_user
+
+from services import data_version
+from services.invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== BACKENDS ====================
+
+class MemoryBackend:
+    """Per-process dict with a TTL per entry, evicting least recently used entries past max_bytes"""
+
+    def __init__(self, max_bytes=64 * 2**20, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._clock = clock
+        self._entries = OrderedDict()   # key -> (expires, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                self._discard(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (self._clock() + ttl, value)
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def discard_prefix(self, prefix):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Entries shared by every worker, expiring after their TTL. LRU eviction is
+    Redis's own: run it with maxmemory and maxmemory-policy allkeys-lru (or
+    volatile-lru when the instance holds other data).
+
+    client is a redis.Redis or anything with its get/set/scan_iter/delete,
+    such as fakeredis.FakeRedis in tests. A Redis that is down is a miss.
+    """
+
+    def __init__(self, client, prefix='geminicrm:cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5), **kwargs)
+
+    def get(self, key):
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception:
+            logger.warning('Read cache lookup failed', exc_info=True)
+            return None
+
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+        except Exception:
+            logger.warning('Read cache store failed', exc_info=True)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+
+# ==================== CACHE ====================
+
+def _pack(response):
+    return b'%d\n%s\n' % (response.status_code, response.mimetype.encode()) + response.get_data()
+
+
+def _unpack(value):
+    status, mimetype, body = value.split(b'\n', 2)
+    return current_app.response_class(body, status=int(status), mimetype=mimetype.decode())
+
+
+class ReadCache:
+    """
+    Response cache for GET views of the user's own data.
+
+    Lookups cost one primary-key read of the owner's data version. Views must
+    depend only on the owner's data, the URL and the `extra` inputs given to
+    cached(); anything time-dependent goes in `extra` (see data_version.utc_date).
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 300
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0}
+
+    def init_app(self, app, backend=None):
+        """Pick the backend from READ_CACHE_BACKEND (memory, redis or none) unless one is given"""
+        self.ttl = app.config.get('READ_CACHE_TTL', 300)
+        if backend is None:
+            name = app.config.get('READ_CACHE_BACKEND', 'memory')
+            if name == 'memory':
+                backend = MemoryBackend(app.config.get('READ_CACHE_MAX_MB', 64) * 2**20)
+            elif name == 'redis':
+                backend = RedisBackend.from_url(app.config.get('REDIS_URL', 'redis://localhost:6379/0'))
+            elif name != 'none':
+                raise ValueError(f"READ_CACHE_BACKEND must be memory, redis or none, not {name!r}")
+        self.backend = backend
+        invalidation_bus.subscribe(self._invalidated)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def _invalidated(self, invalidations):
+        # Another worker's write already made these keys unreachable; free the memory now
+        if hasattr(self.backend, 'discard_prefix'):
+            for owner_id in {invalidation.owner_id for invalidation in invalidations}:
+                self.backend.discard_prefix(f'{owner_id}:')
+
+    def key(self, owner_id, *extra):
+        """Cache key for the current request as seen by owner_id at their current data version"""
+        args = sorted(request.args.items(multi=True))
+        parts = (request.endpoint, sorted((request.view_args or {}).items()), args, *extra)
+        digest = hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+        return f'{owner_id}:{data_version.current(owner_id)}:{digest}'
+
+    def cached(self, *extra):
+        """Serve the view from the cache; extra callables add inputs such as data_version.utc_date"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+                key = self.key(current_user.id, *(part() for part in extra))
+                value = self.backend.get(key)
+                if value is not None:
+                    self.counters['hits'] += 1
+                    return _unpack(value)
+
+                self.counters['misses'] += 1
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.backend.set(key, _pack(response), self.ttl)
+                    self.counters['stores'] += 1
+                return response
+            return wrapper
+        return decorator
+
+
+read_cache = ReadCache()
@@ -0,0 +1,56 @@
+"""
+GeminiCRM Pro - SQL-Side Reporting
+Dashboard and report numbers computed with aggregate queries (and the
+pipeline rollup), so only totals leave the database no matter how many rows
+an owner has
+"""
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import case, func, or_
+
+from models.db_models import db, Contact, Lead, Task
+from services import pipeline_summary
+
+CLOSED_STAGES = ('closed_won', 'closed_lost')
+
+
+def task_buckets(owner_id, today=None):
+    """Overdue, due-today and open task counts in a single pass"""
+    today = today or datetime.utcnow().date()
+    start = datetime.combine(today, time.min)
+    end = start + timedelta(days=1)
+    is_open = or_(Task.status.is_(None), Task.status != 'completed')
+
+    overdue, due_today, open_count = db.session.query(
+        func.sum(case((Task.due_date < start, case((is_open, 1), else_=0)), else_=0)),
+        func.sum(case(((Task.due_date >= start) & (Task.due_date < end), 1), else_=0)),
+        func.sum(case((is_open, 1), else_=0)),
+    ).filter(Task.owner_id == owner_id).one()
+
+    return {
+        'overdue_tasks': overdue or 0,
+        'today_tasks': due_today or 0,
+        'open_tasks': open_count or 0,
+    }
+
+
+def dashboard_stats(owner_id, today=None):
+    """Numbers behind /api/dashboard/stats"""
+    lead_count, avg_score = db.session.query(
+        func.count(Lead.id), func.avg(func.coalesce(Lead.score, 0))
+    ).filter(Lead.owner_id == owner_id).one()
+    contact_count = db.session.query(func.count(Contact.id)).filter(Contact.owner_id == owner_id).scalar()
+
+    stages = pipeline_summary.by_stage(owner_id)
+    stats = {
+        'total_leads': lead_count,
+        'total_contacts': contact_count,
+        'total_opportunities': sum(s['count'] for s in stages.values()),
+        'total_pipeline': sum(s['value'] for stage, s in stages.items() if stage not in CLOSED_STAGES),
+        'weighted_pipeline': sum(s['weighted'] for s in stages.values()),
+        'won_deals': stages.get('closed_won', {}).get('value', 0),
+        'avg_lead_score': round(avg_score or 0, 1),
+        'deals_by_stage': {stage: {'count': s['count'], 'value': s['value']} for stage, s in stages.items()},
+    }
+    stats.update(task_buckets(owner_id, today))
+    return stats
@@ -0,0 +1,279 @@
+"""
+GeminiCRM Pro - Full-Text Search
+Ranked search over leads, contacts, opportunities and accounts: an FTS5
+index maintained by triggers on SQLite, generated tsvector columns with GIN
+indexes on PostgreSQL, and the old ILIKE scan anywhere else
+"""
+import re
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models.db_models import db, Account, Contact, Lead, Opportunity
+
+# entity type -> (table, rowid code, title SQL, body SQL, subtitle SQL); SQL uses a {row} prefix
+SOURCES = {
+    'lead': ('leads', 0, "{row}name",
+             "COALESCE({row}email, '') || ' ' || COALESCE({row}company, '')", "{row}company"),
+    'contact': ('contacts', 1, "COALESCE({row}first_name, '') || ' ' || COALESCE({row}last_name, '')",
+                "COALESCE({row}email, '')", "{row}email"),
+    'opportunity': ('opportunities', 2, "{row}name", "''", "{row}amount"),
+    'account': ('accounts', 3, "{row}name", "''", "{row}industry"),
+}
+# Source columns whose change requires re-indexing the row
+WATCHED = {
+    'lead': ('name', 'email', 'company', 'owner_id'),
+    'contact': ('first_name', 'last_name', 'email', 'owner_id'),
+    'opportunity': ('name', 'amount', 'owner_id'),
+    'account': ('name', 'industry', 'owner_id'),
+}
+# FTS rowid = source rowid * ROWID_STRIDE + code, so one index holds all four tables
+ROWID_STRIDE = 4
+# Queries matching more rows than this come back unranked (see _search_fts5)
+RANK_CAP = 2000
+
+_backends = {}
+
+
+def _owner_key(sql):
+    # Owner ids contain '-', which the tokenizer would split; index them as one token
+    return f"REPLACE({sql}, '-', '')"
+
+
+def _terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def _is_prefix(terms, position):
+    # Only the word still being typed is a prefix; earlier words must match whole
+    return position == len(terms) - 1
+
+
+# ==================== INDEX MAINTENANCE ====================
+
+def _sqlite_statements():
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "title, body, owner_key, entity_type UNINDEXED, entity_id UNINDEXED, subtitle UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ]
+    for entity, (table, code, title, body, subtitle) in SOURCES.items():
+        def values(row):
+            return (
+                f"{row}rowid * {ROWID_STRIDE} + {code}, {title.format(row=row)}, {body.format(row=row)}, "
+                f"{_owner_key(row + 'owner_id')}, '{entity}', {row}id, {subtitle.format(row=row)}"
+            )
+        insert = f"INSERT INTO search_index (rowid, title, body, owner_key, entity_type, entity_id, subtitle) VALUES ({values('new.')});"
+        delete = f"DELETE FROM search_index WHERE rowid = old.rowid * {ROWID_STRIDE} + {code};"
+        watched = ', '.join(WATCHED[entity])
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_ai AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_au AFTER UPDATE OF {watched} ON {table} BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS search_{table}_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def _sqlite_backfill():
+    statements = ["DELETE FROM search_index"]
+    for entity, (table, code, title, body, subtitle) in SOURCES.items():
+        statements.append(
+            f"INSERT INTO search_index (rowid, title, body, owner_key, entity_type, entity_id, subtitle) "
+            f"SELECT rowid * {ROWID_STRIDE} + {code}, {title.format(row='')}, {body.format(row='')}, "
+            f"{_owner_key('owner_id')}, '{entity}', id, {subtitle.format(row='')} FROM {table}"
+        )
+    return statements
+
+
+def _postgres_columns():
+    statements = []
+    for entity, (table, code, title, body, subtitle) in SOURCES.items():
+        vector = (
+            f"setweight(to_tsvector('simple', {title.format(row='')}), 'A') || "
+            f"setweight(to_tsvector('simple', {body.format(row='')}), 'B')"
+        )
+        statements.append(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({vector}) STORED"
+        )
+    return statements
+
+
+def _postgres_indexes(concurrently=False):
+    # CONCURRENTLY keeps writes flowing during the build but cannot run inside a transaction
+    option = 'CONCURRENTLY ' if concurrently else ''
+    return [
+        f"CREATE INDEX {option}IF NOT EXISTS ix_{table}_search_vector ON {table} USING GIN (search_vector)"
+        for table, *_ in SOURCES.values()
+    ]
+
+
+def install(connection):
+    """Create the search index (and backfill it) if this database lacks one; returns the backend"""
+    _backends[connection.engine.url] = _install(connection)
+    return _backends[connection.engine.url]
+
+
+def _install(connection):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        exists = connection.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+        )).first()
+        try:
+            for statement in _sqlite_statements():
+                connection.execute(text(statement))
+        except OperationalError:
+            # SQLite built without FTS5: keep using the ILIKE scan
+            return None
+        if not exists:
+            for statement in _sqlite_backfill():
+                connection.execute(text(statement))
+        return 'fts5'
+    if dialect == 'postgresql':
+        for statement in _postgres_columns() + _postgres_indexes():
+            connection.execute(text(statement))
+        return 'tsvector'
+    return None
+
+
+def uninstall(connection):
+    """Drop everything install() created"""
+    if connection.dialect.name == 'sqlite':
+        for table, *_ in SOURCES.values():
+            for suffix in ('ai', 'au', 'ad'):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS search_{table}_{suffix}"))
+        connection.execute(text("DROP TABLE IF EXISTS search_index"))
+    elif connection.dialect.name == 'postgresql':
+        for table, *_ in SOURCES.values():
+            connection.execute(text(f"DROP INDEX IF EXISTS ix_{table}_search_vector"))
+            connection.execute(text(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector"))
+
+
+def rebuild():
+    """Re-index every row; needed on SQLite after VACUUM, which can renumber rowids"""
+    if db.engine.dialect.name == 'sqlite' and backend() == 'fts5':
+        for statement in _sqlite_backfill():
+            db.session.execute(text(statement))
+
+
+def init_app(app):
+    """Detect the primary database's index; creating it is left to migration 0003_search_index"""
+    with app.app_context():
+        backend()
+
+
+def backend():
+    """'fts5', 'tsvector' or None (ILIKE) for the current primary engine"""
+    url = db.engine.url
+    if url not in _backends:
+        with db.engine.connect() as connection:
+            dialect = connection.dialect.name
+            if dialect == 'sqlite':
+                found = connection.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'"
+                )).first()
+            elif dialect == 'postgresql':
+                found = connection.execute(text(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'leads' AND column_name = 'search_vector'"
+                )).first()
+            else:
+                found = None
+        _backends[url] = {'sqlite': 'fts5', 'postgresql': 'tsvector'}[dialect] if found else None
+    return _backends[url]
+
+
+# ==================== QUERIES ====================
+
+def _result(entity, entity_id, name, subtitle):
+    if entity == 'opportunity':
+        subtitle = f'${float(subtitle or 0):,.0f}'
+    return {'type': entity, 'id': entity_id, 'name': name, 'subtitle': subtitle}
+
+
+def _search_fts5(owner_id, terms, limit):
+    owner_key = owner_id.replace('-', '')
+    match = (
+        'owner_key : "' + owner_key.replace('"', '""') + '" AND '
+        '{title body} : ('
+        + ' '.join(f'"{term}"' + ('*' if _is_prefix(terms, i) else '') for i, term in enumerate(terms))
+        + ')'
+    )
+    params = {'match': match, 'owner_key': owner_key, 'limit': limit, 'cap': RANK_CAP + 1}
+
+    # bm25 has to score every match before LIMIT applies, so a one- or
+    # two-letter prefix matching most of an owner's rows would cost far more
+    # than the keystroke is worth. Probe first; past RANK_CAP matches, take
+    # the first hits in index order instead.
+    matches = db.session.execute(text(
+        "SELECT COUNT(*) FROM (SELECT 1 FROM search_index WHERE search_index MATCH :match LIMIT :cap)"
+    ), params).scalar()
+    order = "ORDER BY bm25(search_index, 10.0, 2.0, 0.0) " if matches <= RANK_CAP else ""
+    rows = db.session.execute(text(
+        "SELECT entity_type, entity_id, title, subtitle FROM search_index "
+        "WHERE search_index MATCH :match AND owner_key = :owner_key " + order + "LIMIT :limit"
+    ), params)
+    return [_result(*row) for row in rows]
+
+
+def _search_tsvector(owner_id, terms, limit):
+    selects = []
+    for entity, (table, code, title, body, subtitle) in SOURCES.items():
+        selects.append(
+            f"SELECT '{entity}' AS entity_type, id, {title.format(row='')} AS title, "
+            f"CAST({subtitle.format(row='')} AS TEXT) AS subtitle, ts_rank(search_vector, q) AS rank "
+            f"FROM {table}, to_tsquery('simple', :query) AS q "
+            f"WHERE owner_id = :owner_id AND search_vector @@ q"
+        )
+    rows = db.session.execute(text(
+        ' UNION ALL '.join(selects) + " ORDER BY rank DESC LIMIT :limit"
+    ), {
+        'query': ' & '.join(term + (':*' if _is_prefix(terms, i) else '') for i, term in enumerate(terms)),
+        'owner_id': owner_id,
+        'limit': limit,
+    })
+    return [_result(*row[:4]) for row in rows]
+
+
+def _search_ilike(owner_id, query, limit):
+    """The original substring scan, for databases without a full-text index"""
+    pattern = f'%{query}%'
+    per_type = max(1, limit // 4)
+    results = []
+
+    leads = Lead.query.filter(
+        Lead.owner_id == owner_id,
+        (Lead.name.ilike(pattern) | Lead.email.ilike(pattern) | Lead.company.ilike(pattern))
+    ).limit(per_type).all()
+    results.extend(_result('lead', l.id, l.name, l.company) for l in leads)
+
+    contacts = Contact.query.filter(
+        Contact.owner_id == owner_id,
+        (Contact.first_name.ilike(pattern) | Contact.last_name.ilike(pattern) | Contact.email.ilike(pattern))
+    ).limit(per_type).all()
+    results.extend(_result('contact', c.id, c.full_name, c.email) for c in contacts)
+
+    opportunities = Opportunity.query.filter(
+        Opportunity.owner_id == owner_id, Opportunity.name.ilike(pattern)
+    ).limit(per_type).all()
+    results.extend(_result('opportunity', o.id, o.name, o.amount) for o in opportunities)
+
+    accounts = Account.query.filter(
+        Account.owner_id == owner_id, Account.name.ilike(pattern)
+    ).limit(per_type).all()
+    results.extend(_result('account', a.id, a.name, a.industry) for a in accounts)
+    return results
+
+
+def search(owner_id, query, limit=20):
+    """Best matches for query across all four entity types, most relevant first"""
+    terms = _terms(query)
+    if not terms:
+        return []
+    kind = backend()
+    if kind == 'fts5':
+        return _search_fts5(owner_id, terms, limit)
+    if kind == 'tsvector':
+        return _search_tsvector(owner_id, terms, limit)
+    return _search_ilike(owner_id, query, limit)
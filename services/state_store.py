@@ -0,0 +1,476 @@
+"""
+GeminiCRM Pro - Shared State Store
+Records, capped logs and expiring counters for the in-memory service managers
+(api_monitoring, email_service, models/user_profile), held in process memory,
+in a SQLite file shared by the workers of one host, or in Redis shared by all
+of them. Collections are bounded, and log appends are written in batches
+"""
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), default=str)
+
+
+# ==================== MEMORY ====================
+
+class MemoryBackend:
+    """
+    Per-process state. Values are stored serialized, so callers get copies and
+    must put() what they change, exactly as with the shared backends.
+    """
+
+    # Counter writes between sweeps of expired counters
+    SWEEP_EVERY = 1000
+
+    def __init__(self):
+        self._records = {}    # namespace -> OrderedDict(key -> json), oldest first
+        self._logs = {}       # name -> deque(json)
+        self._counters = {}   # (namespace, key) -> [value, expires or None]
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, namespace, key):
+        value = self._records.get(namespace, {}).get(key)
+        return None if value is None else json.loads(value)
+
+    def get_many(self, namespace, keys):
+        records = self._records.get(namespace, {})
+        return [None if records.get(key) is None else json.loads(records[key]) for key in keys]
+
+    def put(self, namespace, key, value, limit=None):
+        self.put_many(namespace, {key: value}, limit)
+
+    def put_many(self, namespace, items, limit=None):
+        encoded = {key: _dumps(value) for key, value in items.items()}
+        with self._lock:
+            records = self._records.setdefault(namespace, OrderedDict())
+            records.update(encoded)
+            while limit and len(records) > limit:
+                records.popitem(last=False)
+
+    def delete(self, namespace, key):
+        with self._lock:
+            return self._records.get(namespace, {}).pop(key, None) is not None
+
+    def drop(self, namespace):
+        with self._lock:
+            self._records.pop(namespace, None)
+
+    def values(self, namespace):
+        with self._lock:
+            encoded = list(self._records.get(namespace, {}).values())
+        return [json.loads(value) for value in encoded]
+
+    def append(self, log, entry, limit):
+        encoded = _dumps(entry)
+        with self._lock:
+            entries = self._logs.get(log)
+            if entries is None or entries.maxlen != limit:
+                entries = self._logs[log] = deque(entries or (), maxlen=limit)
+            entries.append(encoded)
+
+    def tail(self, log, limit=None):
+        with self._lock:
+            entries = list(self._logs.get(log, ()))
+        return [json.loads(entry) for entry in entries[-limit if limit else 0:]]
+
+    def incr(self, namespace, key, amount=1, ttl=None):
+        now = time.time()
+        with self._lock:
+            counter = self._counters.get((namespace, key))
+            if counter is None or (counter[1] is not None and counter[1] <= now):
+                counter = self._counters[(namespace, key)] = [0, now + ttl if ttl else None]
+            counter[0] += amount
+            self._writes += 1
+            if self._writes % self.SWEEP_EVERY == 0:
+                for name in [name for name, (_, expires) in self._counters.items() if expires and expires <= now]:
+                    del self._counters[name]
+            return counter[0]
+
+    def counts(self, namespace, keys):
+        now = time.time()
+        result = []
+        for key in keys:
+            counter = self._counters.get((namespace, key))
+            result.append(counter[0] if counter and (counter[1] is None or counter[1] > now) else 0)
+        return result
+
+    def flush(self):
+        pass
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._logs.clear()
+            self._counters.clear()
+
+
+# ==================== BATCHED LOGS ====================
+
+class _BatchedLogs:
+    """
+    Log appends are buffered in the process and written together once
+    batch_size are waiting or flush_interval has passed since the last write,
+    before this process reads a log it has pending entries for, and at exit.
+    Other processes see an entry once its batch is written.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=1.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = {}    # log -> (limit, [entries])
+        self._pending_count = 0
+        self._last_flush = time.monotonic()
+        self._buffer_lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def append(self, log, entry, limit):
+        with self._buffer_lock:
+            pending = self._pending.get(log)
+            if pending is None:
+                pending = self._pending[log] = (limit, [])
+            pending[1].append(_dumps(entry))
+            self._pending_count += 1
+            due = (self._pending_count >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def tail(self, log, limit=None):
+        if log in self._pending:
+            self.flush()
+        return [json.loads(entry) for entry in self._read_log(log, limit)]
+
+    def flush(self):
+        with self._buffer_lock:
+            pending, self._pending = self._pending, {}
+            self._pending_count = 0
+            self._last_flush = time.monotonic()
+        if pending:
+            self._write_logs(pending)
+
+
+# ==================== SQLITE ====================
+
+class SQLiteBackend(_BatchedLogs):
+    """
+    A SQLite file in WAL mode opened by every worker process of the host.
+    Records past a namespace's limit are trimmed every TRIM_EVERY puts, so a
+    namespace can run over its limit by that many records per worker.
+    """
+
+    TRIM_EVERY = 100
+    SWEEP_EVERY = 1000
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS state_records (
+            namespace TEXT NOT NULL, key TEXT NOT NULL, seq INTEGER NOT NULL, value TEXT NOT NULL,
+            PRIMARY KEY (namespace, key)
+        );
+        CREATE INDEX IF NOT EXISTS ix_state_records_seq ON state_records (namespace, seq);
+        CREATE TABLE IF NOT EXISTS state_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, value TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS ix_state_logs_name ON state_logs (name, id);
+        CREATE TABLE IF NOT EXISTS state_counters (
+            namespace TEXT NOT NULL, key TEXT NOT NULL, value INTEGER NOT NULL, expires_at REAL,
+            PRIMARY KEY (namespace, key)
+        );
+    """
+
+    def __init__(self, path, batch_size=100, flush_interval=1.0):
+        super().__init__(batch_size, flush_interval)
+        self.path = path
+        self._local = threading.local()
+        self._puts = {}
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, and a new one after fork()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def get(self, namespace, key):
+        row = self._connection().execute(
+            'SELECT value FROM state_records WHERE namespace = ? AND key = ?', (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_many(self, namespace, keys):
+        keys = list(keys)
+        found = {}
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update(self._connection().execute(
+                f"SELECT key, value FROM state_records WHERE namespace = ? AND key IN ({','.join('?' * len(chunk))})",
+                (namespace, *chunk)
+            ).fetchall())
+        return [json.loads(found[key]) if key in found else None for key in keys]
+
+    def put(self, namespace, key, value, limit=None):
+        self.put_many(namespace, {key: value}, limit)
+
+    def put_many(self, namespace, items, limit=None):
+        seq = time.time_ns()
+        rows = [(namespace, key, seq + n, _dumps(value)) for n, (key, value) in enumerate(items.items())]
+        puts = self._puts[namespace] = self._puts.get(namespace, 0) + 1
+        with self._transaction() as conn:
+            conn.executemany(
+                'INSERT INTO state_records (namespace, key, seq, value) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value',
+                rows
+            )
+            if limit and (len(rows) > 1 or puts % self.TRIM_EVERY == 0):
+                conn.execute(
+                    'DELETE FROM state_records WHERE namespace = ? AND seq < ('
+                    'SELECT seq FROM state_records WHERE namespace = ? ORDER BY seq DESC LIMIT 1 OFFSET ?)',
+                    (namespace, namespace, limit - 1)
+                )
+
+    def delete(self, namespace, key):
+        with self._transaction() as conn:
+            return conn.execute(
+                'DELETE FROM state_records WHERE namespace = ? AND key = ?', (namespace, key)
+            ).rowcount > 0
+
+    def drop(self, namespace):
+        self._puts.pop(namespace, None)
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM state_records WHERE namespace = ?', (namespace,))
+
+    def values(self, namespace):
+        return [json.loads(value) for value, in self._connection().execute(
+            'SELECT value FROM state_records WHERE namespace = ? ORDER BY seq', (namespace,)
+        )]
+
+    def _write_logs(self, pending):
+        with self._transaction() as conn:
+            for log, (limit, entries) in pending.items():
+                conn.executemany('INSERT INTO state_logs (name, value) VALUES (?, ?)', [(log, e) for e in entries])
+                conn.execute(
+                    'DELETE FROM state_logs WHERE name = ? AND id <= ('
+                    'SELECT id FROM state_logs WHERE name = ? ORDER BY id DESC LIMIT 1 OFFSET ?)',
+                    (log, log, limit)
+                )
+
+    def _read_log(self, log, limit):
+        rows = self._connection().execute(
+            'SELECT value FROM (SELECT id, value FROM state_logs WHERE name = ? ORDER BY id DESC LIMIT ?) '
+            'ORDER BY id',
+            (log, limit or -1)
+        )
+        return [value for value, in rows]
+
+    def incr(self, namespace, key, amount=1, ttl=None):
+        now = time.time()
+        self._writes += 1
+        with self._transaction() as conn:
+            value, = conn.execute(
+                'INSERT INTO state_counters (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (namespace, key) DO UPDATE SET '
+                'value = CASE WHEN expires_at <= ? THEN excluded.value ELSE value + excluded.value END, '
+                'expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END '
+                'RETURNING value',
+                (namespace, key, amount, now + ttl if ttl else None, now, now)
+            ).fetchone()
+            if self._writes % self.SWEEP_EVERY == 0:
+                conn.execute('DELETE FROM state_counters WHERE expires_at <= ?', (now,))
+        return value
+
+    def counts(self, namespace, keys):
+        keys = list(keys)
+        found = dict(self._connection().execute(
+            f"SELECT key, value FROM state_counters WHERE namespace = ? AND key IN ({','.join('?' * len(keys))}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, *keys, time.time())
+        ).fetchall())
+        return [found.get(key, 0) for key in keys]
+
+    def clear(self):
+        with self._buffer_lock:
+            self._pending.clear()
+            self._pending_count = 0
+        with self._transaction() as conn:
+            for table in ('state_records', 'state_logs', 'state_counters'):
+                conn.execute(f'DELETE FROM {table}')
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT on an autocommit connection, so writers queue instead of deadlocking"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+
+# ==================== REDIS ====================
+
+# Drop the oldest members past ARGV[1] from the order set KEYS[2] and the hash KEYS[1]
+_TRIM = """
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[1])
+if excess > 0 then
+    local old = redis.call('ZRANGE', KEYS[2], 0, excess - 1)
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, excess - 1)
+    redis.call('HDEL', KEYS[1], unpack(old))
+end
+return excess
+"""
+
+# INCRBY that starts a fresh counter with a TTL (milliseconds in ARGV[2], 0 for none)
+_INCR = """
+local value = redis.call('INCRBY', KEYS[1], ARGV[1])
+if value == tonumber(ARGV[1]) and tonumber(ARGV[2]) > 0 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return value
+"""
+
+
+class RedisBackend(_BatchedLogs):
+    """
+    Records are a hash per namespace plus a sorted set keeping insertion order
+    for limits, logs are lists trimmed as they are pushed, counters are plain
+    keys with a TTL. client is a redis.Redis or compatible (fakeredis with Lua).
+    """
+
+    def __init__(self, client, prefix='geminicrm:state:', batch_size=100, flush_interval=1.0):
+        super().__init__(batch_size, flush_interval)
+        self.client = client
+        self.prefix = prefix
+        self._trim = client.register_script(_TRIM)
+        self._incr = client.register_script(_INCR)
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _hash(self, namespace):
+        return f'{self.prefix}r:{namespace}'
+
+    def _order(self, namespace):
+        return f'{self.prefix}o:{namespace}'
+
+    def get(self, namespace, key):
+        value = self.client.hget(self._hash(namespace), key)
+        return None if value is None else json.loads(value)
+
+    def get_many(self, namespace, keys):
+        keys = list(keys)
+        if not keys:
+            return []
+        return [None if value is None else json.loads(value) for value in self.client.hmget(self._hash(namespace), keys)]
+
+    def put(self, namespace, key, value, limit=None):
+        self.put_many(namespace, {key: value}, limit)
+
+    def put_many(self, namespace, items, limit=None):
+        if not items:
+            return
+        now = time.time()
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hset(self._hash(namespace), mapping={key: _dumps(value) for key, value in items.items()})
+        pipe.zadd(self._order(namespace), {key: now + n * 1e-6 for n, key in enumerate(items)}, nx=True)
+        if limit:
+            self._trim(keys=[self._hash(namespace), self._order(namespace)], args=[limit], client=pipe)
+        pipe.execute()
+
+    def delete(self, namespace, key):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hdel(self._hash(namespace), key)
+        pipe.zrem(self._order(namespace), key)
+        return pipe.execute()[0] > 0
+
+    def drop(self, namespace):
+        self.client.delete(self._hash(namespace), self._order(namespace))
+
+    def values(self, namespace):
+        keys = self.client.zrange(self._order(namespace), 0, -1)
+        return [value for value in self.get_many(namespace, keys) if value is not None]
+
+    def _write_logs(self, pending):
+        pipe = self.client.pipeline(transaction=False)
+        for log, (limit, entries) in pending.items():
+            pipe.rpush(f'{self.prefix}l:{log}', *entries)
+            pipe.ltrim(f'{self.prefix}l:{log}', -limit, -1)
+        pipe.execute()
+
+    def _read_log(self, log, limit):
+        return self.client.lrange(f'{self.prefix}l:{log}', -limit if limit else 0, -1)
+
+    def incr(self, namespace, key, amount=1, ttl=None):
+        return int(self._incr(keys=[f'{self.prefix}c:{namespace}:{key}'], args=[amount, int((ttl or 0) * 1000)]))
+
+    def counts(self, namespace, keys):
+        keys = list(keys)
+        values = self.client.mget([f'{self.prefix}c:{namespace}:{key}' for key in keys]) if keys else []
+        return [int(value) if value is not None else 0 for value in values]
+
+    def clear(self):
+        with self._buffer_lock:
+            self._pending.clear()
+            self._pending_count = 0
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=1000))
+        if keys:
+            self.client.delete(*keys)
+
+
+# ==================== STORE ====================
+
+class StateStore:
+    """
+    The backend the managers share, chosen by STATE_BACKEND in init_app().
+    Until then (scripts, tests) state lives in this process's memory.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or MemoryBackend()
+
+    def init_app(self, app, backend=None):
+        """Pick the backend from STATE_BACKEND (memory, sqlite or redis) unless one is given"""
+        if backend is None:
+            name = app.config.get('STATE_BACKEND', 'memory')
+            batching = {
+                'batch_size': app.config.get('STATE_BATCH_SIZE', 100),
+                'flush_interval': app.config.get('STATE_FLUSH_INTERVAL', 1.0),
+            }
+            if name == 'memory':
+                backend = MemoryBackend()
+            elif name == 'sqlite':
+                path = app.config.get('STATE_SQLITE_PATH') or os.path.join(app.instance_path, 'state.db')
+                backend = SQLiteBackend(path, **batching)
+            elif name == 'redis':
+                backend = RedisBackend.from_url(app.config.get('REDIS_URL', 'redis://localhost:6379/0'), **batching)
+            else:
+                raise ValueError(f"STATE_BACKEND must be memory, sqlite or redis, not {name!r}")
+        self.backend = backend
+
+    def __getattr__(self, name):
+        # get/put/append/incr/... go straight to the backend
+        return getattr(self.backend, name)
+
+
+state_store = StateStore()
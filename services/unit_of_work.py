@@ -0,0 +1,62 @@
+"""
+GeminiCRM Pro - Request Unit of Work
+One transaction per request: views and helpers only add and flush, and the
+session is committed once after the view has produced its response
+"""
+from flask import g, has_request_context
+
+from models.db_models import db
+
+
+def init_app(app):
+    """Commit after every successful request and roll back after failed ones"""
+    app.after_request(_finish)
+    app.teardown_request(_discard)
+
+
+def on_commit(callback):
+    """Run callback after the current request commits; immediately outside a request"""
+    if has_request_context():
+        g.setdefault('_after_commit', []).append(callback)
+    else:
+        callback()
+
+
+def on_rollback(callback):
+    """Run callback if the current request rolls back instead of committing; never outside a request"""
+    if has_request_context():
+        g.setdefault('_after_rollback', []).append(callback)
+
+
+def _rolled_back():
+    for callback in g.pop('_after_rollback', []):
+        callback()
+
+
+def _finish(response):
+    callbacks = g.pop('_after_commit', [])
+    if response.status_code >= 400:
+        db.session.rollback()
+        _rolled_back()
+        return response
+
+    try:
+        db.session.commit()
+    except Exception:
+        # Re-raised so Flask answers with its 500 handler instead of the view's response
+        db.session.rollback()
+        _rolled_back()
+        raise
+    g.pop('_after_rollback', None)
+
+    for callback in callbacks:
+        callback()
+    return response
+
+
+def _discard(error):
+    if error is not None:
+        db.session.rollback()
+    g.pop('_after_commit', None)
+    # Still pending only when _finish never ran, so nothing was committed
+    _rolled_back()
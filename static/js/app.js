@@ -198,6 +198,25 @@ async function saveApiKey() {
     }
 }
 
+// ==================== Paged Lists ====================
+
+// List endpoints return one page plus next_cursor; follow it to the last page
+async function fetchAll(url, key) {
+    const items = [];
+    let cursor = null;
+    do {
+        const pageUrl = new URL(url, window.location.origin);
+        if (!pageUrl.searchParams.has('limit')) pageUrl.searchParams.set('limit', 500);
+        if (cursor) pageUrl.searchParams.set('cursor', cursor);
+        const res = await fetch(pageUrl);
+        if (!res.ok) throw new Error(`${url} returned ${res.status}`);
+        const data = await res.json();
+        items.push(...(data[key] || []));
+        cursor = data.next_cursor;
+    } while (cursor);
+    return items;
+}
+
 // ==================== API Status ====================
 
 async function checkApiStatus() {
@@ -379,6 +398,13 @@ function formatAIResponse(text) {
 
 let searchTimeout;
 
+const searchIcons = {
+    lead: 'person_search',
+    contact: 'person',
+    account: 'business',
+    opportunity: 'handshake'
+};
+
 function initSearch() {
     const searchInput = document.getElementById('globalSearch');
     const searchResults = document.getElementById('searchResults');
@@ -393,7 +419,7 @@ function initSearch() {
                 return;
             }
             
-            searchTimeout = setTimeout(() => performSearch(query), 300);
+            searchTimeout = setTimeout(() => performSearch(query), 80);
         });
         
         searchInput.addEventListener('blur', function() {
@@ -408,7 +434,10 @@ async function performSearch(query) {
     if (!searchResults) return;
     
     try {
-        const res = await fetch(`/api/search?q=${encodeURIComponent(query)}`);
+        // Suggestions come from an in-memory index, so asking on every pause in typing is cheap
+        const res = await fetch(`/api/search/suggest?q=${encodeURIComponent(query)}`);
+        // Rate limited (429): keep showing the last suggestions
+        if (!res.ok) return;
         const data = await res.json();
         
         if (data.results.length === 0) {
@@ -418,10 +447,10 @@ async function performSearch(query) {
             data.results.forEach(result => {
                 html += `
                     <div class="list-item" onclick="navigateToResult('${result.type}', '${result.id}')">
-                        <span class="material-icons-outlined">${result.icon}</span>
+                        <span class="material-icons-outlined">${searchIcons[result.type] || 'search'}</span>
                         <div class="list-item-content">
-                            <div class="list-item-title">${escapeHtml(result.title)}</div>
-                            <div class="list-item-subtitle">${escapeHtml(result.subtitle)}</div>
+                            <div class="list-item-title">${escapeHtml(result.name)}</div>
+                            <div class="list-item-subtitle">${escapeHtml(result.subtitle || '')}</div>
                         </div>
                     </div>
                 `;
@@ -441,6 +470,8 @@ function navigateToResult(type, id) {
     const routes = {
         contact: `/contacts?id=${id}`,
         lead: `/leads?id=${id}`,
+        account: `/accounts?id=${id}`,
+        opportunity: `/opportunities?id=${id}`,
         deal: `/deals?id=${id}`
     };
     window.location.href = routes[type] || '/';
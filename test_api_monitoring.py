@@ -0,0 +1,275 @@
+"""
+GeminiCRM Pro - API Monitoring Tests
+Histogram percentiles against exact ones, merging, the rolling rings on an
+injected clock, and requests through a Flask app showing up per endpoint
+rule and status class
+"""
+import json
+import math
+import random
+
+import pytest
+from flask import Flask, abort, jsonify
+
+from services.api_monitoring import APIMonitor, LatencyHistogram, RollingHistogram
+from services.state_store import MemoryBackend, SQLiteBackend
+
+
+class Clock:
+    def __init__(self, now=1_800_000_000.0):   # the start of an hour
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _exact(values, p):
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * p / 100)) - 1]
+
+
+def _histogram(values):
+    histogram = LatencyHistogram()
+    for ms in values:
+        histogram.record(ms)
+    return histogram
+
+
+# ==================== HISTOGRAMS ====================
+
+@pytest.mark.parametrize('values', [
+    [random.Random(7).lognormvariate(3, 1) for _ in range(20000)],
+    [0.5 + n * 0.25 for n in range(4000)],
+], ids=['lognormal', 'uniform'])
+def test_percentiles_within_bucket_width(values):
+    histogram = _histogram(values)
+    for p in (1, 50, 90, 95, 99, 99.9):
+        assert histogram.percentile(p) == pytest.approx(_exact(values, p), rel=LatencyHistogram.GROWTH - 1)
+    assert histogram.count == len(values)
+    assert histogram.total == pytest.approx(sum(values))
+
+
+def test_percentiles_stay_within_seen_values():
+    histogram = _histogram([12.0] * 10)
+    assert histogram.percentile(0) == histogram.percentile(100) == 12.0
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_extreme_times_land_in_first_and_last_buckets():
+    histogram = _histogram([0.001, 10 ** 9])
+    assert sorted(histogram.counts) == [0, LatencyHistogram.MAX_BUCKETS - 1]
+    # Below MIN_MS times read as MIN_MS, past 10 minutes as about 10 minutes
+    assert histogram.percentile(0) == LatencyHistogram.MIN_MS
+    assert histogram.percentile(100) == pytest.approx(600000, rel=LatencyHistogram.GROWTH - 1)
+
+
+def test_merge_equals_recording_everything_in_one():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(2, 1.5) for _ in range(5000)]
+    merged = _histogram(values[:1000]).merge(_histogram(values[1000:])).merge(LatencyHistogram())
+    whole = _histogram(values)
+    assert (merged.counts, merged.count, merged.min, merged.max) == (whole.counts, whole.count, whole.min, whole.max)
+    assert merged.total == pytest.approx(whole.total)
+    assert [merged.percentile(p) for p in (50, 95, 99)] == [whole.percentile(p) for p in (50, 95, 99)]
+
+
+def test_merge_into_empty():
+    merged = LatencyHistogram().merge(_histogram([5.0, 7.0]))
+    assert (merged.count, merged.min, merged.max) == (2, 5.0, 7.0)
+
+
+def test_round_trips_through_json():
+    histogram = _histogram([1.5, 30.0, 30.2, 800.0])
+    restored = LatencyHistogram.from_dict(json.loads(json.dumps(histogram.to_dict())))
+    assert restored.to_dict() == histogram.to_dict()
+    assert restored.percentile(75) == histogram.percentile(75)
+
+
+# ==================== ROLLING RINGS ====================
+
+def test_ring_slots_are_reused_as_time_moves_on():
+    rolling = RollingHistogram(period=60, slots=3)
+    start = 5400.0     # minute 90, the ring's first slot
+    for n in range(3):
+        rolling.record(10.0 * (n + 1), start + 60 * n)
+    assert [entry[0] for entry in rolling.ring] == [90, 91, 92]
+
+    # The fourth minute takes over the first minute's slot
+    rolling.record(40.0, start + 180)
+    assert [entry[0] for entry in rolling.ring] == [93, 91, 92]
+    merged = rolling.merged(180, start + 180)
+    assert (merged.count, merged.min, merged.max) == (3, 20.0, 40.0)
+
+
+def test_merged_covers_only_the_periods_asked_for():
+    rolling = RollingHistogram(period=60, slots=60)
+    now = 6000.0
+    for minutes_ago in range(10):
+        rolling.record(1.0 + minutes_ago, now - 60 * minutes_ago)
+    assert rolling.merged(60, now).count == 1
+    assert rolling.merged(300, now).count == 5
+    assert rolling.merged(10 ** 6, now).count == 10     # at most the whole ring
+    # Periods newer than `now` are left out
+    assert rolling.merged(60, now - 60).max == 2.0
+
+
+def test_monitor_reads_from_the_finest_ring_that_reaches_back():
+    clock = Clock()
+    monitor = APIMonitor(MemoryBackend(), clock=clock)
+    monitor.log_request(None, 'GET /api/leads', 'GET', 200, 10.0)
+    clock.now += 7200
+    monitor.log_request(None, 'GET /api/leads', 'GET', 200, 20.0)
+    clock.now += 30
+
+    # The last hour comes from the minute ring, which no longer holds the first request
+    assert monitor.get_endpoint_stats('GET /api/leads', 3600)['total_requests'] == 1
+    assert monitor.get_endpoint_stats('GET /api/leads', 600)['total_requests'] == 1
+    # A day comes from the hour ring
+    stats = monitor.get_endpoint_stats('GET /api/leads', 86400)
+    assert (stats['total_requests'], stats['min_response_time_ms'], stats['max_response_time_ms']) == (2, 10.0, 20.0)
+
+    clock.now += 86400
+    assert monitor.get_endpoint_stats('GET /api/leads', 86400) is None
+
+
+def test_series_past_the_cap_are_pooled(monkeypatch):
+    monkeypatch.setattr(APIMonitor, 'MAX_SERIES', 2)
+    monitor = APIMonitor(MemoryBackend(), clock=Clock())
+    for endpoint in ('GET /a', 'GET /b', 'GET /c', 'GET /d'):
+        monitor.log_request(None, endpoint, 'GET', 200, 1.0)
+    assert sorted(monitor._series) == [('<other>', '2xx'), ('GET /a', '2xx'), ('GET /b', '2xx')]
+    assert monitor.get_endpoint_stats('<other>')['total_requests'] == 2
+
+
+def test_health_and_error_rates():
+    monitor = APIMonitor(MemoryBackend(), clock=Clock())
+    for status in [200] * 17 + [404, 500, 503]:
+        monitor.log_request(None, 'GET /api/leads', 'GET', status, 5.0)
+    health = monitor.get_health_status()
+    assert health == {'status': 'unhealthy', 'total_requests_24h': 20, 'error_rate_percent': 10.0, 'errors_24h': 2}
+    assert monitor.get_error_rate_by_endpoint()['GET /api/leads'] == \
+        {'total': 20, 'errors': 3, 'error_rate_percent': 15.0}
+    assert monitor.get_top_endpoints() == [('GET /api/leads', 20)]
+
+
+# ==================== WORKERS ====================
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def workers(request, tmp_path):
+    """Two workers' monitors on one clock and one store, as each worker sees it"""
+    clock = Clock()
+    if request.param == 'memory':
+        shared = MemoryBackend()
+        stores = (shared, shared)
+    else:
+        stores = tuple(SQLiteBackend(str(tmp_path / 'state.db')) for _ in range(2))
+    first, second = (APIMonitor(store, clock=clock) for store in stores)
+    second._nonce = 'second'   # the same process here, so tell the two apart
+    return clock, first, second
+
+
+def test_workers_read_each_others_published_periods(workers):
+    clock, first, second = workers
+    for _ in range(3):
+        first.log_request(None, 'GET /api/leads', 'GET', 200, 10.0)
+    for _ in range(2):
+        second.log_request(None, 'GET /api/leads', 'GET', 500, 40.0)
+    # Neither has written since its first request, before which there was nothing to write
+    assert first.get_endpoint_stats('GET /api/leads')['total_requests'] == 3
+
+    clock.now += APIMonitor.PUBLISH_INTERVAL
+    second.log_request(None, 'GET /api/leads', 'GET', 200, 20.0)
+    stats = first.get_endpoint_stats('GET /api/leads')
+    assert (stats['total_requests'], stats['max_response_time_ms']) == (5, 40.0)
+    assert stats['by_status']['5xx']['requests'] == 2
+    # Its own periods count once, from its rings rather than the store as well
+    assert second.get_endpoint_stats('GET /api/leads')['total_requests'] == 3
+
+
+def test_closing_period_is_written_before_the_next_request(workers):
+    clock, first, second = workers
+    second.log_request(None, 'GET /api/leads', 'GET', 200, 20.0)
+    second.log_request(None, 'GET /api/leads', 'GET', 200, 30.0)
+    clock.now += 60
+    second.log_request(None, 'GET /api/leads', 'GET', 200, 1.0)
+    assert first.get_endpoint_stats('GET /api/leads', 120)['total_requests'] == 2
+    assert first.get_endpoint_stats('GET /api/leads', 86400)['total_requests'] == 2
+    assert first.get_health_status()['total_requests_24h'] == 2
+
+    # Out of the window asked for, and then out of the store's rings
+    clock.now += 120
+    assert first.get_endpoint_stats('GET /api/leads', 60) is None
+    clock.now += 86400
+    assert first.get_endpoint_stats('GET /api/leads', 86400) is None
+
+
+def test_published_periods_are_bounded(monkeypatch):
+    monkeypatch.setattr(APIMonitor, 'MAX_WORKERS', 1)
+    clock = Clock()
+    store = MemoryBackend()
+    monitor = APIMonitor(store, clock=clock)
+    for _ in range(100):
+        monitor.log_request(None, 'GET /api/leads', 'GET', 200, 5.0)
+        clock.now += 60
+    assert len(store.values('api_latency:60')) == 60
+    assert len(store.values('api_latency:3600')) == 2
+
+
+def test_forked_workers_have_their_own_origin(monkeypatch):
+    monitor = APIMonitor(MemoryBackend())
+    parent = monitor.origin
+    monkeypatch.setattr('os.getpid', lambda: -1)
+    assert monitor.origin != parent
+
+
+# ==================== FLASK ====================
+
+@pytest.fixture
+def monitored():
+    app = Flask(__name__)
+    monitor = APIMonitor(MemoryBackend(), clock=Clock())
+    monitor.init_app(app)
+
+    @app.route('/api/things/<int:thing_id>', methods=['GET', 'DELETE'])
+    def thing(thing_id):
+        if thing_id == 0:
+            abort(404)
+        return jsonify(id=thing_id)
+
+    @app.route('/api/broken')
+    def broken():
+        raise RuntimeError('boom')
+
+    return app, monitor
+
+
+def test_requests_are_counted_by_rule_and_status_class(monitored):
+    app, monitor = monitored
+    client = app.test_client()
+    for thing_id in (1, 2, 3, 0):
+        client.get(f'/api/things/{thing_id}')
+    client.delete('/api/things/1')
+
+    stats = monitor.get_endpoint_stats('GET /api/things/<int:thing_id>')
+    assert stats['total_requests'] == 4
+    assert {status: entry['requests'] for status, entry in stats['by_status'].items()} == {'2xx': 3, '4xx': 1}
+    assert stats['p95_response_time_ms'] > 0
+    assert monitor.get_endpoint_stats('DELETE /api/things/<int:thing_id>')['total_requests'] == 1
+
+
+def test_unmatched_paths_share_one_series(monitored):
+    app, monitor = monitored
+    client = app.test_client()
+    client.get('/api/nothing-here')
+    client.get('/api/nor-here')
+    stats = monitor.get_endpoint_stats('GET <unmatched>')
+    assert stats['total_requests'] == 2 and list(stats['by_status']) == ['4xx']
+
+
+def test_unhandled_errors_are_timed_and_logged(monitored):
+    app, monitor = monitored
+    assert app.test_client().get('/api/broken').status_code == 500
+    assert monitor.get_endpoint_stats('GET /api/broken')['by_status']['5xx']['requests'] == 1
+    error, = monitor.error_log
+    assert (error['endpoint'], error['method']) == ('GET /api/broken', 'GET')
+    assert 'boom' in error['error']
@@ -0,0 +1,80 @@
+"""
+GeminiCRM Pro - Bulk Import Tests
+Files posted to /api/import/<entity> through app.py's test client, polled
+until the job finishes, then read back through the list endpoints
+"""
+import time
+
+import pytest
+
+from models.db_models import db, Account, Lead
+
+
+def _import(client, entity, body, file_format='csv'):
+    response = client.post(f'/api/import/{entity}?format={file_format}', data=body.encode(),
+                           content_type='text/csv')
+    assert response.status_code == 202, response.json
+    location = response.headers['Location']
+    for _ in range(200):
+        job = client.get(location).json['job']
+        if job['status'] in ('completed', 'failed'):
+            return job
+        time.sleep(0.05)
+    pytest.fail(f'import did not finish: {job}')
+
+
+def test_missing_columns_get_their_defaults(client, crm_app, owner):
+    rows = '\n'.join(f'Ada{n},Lovelace,ada{n}@example.com,Engines Ltd' for n in range(50))
+    job = _import(client, 'leads', 'first_name,last_name,email,company\n' + rows)
+    assert (job['status'], job['inserted'], job['failed']) == ('completed', 50, 0)
+
+    response = client.get('/api/leads?limit=500')
+    assert response.status_code == 200
+    leads = response.json['leads']
+    assert len(leads) == 50
+    assert {(lead['score'], lead['status'], lead['estimated_value']) for lead in leads} == {(50, 'new', 0)}
+    assert leads[0]['name'].startswith('Ada')
+    with crm_app.app_context():
+        assert all(lead.score_grade == 'C' for lead in Lead.query.filter_by(owner_id=owner))
+
+
+def test_account_defaults(client, crm_app, owner):
+    job = _import(client, 'accounts', 'name\nInitech\nHooli\n')
+    assert job['inserted'] == 2
+    assert client.get('/api/accounts').status_code == 200
+    with crm_app.app_context():
+        accounts = Account.query.filter_by(owner_id=owner).all()
+        assert {(a.annual_revenue, a.account_type) for a in accounts} == {(0, 'prospect')}
+
+
+def test_opportunity_probability_follows_stage(client):
+    job = _import(client, 'opportunities', 'name,amount,stage\nBig deal,1000,negotiation\nNew one,5,\n')
+    assert job['inserted'] == 2
+    opportunities = {o['name']: o for o in client.get('/api/opportunities').json['opportunities']}
+    assert opportunities['New one']['stage'] == 'prospecting'
+    assert opportunities['Big deal']['probability'] > opportunities['New one']['probability']
+
+
+def test_duplicate_emails_are_skipped(client):
+    _import(client, 'contacts', 'first_name,email\nAda,ada@example.com\n')
+    job = _import(client, 'contacts', 'first_name,email\nAda,ADA@example.com\nGrace,grace@example.com\n'
+                                      'Grace again,grace@example.com\n')
+    assert (job['inserted'], job['skipped'], job['failed']) == (1, 2, 0)
+    assert {error['row'] for error in job['errors']} == {1, 3}
+    assert all(error['errors'] == {'email': 'already exists'} for error in job['errors'])
+    assert len(client.get('/api/contacts').json['contacts']) == 2
+
+
+def test_bad_values_and_foreign_keys_are_rejected(client):
+    job = _import(client, 'contacts', 'first_name,email,account_id\n'
+                                      'Ada,ada@example.com,no-such-account\n'
+                                      'Bob,not-an-email,\n'
+                                      'Cy,cy@example.com,\n')
+    assert (job['inserted'], job['failed']) == (1, 2)
+    errors = {error['row']: error['errors'] for error in job['errors']}
+    assert errors == {1: {'account_id': 'unknown account id'}, 2: {'email': 'must be an email address'}}
+
+
+def test_unknown_format_is_refused(client):
+    response = client.post('/api/import/leads', data=b'x', content_type='application/octet-stream')
+    assert response.status_code == 400
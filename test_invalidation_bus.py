@@ -0,0 +1,135 @@
+"""
+GeminiCRM Pro - Invalidation Bus Tests
+Two real worker processes listen on the Unix socket transport: a commit in
+the test process must reach both, and a rolled-back transaction neither
+"""
+import multiprocessing
+import os
+import socket
+
+import pytest
+from flask import Flask
+from sqlalchemy import text
+
+from models.db_models import db
+from models.engine import configure_app
+from services.invalidation import Invalidation, invalidation_bus
+
+
+def _make_app(directory):
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(directory, 'bus.db')}",
+        INVALIDATION_BUS='unix',
+        INVALIDATION_SOCKET_DIR=os.path.join(directory, 'bus'),
+    )
+    configure_app(app)
+    db.init_app(app)
+    invalidation_bus.init_app(app)
+    return app
+
+
+def _worker(directory, received, ready, stop):
+    _make_app(directory)
+    invalidation_bus.subscribe(lambda invalidations: received.put((os.getpid(), invalidations)))
+    invalidation_bus.start()
+    invalidation_bus.ready.wait(10)
+    ready.release()
+    stop.wait(60)
+    received.put((os.getpid(), invalidation_bus.stats()))
+
+
+class Workers:
+    def __init__(self, directory, count=2):
+        context = multiprocessing.get_context('spawn')
+        self.received, ready, self._stop = context.Queue(), context.Semaphore(0), context.Event()
+        self.processes = [
+            context.Process(target=_worker, args=(directory, self.received, ready, self._stop), daemon=True)
+            for _ in range(count)
+        ]
+        for process in self.processes:
+            process.start()
+        for _ in self.processes:
+            assert ready.acquire(timeout=60)
+        self.pids = {process.pid for process in self.processes}
+
+    def collect(self):
+        """The next message each worker reports, by pid"""
+        messages = {}
+        while set(messages) != self.pids:
+            pid, message = self.received.get(timeout=10)
+            messages[pid] = message
+        return messages
+
+    def stop(self):
+        self._stop.set()
+        stats = self.collect()
+        for process in self.processes:
+            process.join(10)
+        return stats
+
+
+@pytest.fixture
+def workers(tmp_path):
+    workers = Workers(str(tmp_path))
+    app = _make_app(str(tmp_path))
+    with app.app_context():
+        yield workers
+    if not workers._stop.is_set():
+        workers.stop()
+    invalidation_bus.stop()
+
+
+def test_commit_reaches_every_worker(workers):
+    invalidation_bus.stage(db.session, 'u1', 'leads', ['l1', 'l2'])
+    invalidation_bus.stage(db.session, 'u1')
+    db.session.commit()
+
+    for invalidations in workers.collect().values():
+        assert {(owner_id, entity, ids and frozenset(ids)) for owner_id, entity, ids in invalidations} == {
+            ('u1', 'leads', frozenset({'l1', 'l2'})), ('u1', None, None),
+        }
+
+
+def test_rollback_is_not_broadcast(workers):
+    # Staged inside a transaction, as flush listeners do
+    db.session.execute(text('SELECT 1'))
+    invalidation_bus.stage(db.session, 'u1', 'leads', ['discarded'])
+    db.session.rollback()
+    invalidation_bus.stage(db.session, 'u2', 'contacts', ['c1'])
+    db.session.commit()
+
+    for invalidations in workers.collect().values():
+        assert invalidations == [Invalidation('u2', 'contacts', ('c1',))]
+
+
+def test_oversized_change_sets_drop_their_ids(workers):
+    invalidation_bus.publish([Invalidation('u1', 'leads', tuple(f'lead-{n:08d}' for n in range(10000)))])
+
+    for invalidations in workers.collect().values():
+        assert invalidations == [Invalidation('u1', 'leads', None)]
+
+
+def test_workers_measure_latency(workers):
+    for _ in range(3):
+        invalidation_bus.publish([Invalidation('u1', None, None)])
+        workers.collect()
+
+    for stats in workers.stop().values():
+        assert stats['received'] == 3
+        assert stats['latency_ms']['samples'] == 3
+        assert 0 <= stats['latency_ms']['p50'] <= stats['latency_ms']['max'] < 1000
+
+
+def test_dead_workers_sockets_are_removed(tmp_path):
+    _make_app(str(tmp_path))
+    directory = os.path.join(str(tmp_path), 'bus')
+    os.makedirs(directory)
+    stale = os.path.join(directory, 'gone.sock')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(stale)
+    sock.close()
+
+    invalidation_bus.publish([Invalidation('u1', None, None)])
+    invalidation_bus.stop()
+    assert not os.path.exists(stale)
@@ -0,0 +1,85 @@
+"""
+GeminiCRM Pro - Pagination Tests
+List endpoints walked page by page through next_cursor on app.py's test
+client: every row once and in order, rows created mid-walk neither repeated
+nor skipping older ones, and bad cursors refused
+"""
+import base64
+import json
+
+import pytest
+
+
+def _create_leads(client, count, prefix='Lead'):
+    for n in range(count):
+        response = client.post('/api/leads', json={'first_name': prefix, 'last_name': str(n)})
+        assert response.status_code in (200, 201), response.json
+
+
+def _walk(client, url, key, between_pages=None):
+    """Every page's records and the number of pages"""
+    records, cursor, pages = [], None, 0
+    while True:
+        response = client.get(url + (f'&cursor={cursor}' if cursor else ''))
+        assert response.status_code == 200, response.json
+        records += response.json[key]
+        cursor, pages = response.json['next_cursor'], pages + 1
+        if cursor is None:
+            return records, pages
+        if between_pages:
+            between_pages()
+
+
+def test_cursor_walk_returns_every_row_once_newest_first(client):
+    _create_leads(client, 23)
+    leads, pages = _walk(client, '/api/leads?limit=10', 'leads')
+    assert pages == 3
+    assert len(leads) == len({lead['id'] for lead in leads}) == 23
+    assert [lead['name'] for lead in leads] == [f'Lead {n}' for n in reversed(range(23))]
+    keys = [(lead['created_at'], lead['id']) for lead in leads]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_exact_multiple_of_limit_has_no_empty_last_page(client):
+    _create_leads(client, 10)
+    response = client.get('/api/leads?limit=10')
+    assert len(response.json['leads']) == 10 and response.json['next_cursor'] is None
+
+
+def test_rows_created_mid_walk_neither_repeat_nor_shift_pages(client):
+    _create_leads(client, 12, prefix='Old')
+    leads, _ = _walk(client, '/api/leads?limit=5', 'leads', between_pages=lambda: _create_leads(client, 3, 'New'))
+
+    # New rows sort ahead of the cursor, so the walk sees exactly the rows that were there at the start
+    assert [lead['name'] for lead in leads] == [f'Old {n}' for n in reversed(range(12))]
+    everything, _ = _walk(client, '/api/leads?limit=500', 'leads')
+    assert len(everything) == 12 + 3 * 2
+
+
+def test_undated_tasks_follow_dated_ones_across_pages(client):
+    for n, due in enumerate(['2030-01-03T09:00:00', None, '2030-01-01T09:00:00', None, '2030-01-02T09:00:00']):
+        client.post('/api/tasks', json={'subject': f'Task {n}', 'due_date': due})
+    tasks, pages = _walk(client, '/api/tasks?limit=2', 'tasks')
+    assert pages == 3
+    assert [task['subject'] for task in tasks][:3] == ['Task 2', 'Task 4', 'Task 0']
+    assert sorted(task['subject'] for task in tasks[3:]) == ['Task 1', 'Task 3']
+
+
+def test_limit_is_capped(client, crm_app):
+    _create_leads(client, 3)
+    response = client.get('/api/leads?limit=0')
+    assert len(response.json['leads']) == 1
+    response = client.get(f"/api/leads?limit={crm_app.config['API_PAGE_SIZE_MAX'] * 10}")
+    assert len(response.json['leads']) == 3 and response.json['next_cursor'] is None
+
+
+@pytest.mark.parametrize('cursor', [
+    'not a cursor',
+    base64.urlsafe_b64encode(b'{"not": "a list"}').decode(),
+    base64.urlsafe_b64encode(json.dumps(['2030-01-01T00:00:00', 7]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps(['yesterday', 'abc']).encode()).decode(),
+], ids=['garbage', 'not-a-pair', 'numeric-id', 'bad-date'])
+def test_bad_cursor_is_refused(client, cursor):
+    response = client.get('/api/leads', query_string={'cursor': cursor})
+    assert response.status_code == 400
+    assert response.json == {'success': False, 'error': 'Invalid pagination cursor'}
@@ -0,0 +1,108 @@
+"""
+GeminiCRM Pro - Pipeline Summary Tests
+The rollup kept by the opportunity write paths, checked against a fresh
+GROUP BY over opportunities after each kind of change, and rebuilt by
+init_db() for databases whose table create_all() left empty
+"""
+import pytest
+from flask import Flask
+from sqlalchemy import func
+
+from models.db_models import db, init_db, Opportunity, PipelineSummary, User
+from services import pipeline_summary
+
+
+def _grouped(owner_id):
+    """{stage: (count, value, weighted)} straight from opportunities"""
+    amount = func.coalesce(Opportunity.amount, 0)
+    rows = db.session.query(
+        func.coalesce(Opportunity.stage, pipeline_summary.UNKNOWN_STAGE),
+        func.count(Opportunity.id),
+        func.sum(amount),
+        func.sum(amount * func.coalesce(Opportunity.probability, 0) / 100.0),
+    ).filter(Opportunity.owner_id == owner_id).group_by(Opportunity.stage)
+    return {stage: (count, pytest.approx(value), pytest.approx(weighted)) for stage, count, value, weighted in rows}
+
+
+def _rollup(owner_id):
+    return {
+        stage: (s['count'], s['value'], s['weighted'])
+        for stage, s in pipeline_summary.by_stage(owner_id).items()
+    }
+
+
+def _assert_matches(crm_app, *owners):
+    with crm_app.app_context():
+        for owner_id in owners:
+            assert _rollup(owner_id) == _grouped(owner_id)
+
+
+def _create(client, **fields):
+    response = client.post('/api/opportunities', json=fields)
+    assert response.status_code == 201
+    return response.json['opportunity']['id']
+
+
+def test_rollup_follows_every_write(client, crm_app, owner):
+    big = _create(client, name='Big', amount=1000, stage='proposal', probability=50)
+    _create(client, name='Small', amount=10.5, stage='proposal', probability=20)
+    other = _create(client, name='Other', amount=300, stage='prospecting')
+    _assert_matches(crm_app, owner)
+
+    # Stage changes, through the edit form and the pipeline board
+    assert client.put(f'/api/opportunities/{big}', json={'stage': 'negotiation', 'amount': 1200}).status_code == 200
+    _assert_matches(crm_app, owner)
+    assert client.put(f'/api/deals/{other}/stage', json={'stage': 'Closed Won'}).status_code == 200
+    _assert_matches(crm_app, owner)
+    report = client.get('/api/reports/pipeline').json['report']
+    assert (report['total_count'], report['total_value']) == (3, pytest.approx(1510.5))
+
+    assert client.delete(f'/api/opportunities/{other}').status_code == 200
+    _assert_matches(crm_app, owner)
+    assert 'Closed Won' not in client.get('/api/reports/pipeline').json['report']['by_stage']
+
+
+def test_rollup_follows_owner_change(client, crm_app, owner):
+    moved = _create(client, name='Moving', amount=500, stage='proposal', probability=40)
+    _create(client, name='Staying', amount=50, stage='proposal', probability=40)
+    with crm_app.app_context():
+        new_owner = User(email=f'new-{owner}@example.com', first_name='New', last_name='Owner')
+        new_owner.set_password('secret')
+        db.session.add(new_owner)
+        opportunity = db.session.get(Opportunity, moved)
+        before = pipeline_summary.snapshot(opportunity)
+        db.session.flush()
+        opportunity.owner_id = new_owner.id
+        pipeline_summary.apply_change(before, pipeline_summary.snapshot(opportunity))
+        db.session.commit()
+        new_owner_id = new_owner.id
+    _assert_matches(crm_app, owner, new_owner_id)
+    with crm_app.app_context():
+        assert _rollup(new_owner_id) == {'proposal': (1, 500, 200)}
+
+
+def test_init_db_fills_an_empty_rollup(tmp_path, capsys):
+    def start():
+        app = Flask(__name__)
+        app.config.update(SECRET_KEY='test', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'crm.db'}")
+        init_db(app)
+        return app
+
+    # A first start seeds the sample pipeline; then the rollup goes missing, as for
+    # databases created before it existed
+    app = start()
+    with app.app_context():
+        expected = _rollup('admin-001')
+        assert expected == _grouped('admin-001') != {}
+        PipelineSummary.query.delete()
+        db.session.commit()
+    capsys.readouterr()
+
+    app = start()
+    assert 'Pipeline summary rebuilt' in capsys.readouterr().out
+    with app.app_context():
+        assert _rollup('admin-001') == expected
+
+    # Filled already: later starts leave it alone
+    start()
+    assert 'Pipeline summary rebuilt' not in capsys.readouterr().out
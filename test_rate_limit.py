@@ -0,0 +1,273 @@
+"""
+GeminiCRM Pro - Rate Limiter Tests
+Sliding window counts and Retry-After on LocalBackend with an injected
+clock, and the 429 and X-RateLimit-* headers SlidingWindowLimiter adds to
+a Flask app's /api responses, with the app's own pages on their own budget
+"""
+import pytest
+from flask import Flask, jsonify
+from flask_login import LoginManager, UserMixin, login_user
+
+from services.rate_limit import LocalBackend, SlidingWindowLimiter, decide, parse_limits
+
+TEN_PER_MINUTE = ((10, 60),)
+SAME_ORIGIN = {'Sec-Fetch-Site': 'same-origin'}
+
+
+class Clock:
+    def __init__(self, now=600.0):   # the start of a minute
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _hits(backend, limits, count):
+    """How many of count hits are allowed"""
+    return sum(backend.hit('k', limits)[0] for _ in range(count))
+
+
+# ==================== LOCAL BACKEND ====================
+
+def test_parse_limits_sorts_by_window():
+    assert parse_limits('1000/hour; 60/minute') == ((60, 60), (1000, 3600))
+    assert parse_limits('10/5 seconds') == ((10, 5),)
+    with pytest.raises(ValueError):
+        parse_limits('lots/minute')
+
+
+def test_allows_up_to_the_limit_and_does_not_count_refusals():
+    clock = Clock()
+    backend = LocalBackend(clock=clock)
+    assert _hits(backend, TEN_PER_MINUTE, 15) == 10
+    assert backend.hit('k', TEN_PER_MINUTE)[1] == [(0, 10, 0.0)]
+    assert backend.hit('other', TEN_PER_MINUTE)[0] is True
+
+
+def test_previous_window_decays_as_it_slides_out():
+    clock = Clock()
+    backend = LocalBackend(clock=clock)
+    assert _hits(backend, TEN_PER_MINUTE, 10) == 10
+
+    # Half way into the next minute half of the last one still counts
+    clock.now += 90
+    assert _hits(backend, TEN_PER_MINUTE, 10) == 5
+
+    # Two minutes on, the full minute is free again
+    clock.now += 120
+    assert _hits(backend, TEN_PER_MINUTE, 20) == 10
+
+
+def test_burst_at_window_turn_gets_no_second_limit():
+    clock = Clock(659.0)
+    backend = LocalBackend(clock=clock)
+    assert _hits(backend, TEN_PER_MINUTE, 10) == 10
+    clock.now = 661.0
+    assert _hits(backend, TEN_PER_MINUTE, 10) == 0
+
+
+def test_peek_counts_nothing():
+    backend = LocalBackend(clock=Clock())
+    for _ in range(20):
+        assert backend.hit('k', TEN_PER_MINUTE, peek=True)[0] is True
+    assert _hits(backend, TEN_PER_MINUTE, 10) == 10
+
+
+def test_every_window_must_allow():
+    clock = Clock()
+    backend = LocalBackend(clock=clock)
+    limits = ((3, 1), (5, 60))
+    assert _hits(backend, limits, 5) == 3
+    clock.now += 2
+    assert _hits(backend, limits, 5) == 2
+
+
+def test_retry_after_is_when_the_hit_would_be_allowed():
+    clock = Clock()
+    backend = LocalBackend(clock=clock)
+    _hits(backend, TEN_PER_MINUTE, 10)
+
+    decision = decide(TEN_PER_MINUTE, *backend.hit('k', TEN_PER_MINUTE))
+    assert not decision.allowed and decision.window == 60
+    # The next minute, once 1/10 of this one has slid out
+    assert decision.retry_after == pytest.approx(66)
+
+    clock.now += decision.retry_after - 0.1
+    assert backend.hit('k', TEN_PER_MINUTE)[0] is False
+    clock.now += 0.1
+    assert backend.hit('k', TEN_PER_MINUTE)[0] is True
+
+
+def test_retry_after_within_next_window():
+    clock = Clock()
+    backend = LocalBackend(clock=clock)
+    _hits(backend, TEN_PER_MINUTE, 10)
+    clock.now += 60 + 30
+    _hits(backend, TEN_PER_MINUTE, 5)
+
+    decision = decide(TEN_PER_MINUTE, *backend.hit('k', TEN_PER_MINUTE))
+    # 5 current + 1 fits once the previous minute weighs 4: 36s into this one
+    assert decision.retry_after == pytest.approx(6)
+
+
+def test_allowed_decision_reports_tightest_window():
+    backend = LocalBackend(clock=Clock(610.0))
+    limits = ((10, 60), (100, 3600))
+    for _ in range(4):
+        decision = decide(limits, *backend.hit('k', limits))
+    assert decision.allowed
+    assert (decision.limit, decision.window, decision.remaining) == (10, 60, 6)
+    assert decision.reset == pytest.approx(50)
+
+
+def test_forgets_oldest_keys_past_max_keys():
+    backend = LocalBackend(max_keys=3, clock=Clock())
+    for n in range(5):
+        backend.hit(f'k{n}', TEN_PER_MINUTE)
+    assert len(backend) == 3
+
+
+# ==================== FLASK ====================
+
+@pytest.fixture
+def clock():
+    return Clock(610.0)
+
+
+@pytest.fixture
+def app(clock):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', RATE_LIMITS='3/minute', UI_RATE_LIMITS='6/minute')
+    LoginManager(app).user_loader(User)
+    limiter = SlidingWindowLimiter()
+    limiter.init_app(app, backend=LocalBackend(clock=clock))
+
+    @app.route('/api/things')
+    def things():
+        return jsonify(ok=True)
+
+    @app.route('/api/typeahead')
+    @limiter.exempt
+    @limiter.limit('5/minute', scope='typeahead')
+    def typeahead():
+        return jsonify(ok=True)
+
+    @app.route('/health')
+    def health():
+        return jsonify(ok=True)
+
+    @app.route('/login')
+    def login():
+        login_user(User('u1'))
+        return jsonify(ok=True)
+
+    return app
+
+
+class User(UserMixin):
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+@pytest.fixture
+def signed_in(app):
+    client = app.test_client()
+    client.get('/login')
+    return client
+
+
+def test_headers_then_429_with_retry_after(app):
+    client = app.test_client()
+    for remaining in (2, 1, 0):
+        response = client.get('/api/things')
+        assert response.status_code == 200
+        assert response.headers['X-RateLimit-Limit'] == '3'
+        assert response.headers['X-RateLimit-Remaining'] == str(remaining)
+        assert response.headers['X-RateLimit-Reset'] == '50'
+
+    response = client.get('/api/things')
+    assert response.status_code == 429
+    assert response.json['success'] is False
+    assert response.json['error'] == 'Rate limit exceeded (per minute)'
+    # 50s left of this minute, then a third of the next before 3 counted hits weigh 2
+    assert response.json['retry_after'] == 70.0
+    assert response.headers['Retry-After'] == '71'
+    assert response.headers['X-RateLimit-Remaining'] == '0'
+
+
+def test_allowed_again_after_retry_after(app, clock):
+    client = app.test_client()
+    for _ in range(4):
+        response = client.get('/api/things')
+    clock.now += int(response.headers['Retry-After'])
+    assert client.get('/api/things').status_code == 200
+
+
+def test_clients_are_counted_apart(app):
+    first = app.test_client()
+    for _ in range(3):
+        first.get('/api/things')
+    assert first.get('/api/things').status_code == 429
+    other = app.test_client()
+    assert other.get('/api/things', environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code == 200
+
+
+def test_exempt_view_counts_only_its_own_limit(app):
+    client = app.test_client()
+    for _ in range(5):
+        response = client.get('/api/typeahead')
+        assert response.status_code == 200
+    assert response.headers['X-RateLimit-Limit'] == '5'
+    assert client.get('/api/typeahead').status_code == 429
+    # None of those used up RATE_LIMITS
+    assert client.get('/api/things').headers['X-RateLimit-Remaining'] == '2'
+
+
+def test_paths_outside_prefix_are_not_limited(app):
+    client = app.test_client()
+    for _ in range(10):
+        response = client.get('/health')
+        assert response.status_code == 200
+    assert 'X-RateLimit-Limit' not in response.headers
+
+
+def test_own_pages_count_against_ui_limits(signed_in):
+    for remaining in range(5, -1, -1):
+        response = signed_in.get('/api/things', headers=SAME_ORIGIN)
+        assert response.status_code == 200
+        assert response.headers['X-RateLimit-Limit'] == '6'
+        assert response.headers['X-RateLimit-Remaining'] == str(remaining)
+    assert signed_in.get('/api/things', headers=SAME_ORIGIN).status_code == 429
+    # Apart from RATE_LIMITS, which the same user's scripts still have in full
+    assert signed_in.get('/api/things').headers['X-RateLimit-Remaining'] == '2'
+
+
+@pytest.mark.parametrize('headers', [
+    {'Referer': 'http://localhost/leads'},
+    {'Origin': 'http://localhost'},
+], ids=['referer', 'origin'])
+def test_own_pages_recognised_without_fetch_metadata(signed_in, headers):
+    assert signed_in.get('/api/things', headers=headers).headers['X-RateLimit-Limit'] == '6'
+
+
+@pytest.mark.parametrize('headers', [
+    {},
+    {'Sec-Fetch-Site': 'cross-site', 'Referer': 'http://localhost/leads'},
+    {'Sec-Fetch-Site': 'same-site'},
+    {'Origin': 'https://elsewhere.example'},
+], ids=['script', 'cross-site', 'same-site', 'other-origin'])
+def test_other_requests_keep_rate_limits(signed_in, headers):
+    assert signed_in.get('/api/things', headers=headers).headers['X-RateLimit-Limit'] == '3'
+
+
+def test_signed_out_pages_keep_rate_limits(app):
+    response = app.test_client().get('/api/things', headers=SAME_ORIGIN)
+    assert response.headers['X-RateLimit-Limit'] == '3'
+
+
+def test_empty_ui_limits_count_pages_against_rate_limits():
+    app = Flask(__name__)
+    app.config.update(RATE_LIMITS='3/minute', UI_RATE_LIMITS='')
+    limiter = SlidingWindowLimiter(ui_limits='6/minute')
+    limiter.init_app(app, backend=LocalBackend())
+    assert limiter.ui_limits is None
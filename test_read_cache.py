@@ -0,0 +1,216 @@
+"""
+GeminiCRM Pro - Read Cache Tests
+The in-process LRU's byte cap and TTL on an injected clock, the Redis backend
+against a dict-backed client, and a cached view whose entry a write retires
+by bumping the owner's data version
+"""
+import fnmatch
+
+import pytest
+from flask import Flask, jsonify
+from flask_login import LoginManager, current_user, login_user
+
+from models.db_models import db, DataVersion, Lead, User
+from models.engine import configure_app
+from services import data_version
+from services.read_cache import MemoryBackend, ReadCache, RedisBackend
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """The slice of redis.Redis that RedisBackend uses; expiry follows clock"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+
+    def get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= self.clock():
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (value, self.clock() + ex if ex else None)
+
+    def scan_iter(self, match='*', count=None):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError('redis is down')
+        return fail
+
+
+# ==================== MEMORY BACKEND ====================
+
+def test_memory_evicts_least_recently_used_past_byte_cap():
+    cache = MemoryBackend(max_bytes=30)
+    for key in 'abc':
+        cache.set(key, b'x' * 10, ttl=60)
+    assert cache.size == 30
+
+    cache.get('a')                      # now b is the least recently used
+    cache.set('d', b'y' * 10, ttl=60)
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == [b'x' * 10, b'x' * 10, b'y' * 10]
+    assert cache.size == 30 and len(cache) == 3
+
+
+def test_memory_replacing_an_entry_counts_its_bytes_once():
+    cache = MemoryBackend(max_bytes=100)
+    cache.set('a', b'x' * 40, ttl=60)
+    cache.set('a', b'x' * 10, ttl=60)
+    assert cache.size == 10 and len(cache) == 1
+
+
+def test_memory_skips_values_larger_than_the_cap():
+    cache = MemoryBackend(max_bytes=10)
+    cache.set('small', b'x' * 5, ttl=60)
+    cache.set('huge', b'x' * 11, ttl=60)
+    assert cache.get('huge') is None
+    assert cache.get('small') == b'x' * 5
+
+
+def test_memory_entries_expire_after_ttl():
+    clock = Clock()
+    cache = MemoryBackend(clock=clock)
+    cache.set('a', b'value', ttl=30)
+    clock.now += 29.9
+    assert cache.get('a') == b'value'
+    clock.now += 0.1
+    assert cache.get('a') is None
+    assert cache.size == 0 and len(cache) == 0
+
+
+def test_memory_discard_prefix_drops_one_owners_entries():
+    cache = MemoryBackend()
+    for key in ('u1:1:a', 'u1:2:b', 'u2:1:a'):
+        cache.set(key, b'v', ttl=60)
+    cache.discard_prefix('u1:')
+    assert len(cache) == 1 and cache.get('u2:1:a') == b'v'
+
+
+# ==================== REDIS BACKEND ====================
+
+def test_redis_round_trip_with_prefix_and_ttl():
+    clock = Clock()
+    client = FakeRedis(clock)
+    cache = RedisBackend(client, prefix='test:')
+    cache.set('u1:1:a', b'value', ttl=0.2)     # rounded up to Redis's one-second minimum
+    assert list(client.data) == ['test:u1:1:a']
+    assert cache.get('u1:1:a') == b'value'
+    clock.now += 1
+    assert cache.get('u1:1:a') is None
+
+
+def test_redis_clear_only_touches_its_prefix():
+    client = FakeRedis(Clock())
+    client.set('other:key', b'kept')
+    cache = RedisBackend(client, prefix='test:')
+    cache.set('a', b'1', ttl=60)
+    cache.set('b', b'2', ttl=60)
+    cache.clear()
+    assert list(client.data) == ['other:key']
+
+
+def test_redis_down_is_a_miss():
+    cache = RedisBackend(DownRedis())
+    cache.set('a', b'1', ttl=60)
+    assert cache.get('a') is None
+
+
+# ==================== CACHED VIEWS ====================
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'cache.db'}")
+    configure_app(app)
+    db.init_app(app)
+    data_version.init_app(app)
+    cache = ReadCache()
+    cache.init_app(app, backend=MemoryBackend())
+    app.extensions['test_read_cache'] = cache
+
+    login_manager = LoginManager(app)
+    login_manager.user_loader(lambda user_id: db.session.get(User, user_id))
+
+    @app.route('/login/<user_id>', methods=['POST'])
+    def login(user_id):
+        login_user(db.session.get(User, user_id))
+        return ''
+
+    @app.route('/leads')
+    @cache.cached()
+    def list_leads():
+        return jsonify(names=[lead.name for lead in Lead.query.filter_by(owner_id=current_user.id)])
+
+    @app.route('/leads', methods=['POST'])
+    def create_lead():
+        db.session.add(Lead(name='Second', owner_id=current_user.id))
+        db.session.commit()
+        return '', 201
+
+    with app.app_context():
+        db.create_all()
+        for user_id in ('u1', 'u2'):
+            db.session.add(User(id=user_id, email=f'{user_id}@example.com', first_name='U',
+                                last_name=user_id, password_hash='x'))
+        db.session.add(Lead(name='First', owner_id='u1'))
+        db.session.commit()
+    return app
+
+
+def _version(app, owner_id):
+    with app.app_context():
+        row = db.session.get(DataVersion, owner_id)
+        return row.version if row else 0
+
+
+def test_repeat_read_is_served_from_cache(app):
+    cache = app.extensions['test_read_cache']
+    client = app.test_client()
+    client.post('/login/u1')
+    first, second = client.get('/leads'), client.get('/leads')
+    assert first.json == second.json == {'names': ['First']}
+    assert second.mimetype == 'application/json'
+    assert cache.counters == {'hits': 1, 'misses': 1, 'stores': 1}
+
+
+def test_write_bumps_data_version_and_misses_cache(app):
+    cache = app.extensions['test_read_cache']
+    client = app.test_client()
+    client.post('/login/u1')
+    assert client.get('/leads').json == {'names': ['First']}
+    before = _version(app, 'u1')
+
+    assert client.post('/leads').status_code == 201
+    assert _version(app, 'u1') == before + 1
+
+    assert client.get('/leads').json == {'names': ['First', 'Second']}
+    assert cache.counters == {'hits': 0, 'misses': 2, 'stores': 2}
+
+
+def test_entries_are_per_owner(app):
+    cache = app.extensions['test_read_cache']
+    owner, other = app.test_client(), app.test_client()
+    owner.post('/login/u1')
+    other.post('/login/u2')
+    assert owner.get('/leads').json == {'names': ['First']}
+    assert other.get('/leads').json == {'names': []}
+    assert cache.counters['hits'] == 0
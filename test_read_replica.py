@@ -0,0 +1,82 @@
+"""
+GeminiCRM Pro - Read Replica Routing Tests
+Uses two SQLite files: writes land in the primary, which the replica file
+does not see, so each read shows which engine served it
+"""
+import shutil
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from models.db_models import db, Lead, User
+from models.engine import configure_app, install_pragmas, read_replica
+
+
+@pytest.fixture
+def app(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = Flask(__name__)
+    app.config.update(
+        SECRET_KEY='test',
+        SQLALCHEMY_DATABASE_URI=f'sqlite:///{primary}',
+        DATABASE_REPLICA_URL=f'sqlite:///{replica}',
+        REPLICA_STICKY_SECONDS=0.5,
+    )
+    configure_app(app)
+    db.init_app(app)
+
+    @app.route('/leads')
+    @read_replica
+    def list_leads():
+        return jsonify(count=Lead.query.count())
+
+    @app.route('/leads', methods=['POST'])
+    def create_lead():
+        db.session.add(Lead(name='New lead', owner_id='u1'))
+        db.session.commit()
+        return jsonify(count=Lead.query.count())
+
+    @app.route('/leads/touch', methods=['POST'])
+    @read_replica
+    def read_then_write():
+        before = Lead.query.count()
+        db.session.add(Lead(name='Touched', owner_id='u1'))
+        db.session.flush()
+        return jsonify(before=before, after=Lead.query.count())
+
+    with app.app_context():
+        install_pragmas(app, db.engines)
+        db.create_all()
+        db.session.add(User(id='u1', email='u1@example.com', first_name='U', last_name='One', password_hash='x'))
+        db.session.add(Lead(name='Replicated', owner_id='u1'))
+        db.session.commit()
+        for engine in db.engines.values():
+            engine.dispose()
+    shutil.copy(primary, replica)
+
+    with app.app_context():
+        # Written after the "replication" snapshot: only the primary has it
+        db.session.add(Lead(name='Not replicated yet', owner_id='u1'))
+        db.session.commit()
+    return app
+
+
+def test_reads_go_to_replica(app):
+    assert app.test_client().get('/leads').json['count'] == 1
+
+
+def test_writer_reads_own_writes_until_sticky_window_ends(app):
+    writer, other = app.test_client(), app.test_client()
+    assert writer.post('/leads').json['count'] == 3
+
+    assert writer.get('/leads').json['count'] == 3
+    assert other.get('/leads').json['count'] == 1
+
+    time.sleep(0.6)
+    assert writer.get('/leads').json['count'] == 1
+
+
+def test_write_pins_rest_of_request_to_primary(app):
+    result = app.test_client().post('/leads/touch').json
+    assert result == {'before': 1, 'after': 3}
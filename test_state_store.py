@@ -0,0 +1,340 @@
+"""
+GeminiCRM Pro - State Store Tests
+The same cases against every backend: in process, a SQLite file and Redis
+(fakeredis with Lua, skipped when it is not installed), then the managers
+that keep their state there
+"""
+import time
+
+import pytest
+
+from models.user_profile import ActivityLogger, NotificationManager, UserProfileManager
+from services.api_monitoring import APIKeyManager, AuditLog
+from services.email_service import EmailService, WebhookManager
+from services.state_store import MemoryBackend, RedisBackend, SQLiteBackend, StateStore
+
+BATCHED = ('sqlite', 'redis')
+
+
+def _fake_redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')   # register_script needs fakeredis's Lua support
+    return fakeredis.FakeRedis()
+
+
+def _backend(name, tmp_path, client=None, **batching):
+    if name == 'memory':
+        return MemoryBackend()
+    if name == 'sqlite':
+        return SQLiteBackend(str(tmp_path / 'state.db'), **batching)
+    return RedisBackend(client or _fake_redis(), prefix='test:', **batching)
+
+
+@pytest.fixture(params=['memory', 'sqlite', 'redis'])
+def store(request, tmp_path):
+    backend = _backend(request.param, tmp_path)
+    yield backend
+    backend.clear()
+
+
+@pytest.fixture(params=BATCHED)
+def pair(request, tmp_path):
+    """Two processes' views of one shared store: batch of 3, no timed flush"""
+    client = _fake_redis() if request.param == 'redis' else None
+    writer, reader = (_backend(request.param, tmp_path, client, batch_size=3, flush_interval=60) for _ in range(2))
+    yield writer, reader
+    writer.clear()
+
+
+# ==================== RECORDS ====================
+
+def test_put_get_and_copies(store):
+    store.put('things', 'a', {'n': 1, 'tags': ['x']})
+    value = store.get('things', 'a')
+    assert value == {'n': 1, 'tags': ['x']}
+
+    value['tags'].append('y')           # a copy: only put() changes the stored record
+    assert store.get('things', 'a') == {'n': 1, 'tags': ['x']}
+    assert store.get('things', 'missing') is None
+    assert store.get('other', 'a') is None
+
+
+def test_get_many_keeps_key_order(store):
+    store.put_many('things', {'a': 1, 'b': 2, 'c': 3})
+    assert store.get_many('things', ['c', 'missing', 'a']) == [3, None, 1]
+    assert store.get_many('things', []) == []
+
+
+def test_values_oldest_first_and_replacing_keeps_position(store):
+    for key in 'abc':
+        store.put('things', key, key.upper())
+    store.put('things', 'a', 'A2')
+    assert store.values('things') == ['A2', 'B', 'C']
+
+
+def test_delete(store):
+    store.put('things', 'a', 1)
+    assert store.delete('things', 'a') is True
+    assert store.delete('things', 'a') is False
+    assert store.get('things', 'a') is None
+    assert store.values('things') == []
+
+
+def test_drop_empties_one_namespace(store):
+    store.put_many('things', {'a': 1, 'b': 2})
+    store.put('others', 'a', 3)
+    store.drop('things')
+    store.drop('missing')
+    assert store.values('things') == [] and store.get('things', 'a') is None
+    assert store.values('others') == [3]
+    store.put('things', 'c', 4)
+    assert store.values('things') == [4]
+
+
+def test_put_many_trims_to_limit(store):
+    store.put_many('things', {f'k{n}': n for n in range(5)}, limit=3)
+    assert store.values('things') == [2, 3, 4]
+    assert store.get('things', 'k0') is None
+
+
+def test_single_puts_trim_to_limit(store):
+    # SQLite trims single puts every TRIM_EVERY of them; the others on each put
+    puts = getattr(store, 'TRIM_EVERY', 20)
+    for n in range(puts):
+        store.put('things', f'k{n}', n, limit=10)
+    assert store.values('things') == list(range(puts - 10, puts))
+
+
+def test_limits_are_per_namespace(store):
+    store.put_many('one', {'a': 1, 'b': 2}, limit=1)
+    store.put_many('two', {'a': 1, 'b': 2}, limit=2)
+    assert store.values('one') == [2]
+    assert store.values('two') == [1, 2]
+
+
+# ==================== LOGS ====================
+
+def test_append_and_tail(store):
+    for n in range(5):
+        store.append('events', {'n': n}, limit=100)
+    assert store.tail('events') == [{'n': n} for n in range(5)]
+    assert store.tail('events', 2) == [{'n': 3}, {'n': 4}]
+    assert store.tail('missing') == []
+
+
+def test_log_keeps_newest_entries_up_to_limit(store):
+    for n in range(10):
+        store.append('events', n, limit=4)
+    store.flush()
+    assert store.tail('events') == [6, 7, 8, 9]
+
+
+# ==================== COUNTERS ====================
+
+def test_incr_and_counts(store):
+    assert store.incr('hits', 'a') == 1
+    assert store.incr('hits', 'a', 4) == 5
+    assert store.incr('hits', 'b') == 1
+    assert store.counts('hits', ['a', 'b', 'missing']) == [5, 1, 0]
+
+
+def test_counter_restarts_after_ttl(store):
+    store.incr('hits', 'a', ttl=0.05)
+    assert store.incr('hits', 'a', ttl=0.05) == 2
+    time.sleep(0.1)
+    assert store.counts('hits', ['a']) == [0]
+    assert store.incr('hits', 'a', ttl=0.05) == 1
+
+
+def test_clear(store):
+    store.put('things', 'a', 1)
+    store.append('events', 1, limit=10)
+    store.incr('hits', 'a')
+    store.clear()
+    assert store.get('things', 'a') is None
+    assert store.tail('events') == []
+    assert store.counts('hits', ['a']) == [0]
+
+
+# ==================== BATCHED LOG WRITES ====================
+
+def test_appends_are_written_once_a_batch_fills(pair):
+    writer, reader = pair
+    writer.append('events', 1, limit=100)
+    writer.append('events', 2, limit=100)
+    assert reader.tail('events') == []
+
+    writer.append('events', 3, limit=100)
+    assert reader.tail('events') == [1, 2, 3]
+
+
+def test_tail_flushes_own_pending_appends(pair):
+    writer, reader = pair
+    writer.append('events', 1, limit=100)
+    assert writer.tail('events') == [1]
+    assert reader.tail('events') == [1]
+
+
+def test_flush_writes_every_pending_log(pair):
+    writer, reader = pair
+    writer.append('one', 1, limit=100)
+    writer.append('two', 2, limit=100)
+    writer.flush()
+    assert (reader.tail('one'), reader.tail('two')) == ([1], [2])
+
+
+@pytest.mark.parametrize('name', BATCHED)
+def test_appends_are_written_after_flush_interval(name, tmp_path):
+    client = _fake_redis() if name == 'redis' else None
+    writer = _backend(name, tmp_path, client, batch_size=1000, flush_interval=0.05)
+    reader = _backend(name, tmp_path, client)
+    writer.append('events', 1, limit=100)
+    time.sleep(0.1)
+    writer.append('events', 2, limit=100)
+    assert reader.tail('events') == [1, 2]
+
+
+def test_state_store_picks_backend_from_config(tmp_path):
+    from flask import Flask
+    app = Flask(__name__)
+    app.config.update(STATE_BACKEND='sqlite', STATE_SQLITE_PATH=str(tmp_path / 'state.db'), STATE_BATCH_SIZE=7)
+    state = StateStore()
+    assert isinstance(state.backend, MemoryBackend)
+    state.init_app(app)
+    assert isinstance(state.backend, SQLiteBackend) and state.batch_size == 7
+
+    app.config['STATE_BACKEND'] = 'nonsense'
+    with pytest.raises(ValueError):
+        state.init_app(app)
+
+
+# ==================== MANAGERS ====================
+
+def test_notifications(store):
+    manager = NotificationManager(store)
+    first = manager.create_notification('u1', {'title': 'First'})
+    manager.create_notification('u1', {'title': 'Second'})
+    manager.create_notification('u2', {'title': 'Other user'})
+    assert manager.get_unread_count('u1') == 2
+
+    assert manager.mark_notification_read(first.id) is True
+    assert manager.mark_notification_read('missing') is False
+    assert [n.title for n in manager.get_notifications('u1', unread_only=True)] == ['Second']
+
+    assert manager.pin_notification(first.id) is True
+    assert [n.is_pinned for n in manager.get_notifications('u1') if n.id == first.id] == [True]
+
+    manager.mark_all_read('u1')
+    assert manager.get_unread_count('u1') == 0
+    manager.delete_notification(first.id)
+    assert [n.title for n in manager.get_notifications('u1')] == ['Second']
+    assert manager.get_unread_count('u2') == 1
+
+
+def test_profiles(store):
+    manager = UserProfileManager(store)
+    manager.create_profile('u1', {'first_name': 'Ada', 'last_name': 'Lovelace', 'team_id': 't1', 'total_deals': 3})
+    manager.create_profile('u2', {'first_name': 'Alan', 'last_name': 'Turing', 'team_id': 't1', 'total_deals': 4})
+
+    assert manager.get_profile('u1').full_name == 'Ada Lovelace'
+    assert manager.update_profile('u1', {'last_name': 'King', 'full_name': 'ignored'}).full_name == 'Ada King'
+    assert manager.get_profile('u1').full_name == 'Ada King'
+    manager.set_status('u2', 'away')
+    assert manager.get_profile('u2').status == 'away'
+    assert manager.get_team_statistics('t1')['total_deals'] == 7
+    assert manager.update_profile('missing', {'status': 'away'}) is None
+
+
+def test_activity_log(store):
+    logger = ActivityLogger(store)
+    logger.log_activity('u1', {'action': 'create', 'resource_type': 'lead', 'resource_id': 'l1'})
+    logger.log_activity('u2', {'action': 'view', 'resource_type': 'lead', 'resource_id': 'l1'})
+    logger.log_activity('u1', {'action': 'update', 'resource_type': 'lead', 'resource_id': 'l2'})
+    assert [log.action for log in logger.get_user_activity('u1')] == ['update', 'create']
+    assert {log.user_id for log in logger.get_activity_for_resource('lead', 'l1')} == {'u1', 'u2'}
+
+
+def test_api_keys(store):
+    manager = APIKeyManager(store)
+    key = manager.create_key('u1', 'CI')
+    manager.create_key('u1')
+    assert manager.validate_key(key.key) == (True, 'u1')
+    assert sorted(k['name'] for k in manager.get_user_keys('u1')) == ['API Key 2', 'CI']
+
+    assert manager.revoke_key(key.key) is True
+    assert manager.validate_key(key.key) == (False, 'API key is disabled')
+    assert manager.validate_key('gcrm_missing') == (False, 'Invalid API key')
+
+
+def test_audit_log(store):
+    audit = AuditLog(store)
+    audit.log_action('u1', 'update', 'lead', 'l1', {'status': 'won'})
+    audit.log_action('u2', 'delete', 'lead', 'l2')
+    assert [log['action'] for log in audit.get_user_activity('u1')] == ['update']
+    assert [log['user_id'] for log in audit.get_resource_history('lead', 'l2')] == ['u2']
+    assert len(audit.get_all_logs()) == 2
+
+
+def test_email_campaign(store):
+    service = EmailService(store)
+    # Shared system templates are written once per store, not once per worker
+    assert len(EmailService(store).list_templates()) == len(service.list_templates())
+
+    template = service.create_template({'name': 'Hello', 'subject': 'Hi', 'body': 'Hello'})
+    campaign = service.create_campaign({
+        'name': 'Launch', 'template_id': template['id'], 'recipient_ids': ['c1', 'c2'], 'created_by': 'u1'
+    })
+    assert service.send_campaign(campaign['id']) == (True, '2 emails scheduled')
+
+    messages = service.list_campaign_messages(campaign['id'])
+    assert service.track_email_open(messages[0]['id']) is True
+    assert service.track_email_click(messages[0]['id']) is True
+    assert service.track_email_open(messages[0]['id']) is False
+    stats = service.get_campaign_stats(campaign['id'])
+    assert (stats['total_sent'], stats['clicked'], stats['click_rate']) == (2, 1, '50.0%')
+
+
+def _sent_campaign(service, template, recipients):
+    campaign = service.create_campaign({
+        'name': 'Launch', 'template_id': template['id'], 'recipient_ids': recipients, 'created_by': 'u1'
+    })
+    service.send_campaign(campaign['id'])
+    return campaign['id']
+
+
+def test_campaign_messages_are_bounded_and_go_with_their_campaign(store, monkeypatch):
+    monkeypatch.setattr(EmailService, 'MAX_CAMPAIGNS', 2)
+    monkeypatch.setattr(EmailService, 'MAX_MESSAGES_PER_CAMPAIGN', 3)
+    monkeypatch.setattr(store, 'TRIM_EVERY', 1, raising=False)   # SQLite: trim on every single put
+    service = EmailService(store)
+    template = service.create_template({'name': 'Hello', 'subject': 'Hi', 'body': 'Hello'})
+
+    first = _sent_campaign(service, template, [f'c{n}' for n in range(5)])
+    assert [m['recipient_id'] for m in service.list_campaign_messages(first)] == ['c2', 'c3', 'c4']
+    first_message = service.list_campaign_messages(first)[0]['id']
+
+    # A third campaign pushes the first out of the store, and its messages with it
+    second = _sent_campaign(service, template, ['c1'])
+    service.create_campaign({'name': 'Draft', 'template_id': template['id'], 'created_by': 'u1'})
+    assert service.get_campaign(first) is None
+    assert service.list_campaign_messages(first) == []
+    assert service.get_message(first_message) is None
+    assert service.track_email_open(first_message) is False
+    assert len(service.list_campaign_messages(second)) == 1
+
+    assert service.delete_campaign(second) is True
+    assert service.list_campaign_messages(second) == []
+    assert store.values('email_sent_campaigns') == []
+    assert service.delete_campaign(second) is False
+
+
+def test_webhooks(store):
+    manager = WebhookManager(store)
+    hook = manager.register_webhook({'url': 'https://example.com/hook', 'event_type': 'lead.created'})
+    manager.register_webhook({'url': 'https://example.com/other', 'event_type': 'deal.won'})
+
+    assert manager.trigger_webhook('lead.created', {'id': 'l1'}) == [hook['id']]
+    assert manager.get_webhook(hook['id'])['last_triggered']
+    assert [event['payload'] for event in manager.event_log] == [{'id': 'l1'}]
+    assert manager.delete_webhook(hook['id']) is True
+    assert manager.trigger_webhook('lead.created', {'id': 'l2'}) == []